@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de XLS crudos direccionado por contenido
+----------------------------------------------
+Guarda cada descarga de estación por el SHA-256 de su contenido, comprimida
+con zstd (o gzip si zstandard no está instalado), y lleva un índice SQLite
+con (id_estacion, fecha de descarga, hash).
+
+- Descargas idénticas no ocupan espacio extra: el objeto se escribe una vez.
+- extract.py y scripts/main.py guardan acá lo que bajan, así los experimentos
+  de transformación pueden re-parsear sin tocar la red.
+- Los .xls sueltos de datos-estaciones/ se pueden importar con
+  `importar_carpeta`.
+
+Estructura en disco:
+    <cache>/indice.sqlite
+    <cache>/objetos/ab/abcdef....xls.zst
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # sin zstandard se usa gzip de la biblioteca estándar
+    zstandard = None
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+CACHE_DIR = os.getenv(
+    "INTA_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "cache-xls"),
+)
+ZSTD_LEVEL = 10
+
+DDL = """
+CREATE TABLE IF NOT EXISTS objetos (
+    hash              TEXT PRIMARY KEY,
+    codec             TEXT NOT NULL,
+    bytes             INTEGER NOT NULL,
+    bytes_comprimidos INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS descargas (
+    id_estacion  TEXT NOT NULL,
+    descargado   TEXT NOT NULL,
+    hash         TEXT NOT NULL REFERENCES objetos(hash),
+    PRIMARY KEY (id_estacion, descargado, hash)
+);
+CREATE INDEX IF NOT EXISTS idx_descargas_estacion ON descargas(id_estacion, descargado);
+"""
+
+
+# =============================================================================
+# Compresión
+# =============================================================================
+
+def _codec() -> str:
+    return "zst" if zstandard is not None else "gz"
+
+
+def _comprimir(contenido: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(contenido)
+    return gzip.compress(contenido)
+
+
+def _descomprimir(datos: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        if zstandard is None:
+            raise RuntimeError("El objeto está comprimido con zstd y zstandard no está instalado")
+        return zstandard.ZstdDecompressor().decompress(datos)
+    return gzip.decompress(datos)
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class CacheCrudo:
+    """Almacén de XLS crudos por hash + índice de descargas por estación."""
+
+    def __init__(self, base_dir: str = CACHE_DIR):
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(os.path.join(self.base_dir, "objetos"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(self.base_dir, "indice.sqlite"),
+                                     check_same_thread=False)
+        self._conn.executescript(DDL)
+
+    # --- objetos -------------------------------------------------------------
+    def _ruta_objeto(self, h: str, codec: str) -> str:
+        return os.path.join(self.base_dir, "objetos", h[:2], f"{h}.xls.{codec}")
+
+    def guardar(self, id_estacion: str, contenido: bytes,
+                descargado: Optional[str] = None) -> str:
+        """Registra una descarga. Escribe el objeto solo si el hash es nuevo. Retorna el hash."""
+        h = hashlib.sha256(contenido).hexdigest()
+        descargado = descargado or datetime.now().isoformat(timespec="seconds")
+        with self._lock:
+            existe = self._conn.execute("SELECT 1 FROM objetos WHERE hash = ?", (h,)).fetchone()
+            if not existe:
+                codec = _codec()
+                datos = _comprimir(contenido, codec)
+                path = self._ruta_objeto(h, codec)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(datos)
+                os.replace(tmp, path)
+                self._conn.execute(
+                    "INSERT INTO objetos (hash, codec, bytes, bytes_comprimidos) VALUES (?, ?, ?, ?)",
+                    (h, codec, len(contenido), len(datos)),
+                )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO descargas (id_estacion, descargado, hash) VALUES (?, ?, ?)",
+                (str(id_estacion), descargado, h),
+            )
+            self._conn.commit()
+        return h
+
+    def obtener(self, h: str) -> bytes:
+        """Contenido crudo de un hash."""
+        with self._lock:
+            fila = self._conn.execute("SELECT codec FROM objetos WHERE hash = ?", (h,)).fetchone()
+        if fila is None:
+            raise KeyError(f"Hash no encontrado en el cache: {h}")
+        with open(self._ruta_objeto(h, fila[0]), "rb") as f:
+            return _descomprimir(f.read(), fila[0])
+
+    # --- índice --------------------------------------------------------------
+    def ultimo(self, id_estacion: str) -> Optional[dict]:
+        """Última descarga registrada de una estación (hash, descargado) o None."""
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT hash, descargado FROM descargas WHERE id_estacion = ? "
+                "ORDER BY descargado DESC LIMIT 1",
+                (str(id_estacion),),
+            ).fetchone()
+        return {"hash": fila[0], "descargado": fila[1]} if fila else None
+
+    def leer_ultimo(self, id_estacion: str) -> Optional[bytes]:
+        """Contenido de la última descarga de una estación, o None si no hay."""
+        u = self.ultimo(id_estacion)
+        return self.obtener(u["hash"]) if u else None
+
+    def estaciones(self) -> List[str]:
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT DISTINCT id_estacion FROM descargas ORDER BY id_estacion"
+            ).fetchall()
+        return [f[0] for f in filas]
+
+    def iterar_ultimos(self, ids: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, bytes]]:
+        """(id_estacion, bytes) de la última versión de cada estación; sin red."""
+        for id_est in (ids if ids is not None else self.estaciones()):
+            contenido = self.leer_ultimo(str(id_est))
+            if contenido is not None:
+                yield str(id_est), contenido
+
+    def importar_carpeta(self, carpeta: str) -> int:
+        """Importa .xls sueltos (<id>.xls) al cache. Retorna cuántos se importaron."""
+        if not os.path.isdir(carpeta):
+            return 0
+        n = 0
+        for nombre in sorted(os.listdir(carpeta)):
+            if not nombre.lower().endswith(".xls"):
+                continue
+            path = os.path.join(carpeta, nombre)
+            mtime = datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds")
+            with open(path, "rb") as f:
+                self.guardar(os.path.splitext(nombre)[0], f.read(), descargado=mtime)
+            n += 1
+        return n
+
+    def resumen(self) -> dict:
+        """Objetos, descargas y espacio ocupado vs. crudo."""
+        with self._lock:
+            obj, crudo, comp = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0), COALESCE(SUM(bytes_comprimidos), 0) FROM objetos"
+            ).fetchone()
+            desc = self._conn.execute("SELECT COUNT(*) FROM descargas").fetchone()[0]
+        return {"objetos": obj, "descargas": desc,
+                "mb_crudo": round(crudo / 1e6, 2), "mb_en_disco": round(comp / 1e6, 2)}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de transformaciones con cache por etapa
+------------------------------------------------
+run_eda_transformations recalcula siempre las 10 etapas, aunque solo se esté
+ajustando la última (p. ej. RAD_MAX_FISICO o DAY_HOURS). Acá el pipeline se
+declara como etapas con nombre, entrada (la etapa anterior) y parámetros
+explícitos, y la salida de cada etapa se guarda en disco (Arrow IPC).
+
+Clave de cada etapa = sha256(clave de su entrada + nombre + parámetros +
+código del módulo de la función y de los módulos de ETL/clima que importa,
+como interpolacion.py y ols.py). La clave de la primera etapa parte de la
+huella del DataFrame de entrada (pd.util.hash_pandas_object). Así, cambiar
+un parámetro cambia la clave de esa etapa y de las siguientes: se carga la
+última etapa cacheada antes del cambio y solo se corre lo que sigue.
+
+Índice SQLite con tamaño y último uso de cada salida; al superar el tope
+(CLIMA_CACHE_ETAPAS_MB) se borran las menos usadas recientemente (LRU).
+
+Estructura en disco:
+    <cache>/indice.sqlite
+    <cache>/<clave>.arrow
+"""
+
+from __future__ import annotations
+
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from ETL.clima import transform as T
+except ImportError:  # ejecución directa desde ETL/clima
+    import transform as T
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+ETAPAS_DIR = os.getenv(
+    "CLIMA_CACHE_ETAPAS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "cache-etapas"),
+)
+MAX_MB = float(os.getenv("CLIMA_CACHE_ETAPAS_MB", "2048"))
+
+DDL = """
+CREATE TABLE IF NOT EXISTS salidas (
+    clave   TEXT PRIMARY KEY,
+    etapa   TEXT NOT NULL,
+    bytes   INTEGER NOT NULL,
+    creado  REAL NOT NULL,
+    usado   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_salidas_usado ON salidas(usado);
+"""
+
+
+# =============================================================================
+# Etapas
+# =============================================================================
+
+@dataclass
+class Etapa:
+    """Una etapa del pipeline: función, si admite inplace y parámetros declarados."""
+    nombre: str
+    func: Callable[..., pd.DataFrame]
+    admite_inplace: bool = True
+    parametros: Dict[str, object] = field(default_factory=dict)
+
+    def correr(self, df: pd.DataFrame, inplace: bool = True, **override) -> pd.DataFrame:
+        kwargs = {**self.parametros, **override}
+        if self.admite_inplace:
+            return self.func(df, inplace=inplace, **kwargs)
+        return self.func(df, **kwargs)
+
+
+# Parámetros que se pueden ajustar sin tocar el código (los defaults del módulo)
+PARAMETROS: Dict[str, Dict[str, object]] = {
+    "transform_precipitacion": {"metodo": T.PRECIP_METODO, "max_hueco": T.PRECIP_MAX_HUECO},
+    "transform_radiacion_global": {"day_hours": T.DAY_HOURS, "rad_max_fisico": T.RAD_MAX_FISICO,
+                                   "min_reg_samples": T.MIN_REG_SAMPLES},
+    "transform_heliofania_cruzada": {"min_reg_samples": T.MIN_REG_SAMPLES},
+}
+
+
+def etapas(parametros: Optional[Mapping[str, Mapping[str, object]]] = None) -> List[Etapa]:
+    """Etapas de transform.ETAPAS con sus parámetros; `parametros` pisa los defaults por etapa."""
+    parametros = parametros or {}
+    desconocidas = set(parametros) - {nombre for nombre, _, _ in T.ETAPAS}
+    if desconocidas:
+        raise ValueError(f"Etapas desconocidas: {sorted(desconocidas)}")
+    return [Etapa(nombre, func, admite_inplace,
+                  {**PARAMETROS.get(nombre, {}), **dict(parametros.get(nombre, {}))})
+            for nombre, func, admite_inplace in T.ETAPAS]
+
+
+# =============================================================================
+# Claves
+# =============================================================================
+
+def huella(df: pd.DataFrame) -> str:
+    """Huella del contenido (valores, índice, columnas y tipos) de un DataFrame."""
+    h = hashlib.sha256()
+    h.update(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+_CODIGO: Dict[str, str] = {}
+
+
+def _fuente(objeto) -> Optional[str]:
+    """Archivo fuente de un módulo, función o clase (None si no tiene)."""
+    try:
+        return inspect.getsourcefile(objeto if inspect.ismodule(objeto) else inspect.getmodule(objeto))
+    except TypeError:
+        return None
+
+
+def _archivos_codigo(func: Callable) -> List[str]:
+    """
+    Archivo del módulo de la función y, transitivamente, los de los módulos
+    de la misma carpeta que importa (p. ej. transform -> interpolacion, ols):
+    las etapas delegan en ellos.
+    """
+    inicio = _fuente(func)
+    if inicio is None:
+        return []
+    carpeta = os.path.dirname(inicio)
+    archivos, pendientes = set(), [inspect.getmodule(func)]
+    while pendientes:
+        modulo = pendientes.pop()
+        archivo = _fuente(modulo)
+        if archivo is None or archivo in archivos:
+            continue
+        archivos.add(archivo)
+        for valor in vars(modulo).values():
+            f = _fuente(valor)
+            if f and f not in archivos and os.path.dirname(f) == carpeta:
+                pendientes.append(valor if inspect.ismodule(valor) else inspect.getmodule(valor))
+    return sorted(archivos)
+
+
+def _huella_codigo(func: Callable) -> str:
+    """
+    Hash de los archivos fuente de los que depende la función (su módulo y
+    los módulos hermanos que importa): cambia si se edita cualquiera.
+    """
+    clave = func.__module__
+    if clave not in _CODIGO:
+        h = hashlib.sha256()
+        archivos = _archivos_codigo(func)
+        for archivo in archivos:
+            h.update(os.path.basename(archivo).encode())
+            try:
+                with open(archivo, "rb") as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(archivo.encode())
+        _CODIGO[clave] = h.hexdigest() if archivos else func.__module__
+    return _CODIGO[clave]
+
+
+def clave_etapa(clave_entrada: str, etapa: Etapa) -> str:
+    contenido = json.dumps({
+        "entrada": clave_entrada,
+        "etapa": etapa.nombre,
+        "parametros": {k: repr(v) for k, v in sorted(etapa.parametros.items())},
+        "codigo": _huella_codigo(etapa.func),
+    }, sort_keys=True)
+    return hashlib.sha256(contenido.encode()).hexdigest()
+
+
+# =============================================================================
+# Cache en disco
+# =============================================================================
+
+class CacheEtapas:
+    """Salidas de etapas en Arrow IPC, con índice SQLite y desalojo LRU por tamaño."""
+
+    def __init__(self, base_dir: str = ETAPAS_DIR, max_mb: float = MAX_MB):
+        self.base_dir = os.path.abspath(base_dir)
+        self.max_bytes = int(max_mb * 2**20)
+        os.makedirs(self.base_dir, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(self.base_dir, "indice.sqlite"))
+        self._conn.executescript(DDL)
+
+    def ruta(self, clave: str) -> str:
+        return os.path.join(self.base_dir, f"{clave}.arrow")
+
+    def tiene(self, clave: str) -> bool:
+        fila = self._conn.execute("SELECT 1 FROM salidas WHERE clave = ?", (clave,)).fetchone()
+        return fila is not None and os.path.exists(self.ruta(clave))
+
+    def cargar(self, clave: str) -> pd.DataFrame:
+        with pa.memory_map(self.ruta(clave), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        self._conn.execute("UPDATE salidas SET usado = ? WHERE clave = ?", (time.time(), clave))
+        self._conn.commit()
+        return table.to_pandas()
+
+    def guardar(self, clave: str, etapa: str, df: pd.DataFrame) -> None:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        path = self.ruta(clave)
+        tmp = f"{path}.tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+        ahora = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO salidas (clave, etapa, bytes, creado, usado) VALUES (?, ?, ?, ?, ?)",
+            (clave, etapa, os.path.getsize(path), ahora, ahora),
+        )
+        self._conn.commit()
+        self.desalojar()
+
+    def desalojar(self) -> int:
+        """Borra las salidas menos usadas hasta quedar bajo el tope. Retorna cuántas borró."""
+        total = self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM salidas").fetchone()[0]
+        borradas = 0
+        for clave, tam in self._conn.execute("SELECT clave, bytes FROM salidas ORDER BY usado").fetchall():
+            if total <= self.max_bytes:
+                break
+            if os.path.exists(self.ruta(clave)):
+                os.remove(self.ruta(clave))
+            self._conn.execute("DELETE FROM salidas WHERE clave = ?", (clave,))
+            total -= tam
+            borradas += 1
+        self._conn.commit()
+        return borradas
+
+    def limpiar(self) -> None:
+        for (clave,) in self._conn.execute("SELECT clave FROM salidas").fetchall():
+            if os.path.exists(self.ruta(clave)):
+                os.remove(self.ruta(clave))
+        self._conn.execute("DELETE FROM salidas")
+        self._conn.commit()
+
+    def resumen(self) -> dict:
+        n, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM salidas").fetchone()
+        return {"salidas": n, "mb": round(total / 2**20, 1), "max_mb": round(self.max_bytes / 2**20, 1)}
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================================================
+# Ejecución
+# =============================================================================
+
+def run_eda_cacheado(df: pd.DataFrame,
+                     parametros: Optional[Mapping[str, Mapping[str, object]]] = None,
+                     cache: Optional[CacheEtapas] = None) -> Tuple[pd.DataFrame, List[dict]]:
+    """
+    Igual que run_eda_transformations, reutilizando salidas cacheadas.
+    `parametros` = {nombre_etapa: {parámetro: valor}} pisa los declarados.
+    Retorna (DataFrame, reporte) con una fila por etapa: nombre, clave y
+    estado en {"cache", "calculada", "omitida"} ("omitida": no hizo falta
+    porque una etapa posterior estaba en cache).
+    """
+    lista = etapas(parametros)
+    propio = cache is None
+    cache = cache or CacheEtapas()
+    try:
+        claves, clave = [], huella(df)
+        for etapa in lista:
+            clave = clave_etapa(clave, etapa)
+            claves.append(clave)
+
+        # la última etapa ya cacheada: desde ahí se sigue
+        desde = next((i for i in range(len(lista) - 1, -1, -1) if cache.tiene(claves[i])), None)
+        reporte = []
+        if desde is None:
+            out, inicio, recien_cargado = df.copy(deep=False), 0, False
+        else:
+            out, inicio, recien_cargado = cache.cargar(claves[desde]), desde + 1, True
+            reporte = [{"etapa": e.nombre, "clave": c[:12], "estado": "omitida", "segundos": 0.0}
+                       for e, c in zip(lista[:desde], claves[:desde])]
+            reporte.append({"etapa": lista[desde].nombre, "clave": claves[desde][:12],
+                            "estado": "cache", "segundos": 0.0})
+
+        for etapa, clave in zip(lista[inicio:], claves[inicio:]):
+            t0 = time.perf_counter()
+            # lo cargado de Arrow puede compartir buffers de solo lectura: la
+            # primera etapa después de cargar trabaja sobre una copia
+            out = etapa.correr(out, inplace=not recien_cargado)
+            recien_cargado = False
+            cache.guardar(clave, etapa.nombre, out)
+            reporte.append({"etapa": etapa.nombre, "clave": clave[:12], "estado": "calculada",
+                            "segundos": round(time.perf_counter() - t0, 3)})
+        return out, reporte
+    finally:
+        if propio:
+            cache.close()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de series parseadas por estación (Arrow IPC)
+--------------------------------------------------
+Guarda la serie ya parseada y con columnas normalizadas de cada estación en
+un archivo Arrow IPC, con nombre igual al hash del XLS crudo que la originó
+(el mismo hash que registra el manifiesto).
+
+- Invalidación automática: si la estación cambia, cambia el hash y el archivo
+  anterior deja de usarse (`purgar` borra los huérfanos).
+- Lectura zero-copy con pyarrow.memory_map: cargar unas pocas estaciones no
+  requiere leer ni descomprimir el parquet completo.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable, List, Mapping, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    from ETL.clima.escritura import ruta_particion
+except ImportError:  # ejecución directa desde ETL/clima
+    from escritura import ruta_particion
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+SERIES_DIR = os.getenv(
+    "INTA_SERIES_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "cache-arrow"),
+)
+
+
+# =============================================================================
+# Cache
+# =============================================================================
+
+class CacheSeries:
+    """Series por estación en Arrow IPC, direccionadas por hash del crudo."""
+
+    def __init__(self, base_dir: str = SERIES_DIR):
+        self.base_dir = os.path.abspath(base_dir)
+        os.makedirs(self.base_dir, exist_ok=True)
+
+    def ruta(self, h: str) -> str:
+        return os.path.join(self.base_dir, f"{h}.arrow")
+
+    def tiene(self, h: Optional[str]) -> bool:
+        return bool(h) and os.path.exists(self.ruta(h))
+
+    def guardar(self, h: str, df: pd.DataFrame, id_estacion: Optional[str] = None) -> str:
+        """Escribe la serie (columnas en minúscula, como normalize_columns)."""
+        out = df.rename(columns=lambda c: str(c).lower().strip())
+        if id_estacion is not None:
+            out = out.assign(id_estacion=str(id_estacion))
+        table = pa.Table.from_pandas(out, preserve_index=False)
+        path = self.ruta(h)
+        tmp = f"{path}.tmp"
+        with pa.OSFile(tmp, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+        return path
+
+    def cargar(self, h: str, columns: Optional[List[str]] = None) -> pa.Table:
+        """Lee la serie mapeando el archivo en memoria (sin copiar buffers)."""
+        with pa.memory_map(self.ruta(h), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.column_names])
+        return table
+
+    def cargar_estaciones(self, manifiesto: Mapping[str, dict],
+                          ids: Optional[Iterable[str]] = None,
+                          columns: Optional[List[str]] = None,
+                          particiones_dir: Optional[str] = None) -> pd.DataFrame:
+        """
+        Une las series de las estaciones pedidas (todas las del manifiesto si
+        ids es None). Si una estación no está en cache y se indica
+        `particiones_dir`, se completa desde su partición Parquet; si no, se omite.
+        """
+        ids = [str(i) for i in (ids if ids is not None else manifiesto.keys())]
+        tablas = []
+        for id_est in ids:
+            h = (manifiesto.get(id_est) or {}).get("hash")
+            if h and not self.tiene(h) and particiones_dir:
+                path = ruta_particion(particiones_dir, id_est)
+                if os.path.exists(path):
+                    self.guardar(h, pd.read_parquet(path), id_estacion=id_est)
+            if not self.tiene(h):
+                print(f"{id_est}: sin serie en cache, se omite.")
+                continue
+            tablas.append(self.cargar(h, columns))
+        if not tablas:
+            return pd.DataFrame()
+        return pa.concat_tables(tablas, promote_options="permissive").to_pandas()
+
+    def purgar(self, vigentes: Iterable[str]) -> int:
+        """Borra archivos cuyo hash ya no figura entre los vigentes."""
+        vigentes = set(vigentes)
+        borrados = 0
+        for nombre in os.listdir(self.base_dir):
+            h, ext = os.path.splitext(nombre)
+            if ext == ".arrow" and h not in vigentes:
+                os.remove(os.path.join(self.base_dir, nombre))
+                borrados += 1
+        return borrados
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Dimensión calendario compartida por los cargadores
+--------------------------------------------------
+Una sola definición de la tabla calendario para load.py, baseDatos.py y
+los benchmarks (antes: un to_sql por año en load.create_calendario_table y
+data/calendario.csv en lotes de 1000 filas en baseDatos.py).
+
+construir_calendario genera todo el rango en una pasada vectorizada con las
+columnas de data/calendario.csv:
+
+    IdFecha (YYYYMMDD), fecha, dia, mes, anio, trimestre, semestre,
+    quincena (1-2: el día 31 va en la 2, no en una tercera),
+    semanaMes (1-4: el día 29 en adelante cuenta en la 4), semana (ISO),
+    diaSemana ('Lunes'..'Domingo'), diaNumeroSemana (lunes = 0), bisiesto
+
+más la semana y el año epidemiológicos (semanal.semana_epidemiologica, de
+domingo a sábado: distintos de isocalendar().week, que va de lunes a
+domingo y numera distinto los bordes del año).
+
+cargar_calendario inserta con un único executemany precompilado en una
+transacción, solo las columnas que tiene la tabla (bases creadas con el
+esquema anterior siguen funcionando) y es idempotente: si la tabla ya tiene
+todas las fechas del rango no hace nada, y si no completa las que faltan
+(INSERT ... ON CONFLICT (IdFecha) DO UPDATE).
+"""
+
+import logging
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+try:
+    from ETL.clima.carga_masiva import upsert_masivo
+    from ETL.clima.semanal import semana_epidemiologica
+except ImportError:  # ejecución directa desde ETL/clima
+    from carga_masiva import upsert_masivo
+    from semanal import semana_epidemiologica
+
+# Configuración de logging
+log = logging.getLogger(__name__)
+
+DESDE = "1900-01-01"
+HASTA = "2100-12-31"
+DIAS_SEMANA = np.array(["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"],
+                       dtype=object)
+
+
+def construir_calendario(desde: str = DESDE, hasta: str = HASTA) -> pd.DataFrame:
+    """Una fila por día entre `desde` y `hasta` (inclusive), sin bucles por año."""
+    fechas = pd.date_range(desde, hasta, freq="D")
+    dias = fechas.values.astype("datetime64[D]")
+    anio = dias.astype("datetime64[Y]").astype(np.int64) + 1970
+    mes = dias.astype("datetime64[M]").astype(np.int64) % 12 + 1
+    dia = (dias - dias.astype("datetime64[M]")).astype(np.int64) + 1
+    dia_semana = (dias.astype(np.int64) + 3) % 7            # 1970-01-01 fue jueves (3)
+    anio_epi, semana_epi = semana_epidemiologica(fechas)
+    bisiesto = (anio % 4 == 0) & ((anio % 100 != 0) | (anio % 400 == 0))
+    return pd.DataFrame({
+        "IdFecha": anio * 10000 + mes * 100 + dia,
+        "fecha": np.datetime_as_string(dias, unit="D").astype(object),
+        "dia": dia,
+        "mes": mes,
+        "anio": anio,
+        "trimestre": (mes - 1) // 3 + 1,
+        "semestre": (mes - 1) // 6 + 1,
+        "quincena": np.where(dia <= 15, 1, 2),
+        "semanaMes": np.minimum((dia - 1) // 7 + 1, 4),
+        "semana": fechas.isocalendar().week.to_numpy(np.int64),
+        "diaSemana": DIAS_SEMANA[dia_semana],
+        "diaNumeroSemana": dia_semana,
+        "bisiesto": bisiesto.astype(np.int64),
+        "semana_epidemiologica": semana_epi.astype(np.int64),
+        "anio_epidemiologico": anio_epi.astype(np.int64),
+    })
+
+
+def cargar_calendario(destino, desde: str = DESDE, hasta: str = HASTA) -> Dict[str, float]:
+    """
+    Puebla la tabla calendario con el rango pedido (Engine o Connection en
+    transacción). Retorna {filas, segundos}; filas = 0 si ya estaba completa.
+    """
+    if hasattr(destino, "begin") and not hasattr(destino, "in_transaction"):
+        with destino.begin() as conn:
+            return cargar_calendario(conn, desde, hasta)
+
+    t0 = time.perf_counter()
+    id_desde = int(pd.Timestamp(desde).strftime("%Y%m%d"))
+    id_hasta = int(pd.Timestamp(hasta).strftime("%Y%m%d"))
+    esperadas = len(pd.date_range(desde, hasta, freq="D"))
+    existentes = destino.execute(text(
+        "SELECT COUNT(*) FROM calendario WHERE IdFecha BETWEEN :desde AND :hasta"
+    ), {"desde": id_desde, "hasta": id_hasta}).scalar()
+    if existentes >= esperadas:
+        log.info(f"Tabla calendario ya poblada ({existentes} fechas entre {desde} y {hasta})")
+        return {"filas": 0, "segundos": round(time.perf_counter() - t0, 3)}
+
+    df = construir_calendario(desde, hasta)
+    resumen = upsert_masivo(destino, "calendario", df, ["IdFecha"], lote=len(df))
+    segundos = time.perf_counter() - t0
+    log.info(f"Tabla calendario poblada con {resumen['filas']} fechas en {segundos:.2f}s")
+    return {"filas": resumen["filas"], "segundos": round(segundos, 3)}
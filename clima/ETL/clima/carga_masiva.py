@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Carga masiva a SQLite: upsert por lotes con una sentencia precompilada
+---------------------------------------------------------------------
+Reemplaza el patrón "una sentencia insert(...).on_conflict_do_update por
+fila" (iterrows + compilación de SQLAlchemy en cada vuelta) por:
+
+- una única sentencia
+      INSERT INTO t (c1, ..., cn) VALUES (?, ..., ?)
+      ON CONFLICT (clave) DO UPDATE SET c = excluded.c, ...
+  que sqlite3 prepara una vez y reutiliza en `executemany`;
+- lotes de LOTE filas convertidas columna por columna a tuplas de tipos de
+  Python (NaN/NaT -> NULL), sin pasar por objetos Series por fila;
+- todo dentro de la transacción del llamador (o una sola si se pasa un engine).
+
+Se reportan las filas/s de cada lote y del total.
+
+upsert_parquet hace lo mismo leyendo un Parquet por record batches de
+pyarrow (renombra columnas, calcula IdFecha y mapea la estación lote por
+lote): la memoria queda acotada por el tamaño del lote y no por el archivo.
+
+Para la primera carga completa de una base (tabla de hechos vacía) está
+además modo_carga_masiva: posterga los índices secundarios (los borra y los
+vuelve a crear al final, una sola pasada de ordenamiento por índice en vez
+de mantenerlos fila por fila), ajusta los PRAGMA de SQLite (WAL, sin fsync,
+cache grande, temporales en memoria) y corre la carga en una transacción;
+al salir reconstruye los índices, corre ANALYZE y restaura los PRAGMA.
+"""
+
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+# Configuración de logging
+log = logging.getLogger(__name__)
+
+LOTE = 50_000
+CACHE_MB = int(os.getenv("CLIMA_SQLITE_CACHE_MB", "512"))
+# PRAGMA del modo carga masiva (cache_size negativo = KiB)
+PRAGMAS_CARGA = {
+    "journal_mode": "WAL",
+    "synchronous": "OFF",
+    "cache_size": str(-CACHE_MB * 1024),
+    "temp_store": "MEMORY",
+}
+
+
+# =============================================================================
+# Sentencias y conversión de filas
+# =============================================================================
+
+def columnas_tabla(conn, tabla: str) -> List[str]:
+    """Columnas de la tabla en la base (PRAGMA table_info)."""
+    return [fila[1] for fila in conn.execute(text(f'PRAGMA table_info("{tabla}")'))]
+
+
+def sql_upsert(tabla: str, columnas: Sequence[str], clave: Sequence[str],
+               actualizar: Optional[Sequence[str]] = None) -> str:
+    """
+    INSERT ... ON CONFLICT (clave) DO UPDATE con parámetros posicionales.
+    `actualizar` (por defecto todas las columnas que no son clave) vacío
+    deja DO NOTHING; sin `clave` es un INSERT simple.
+    """
+    if actualizar is None:
+        actualizar = [c for c in columnas if c not in clave]
+    cols = ", ".join(f'"{c}"' for c in columnas)
+    marcas = ", ".join("?" for _ in columnas)
+    sql = f'INSERT INTO "{tabla}" ({cols}) VALUES ({marcas})'
+    if not clave:
+        return sql
+    sql += f' ON CONFLICT ({", ".join(clave)}) DO '
+    if not actualizar:
+        return sql + "NOTHING"
+    return sql + "UPDATE SET " + ", ".join(f'"{c}" = excluded."{c}"' for c in actualizar)
+
+
+def _a_python(serie: pd.Series) -> list:
+    """Lista de valores de Python de una columna, con None en los nulos."""
+    if pd.api.types.is_datetime64_any_dtype(serie.dtype):
+        valores = serie.dt.strftime("%Y-%m-%d").to_numpy(dtype=object)
+    elif isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = serie.astype(object).to_numpy()
+    else:
+        valores = serie.to_numpy()
+    nulos = pd.isna(valores)
+    if valores.dtype.kind in "iub" or not nulos.any():
+        return valores.tolist()
+    valores = valores.astype(object)
+    valores[nulos] = None
+    return valores.tolist()
+
+
+def filas(df: pd.DataFrame, columnas: Sequence[str], lote: int = LOTE) -> Iterator[list]:
+    """Lotes de tuplas (una por fila) en el orden de `columnas`."""
+    for i in range(0, len(df), lote):
+        parte = df.iloc[i:i + lote]
+        yield list(zip(*(_a_python(parte[c]) for c in columnas)))
+
+
+# =============================================================================
+# Upsert
+# =============================================================================
+
+def _cursor(conn):
+    """Cursor DBAPI (sqlite3) de una Connection de SQLAlchemy o de una conexión sqlite3."""
+    dbapi = getattr(conn, "connection", conn)
+    return dbapi.cursor()
+
+
+def upsert_masivo(destino, tabla: str, df: pd.DataFrame, clave: Sequence[str],
+                  actualizar: Optional[Sequence[str]] = None,
+                  lote: int = LOTE) -> Dict[str, float]:
+    """
+    Inserta o actualiza `df` en `tabla` por lotes con executemany (sin
+    `clave`, solo inserta). Solo se usan las columnas de `df` que existen
+    en la tabla. `destino` puede ser
+    un Engine (una transacción para toda la carga) o una Connection ya en
+    transacción. Retorna {filas, lotes, segundos, filas_por_s}.
+    """
+    if hasattr(destino, "begin") and not hasattr(destino, "in_transaction"):
+        with destino.begin() as conn:
+            return upsert_masivo(conn, tabla, df, clave, actualizar, lote)
+
+    existentes = set(columnas_tabla(destino, tabla))
+    columnas = [c for c in df.columns if c in existentes]
+    faltan = [c for c in clave if c not in columnas]
+    if faltan:
+        raise ValueError(f"faltan columnas de la clave {faltan} para {tabla}")
+    ignoradas = [c for c in df.columns if c not in existentes]
+    if ignoradas:
+        log.info(f"{tabla}: columnas sin lugar en la tabla, se ignoran: {ignoradas}")
+    if actualizar is not None:
+        actualizar = [c for c in actualizar if c in columnas]
+
+    sql = sql_upsert(tabla, columnas, clave, actualizar)
+    cur = _cursor(destino)
+    total, n_lotes, t0 = 0, 0, time.perf_counter()
+    try:
+        for parametros in filas(df, columnas, lote):
+            t_lote = time.perf_counter()
+            cur.executemany(sql, parametros)
+            n_lotes += 1
+            total += len(parametros)
+            seg = time.perf_counter() - t_lote
+            log.info(f"{tabla}: lote {n_lotes} ({len(parametros)} filas) "
+                     f"{len(parametros) / seg if seg > 0 else float('inf'):,.0f} filas/s")
+    finally:
+        cur.close()
+    segundos = time.perf_counter() - t0
+    filas_por_s = total / segundos if segundos > 0 else float("inf")
+    log.info(f"{tabla}: {total} filas en {segundos:.2f}s ({filas_por_s:,.0f} filas/s)")
+    return {"filas": total, "lotes": n_lotes, "segundos": round(segundos, 3),
+            "filas_por_s": round(filas_por_s, 1)}
+
+
+def id_fecha(fechas: pd.Series) -> pd.Series:
+    """IdFecha YYYYMMDD (Int64, nulo si la fecha no se puede interpretar)."""
+    fechas = pd.to_datetime(fechas, errors="coerce")
+    return (fechas.dt.year * 10000 + fechas.dt.month * 100 + fechas.dt.day).astype("Int64")
+
+
+def upsert_parquet(destino, tabla: str, path: str, clave: Sequence[str],
+                   renombrar: Optional[Mapping[str, str]] = None,
+                   columna_fecha: str = "fecha",
+                   columna_estacion: str = "id_estacion",
+                   estaciones: Optional[Mapping] = None,
+                   actualizar: Optional[Sequence[str]] = None,
+                   lote: int = LOTE) -> Dict[str, float]:
+    """
+    upsert_masivo en streaming desde un Parquet: lee record batches de
+    `lote` filas, renombra con `renombrar` (columna del Parquet -> columna
+    de la tabla), agrega IdFecha desde `columna_fecha` e IdEstacion mapeando
+    `columna_estacion` con `estaciones` (si se pasa), y escribe cada lote
+    con la misma sentencia precompilada. Las filas sin fecha o con estación
+    fuera del mapeo se descartan y se cuentan.
+    Retorna {filas, descartadas, lotes, segundos, filas_por_s}.
+    """
+    if hasattr(destino, "begin") and not hasattr(destino, "in_transaction"):
+        with destino.begin() as conn:
+            return upsert_parquet(conn, tabla, path, clave, renombrar, columna_fecha,
+                                  columna_estacion, estaciones, actualizar, lote)
+
+    renombrar = dict(renombrar or {})
+    archivo = pq.ParquetFile(path)
+    existentes = set(columnas_tabla(destino, tabla))
+    # columnas calculadas en cada lote; del Parquet solo se leen las que terminan en la tabla
+    propias = (["IdEstacion"] if estaciones is not None else []) + ["IdFecha"]
+    origen = [c for c in archivo.schema_arrow.names
+              if renombrar.get(c, c) in existentes and renombrar.get(c, c) not in propias]
+    leer = list(dict.fromkeys(origen + [columna_fecha]
+                              + ([columna_estacion] if estaciones is not None else [])))
+    columnas = propias + [renombrar.get(c, c) for c in origen]
+    faltan = [c for c in clave if c not in columnas]
+    if faltan:
+        raise ValueError(f"faltan columnas de la clave {faltan} para {tabla} en {path}")
+    if actualizar is not None:
+        actualizar = [c for c in actualizar if c in columnas]
+
+    sql = sql_upsert(tabla, columnas, clave, actualizar)
+    cur = _cursor(destino)
+    total, descartadas, n_lotes, t0 = 0, 0, 0, time.perf_counter()
+    log.info(f"{tabla}: {path} ({archivo.metadata.num_rows} filas) en lotes de {lote}")
+    try:
+        for batch in archivo.iter_batches(batch_size=lote, columns=leer):
+            t_lote = time.perf_counter()
+            df = batch.to_pandas()
+            ids = id_fecha(df[columna_fecha])
+            if estaciones is not None:
+                est = df[columna_estacion].map(estaciones)
+            df = df[origen].rename(columns=renombrar)
+            df["IdFecha"] = ids
+            validas = ids.notna()
+            if estaciones is not None:
+                df["IdEstacion"] = est
+                validas &= est.notna()
+            df = df.loc[validas.to_numpy(), columnas]
+            if estaciones is not None:
+                df["IdEstacion"] = df["IdEstacion"].astype(np.int64)
+            df["IdFecha"] = df["IdFecha"].astype(np.int64)
+
+            parametros = next(filas(df, columnas, len(df)), [])
+            cur.executemany(sql, parametros)
+            n_lotes += 1
+            total += len(parametros)
+            descartadas += batch.num_rows - len(parametros)
+            seg = time.perf_counter() - t_lote
+            log.info(f"{tabla}: lote {n_lotes} ({len(parametros)} filas, "
+                     f"{batch.num_rows - len(parametros)} descartadas) "
+                     f"{len(parametros) / seg if seg > 0 else float('inf'):,.0f} filas/s")
+    finally:
+        cur.close()
+    segundos = time.perf_counter() - t0
+    filas_por_s = total / segundos if segundos > 0 else float("inf")
+    log.info(f"{tabla}: {total} filas ({descartadas} descartadas) en {segundos:.2f}s "
+             f"({filas_por_s:,.0f} filas/s)")
+    return {"filas": total, "descartadas": descartadas, "lotes": n_lotes,
+            "segundos": round(segundos, 3), "filas_por_s": round(filas_por_s, 1)}
+
+
+# =============================================================================
+# Modo carga masiva
+# =============================================================================
+
+def indices_secundarios(conn, tablas: Optional[Sequence[str]] = None) -> List[Tuple[str, str]]:
+    """
+    (nombre, CREATE INDEX ...) de los índices creados explícitamente sobre
+    `tablas` (todas si es None). Los automáticos de PRIMARY KEY/UNIQUE no
+    tienen sql y no se tocan.
+    """
+    filas_idx = conn.execute(text(
+        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    )).fetchall()
+    return [(nombre, sql) for nombre, tabla, sql in filas_idx if tablas is None or tabla in tablas]
+
+
+@contextmanager
+def modo_carga_masiva(engine, tablas: Optional[Sequence[str]] = None,
+                      pragmas: Optional[Dict[str, str]] = None) -> Iterator:
+    """
+    Connection en transacción para cargar `tablas` sin índices secundarios
+    y con los PRAGMA de carga. Al salir (también si la carga falla) vuelve
+    a crear los índices, corre ANALYZE y restaura los PRAGMA anteriores.
+    """
+    pragmas = PRAGMAS_CARGA if pragmas is None else pragmas
+    with engine.connect() as conn:
+        # los PRAGMA de journal/synchronous no se pueden cambiar dentro de una transacción
+        previos = {p: conn.exec_driver_sql(f"PRAGMA {p}").scalar() for p in pragmas}
+        for p, valor in pragmas.items():
+            conn.exec_driver_sql(f"PRAGMA {p} = {valor}")
+        indices = indices_secundarios(conn, tablas)
+        for nombre, _ in indices:
+            conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{nombre}"')
+        conn.commit()
+        log.info(f"Carga masiva: {len(indices)} índices postergados {[n for n, _ in indices]}, "
+                 f"PRAGMA {pragmas}")
+
+        t0 = time.perf_counter()
+        try:
+            with conn.begin():
+                yield conn
+        finally:
+            t_carga = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            for _, sql in indices:
+                conn.exec_driver_sql(sql)
+            conn.exec_driver_sql("ANALYZE")
+            conn.commit()
+            t_indices = time.perf_counter() - t0
+            for p, valor in previos.items():
+                conn.exec_driver_sql(f"PRAGMA {p} = {valor}")
+            conn.commit()
+            log.info(f"Carga masiva: carga {t_carga:.2f}s, índices + ANALYZE {t_indices:.2f}s")
@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Descarga concurrente de series INTA
+-----------------------------------
+Descarga los históricos de varias estaciones en paralelo (pool de hilos)
+respetando un límite global de pedidos por segundo (token bucket), en lugar
+de la pausa fija de 5 segundos entre estaciones.
+
+Notas:
+- Un error en una estación no detiene al resto: queda registrado en su
+  ResultadoDescarga y el proceso sigue.
+- Se reporta latencia por estación y throughput (estaciones/s y MB/s).
+- La URL base se toma de INTA_BASE_URL, lo que permite apuntar a un servidor
+  HTTP local que sirva archivos .xls de prueba.
+- ClienteINTA mantiene una sesión HTTP con pool de conexiones keep-alive y
+  reintenta 429/5xx/timeouts con backoff exponencial + jitter, respetando
+  Retry-After. Lo usan extract.py y scripts/main.py.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+BASE_URL = os.getenv("INTA_BASE_URL", "https://siga.inta.gob.ar/document/series")
+DEFAULT_WORKERS = int(os.getenv("INTA_WORKERS", "4"))       # descargas simultáneas
+DEFAULT_RATE = float(os.getenv("INTA_RATE", "1.0"))         # pedidos por segundo (global)
+DEFAULT_BURST = int(os.getenv("INTA_BURST", "2"))           # ráfaga máxima permitida
+DEFAULT_RETRIES = int(os.getenv("INTA_RETRIES", "4"))       # reintentos por estación
+DEFAULT_TIMEOUT = float(os.getenv("INTA_TIMEOUT", "60"))    # segundos por pedido
+BACKOFF_BASE = 1.0                                          # segundos del primer reintento
+BACKOFF_MAX = 60.0                                          # tope de espera entre reintentos
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+HEADERS_BASE = {
+    'accept': '*/*',
+    'accept-language': 'es-419,es;q=0.7',
+    'priority': 'u=0, i',
+    'sec-ch-ua': '"Chromium";v="140", "Not=A?Brand";v="24", "Brave";v="140"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+    'sec-fetch-dest': 'empty',
+    'sec-fetch-mode': 'cors',
+    'sec-fetch-site': 'same-origin',
+    'sec-gpc': '1',
+}
+
+
+# =============================================================================
+# Limitador de tasa
+# =============================================================================
+
+class TokenBucket:
+    """
+    Token bucket compartido entre hilos.
+    Se recargan `rate` fichas por segundo hasta `capacity`; cada pedido
+    consume una ficha y espera si no hay disponibles.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate debe ser mayor a 0")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self) -> float:
+        """Bloquea hasta obtener una ficha. Retorna los segundos esperados."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                pause = (1 - self._tokens) / self.rate
+            time.sleep(pause)
+            waited += pause
+
+
+# =============================================================================
+# Cliente HTTP con pool y reintentos
+# =============================================================================
+
+def _retry_after(response) -> Optional[float]:
+    """Segundos indicados por el header Retry-After (número o fecha HTTP)."""
+    valor = response.headers.get("Retry-After") if response is not None else None
+    if not valor:
+        return None
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ClienteINTA:
+    """
+    Sesión HTTP compartida para descargar series del INTA.
+      - Pool de conexiones keep-alive (evita un handshake TLS por estación).
+      - Reintentos ante 429/5xx, timeouts y errores de conexión con backoff
+        exponencial y jitter; si el servidor envía Retry-After se respeta.
+    `user_agent` puede ser un string o una función que devuelva uno por pedido.
+    """
+
+    def __init__(self,
+                 user_agent: Union[str, Callable[[], str], None] = None,
+                 base_url: str = BASE_URL,
+                 pool_size: int = DEFAULT_WORKERS,
+                 max_reintentos: int = DEFAULT_RETRIES,
+                 timeout: float = DEFAULT_TIMEOUT,
+                 backoff_base: float = BACKOFF_BASE,
+                 backoff_max: float = BACKOFF_MAX):
+        self.user_agent = user_agent
+        self.base_url = base_url
+        self.max_reintentos = max_reintentos
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS_BASE)
+        if isinstance(user_agent, str):
+            self.session.headers['user-agent'] = user_agent
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _espera(self, intento: int, response=None) -> float:
+        ra = _retry_after(response)
+        if ra is not None:
+            return min(ra, self.backoff_max)
+        tope = min(self.backoff_max, self.backoff_base * (2 ** intento))
+        return random.uniform(tope / 2, tope)
+
+    def obtener(self, id_estacion: str):
+        """GET de la serie de una estación con reintentos. Retorna el último response."""
+        headers = {'user-agent': self.user_agent()} if callable(self.user_agent) else None
+        url = url_estacion(id_estacion, self.base_url)
+        for intento in range(self.max_reintentos + 1):
+            ultimo = intento == self.max_reintentos
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError):
+                if ultimo:
+                    raise
+                time.sleep(self._espera(intento))
+                continue
+            if response.status_code not in RETRY_STATUS or ultimo:
+                return response
+            time.sleep(self._espera(intento, response))
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =============================================================================
+# Resultados y métricas
+# =============================================================================
+
+@dataclass
+class ResultadoDescarga:
+    """Resultado de la descarga de una estación."""
+    id_estacion: str
+    status: Optional[int] = None
+    contenido: Optional[bytes] = None
+    latencia: float = 0.0          # segundos del pedido HTTP
+    espera: float = 0.0            # segundos esperando al limitador
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200 and self.contenido is not None
+
+    @property
+    def bytes(self) -> int:
+        return len(self.contenido) if self.contenido is not None else 0
+
+
+@dataclass
+class MetricasDescarga:
+    """Acumula latencias y volumen para reportar throughput al final."""
+    inicio: float = field(default_factory=time.monotonic)
+    fin: Optional[float] = None
+    latencias: List[float] = field(default_factory=list)
+    total_bytes: int = 0
+    ok: int = 0
+    errores: int = 0
+
+    def registrar(self, res: ResultadoDescarga) -> None:
+        self.latencias.append(res.latencia)
+        self.total_bytes += res.bytes
+        if res.ok:
+            self.ok += 1
+        else:
+            self.errores += 1
+
+    def resumen(self) -> dict:
+        duracion = (self.fin or time.monotonic()) - self.inicio
+        lat = sorted(self.latencias)
+        n = len(lat)
+        return {
+            "estaciones": n,
+            "ok": self.ok,
+            "errores": self.errores,
+            "duracion_s": round(duracion, 2),
+            "estaciones_por_s": round(n / duracion, 3) if duracion > 0 else None,
+            "mb_por_s": round(self.total_bytes / 1e6 / duracion, 3) if duracion > 0 else None,
+            "latencia_media_s": round(sum(lat) / n, 3) if n else None,
+            "latencia_p50_s": round(lat[n // 2], 3) if n else None,
+            "latencia_max_s": round(lat[-1], 3) if n else None,
+        }
+
+
+# =============================================================================
+# Descarga concurrente
+# =============================================================================
+
+def url_estacion(id_estacion: str, base_url: str = BASE_URL) -> str:
+    """URL de la serie histórica (.xls) de una estación."""
+    return f"{base_url.rstrip('/')}/{id_estacion}.xls"
+
+
+def _descargar_una(id_estacion: str, fetch: Callable, bucket: Optional[TokenBucket]) -> ResultadoDescarga:
+    res = ResultadoDescarga(id_estacion=id_estacion)
+    if bucket is not None:
+        res.espera = bucket.acquire()
+    t0 = time.perf_counter()
+    try:
+        response = fetch(id_estacion)
+        if response is None:
+            res.error = "respuesta None"
+        else:
+            res.status = response.status_code
+            if response.status_code == 200:
+                res.contenido = response.content
+            else:
+                res.error = f"HTTP {response.status_code}"
+    except Exception as e:
+        res.error = str(e)
+    finally:
+        res.latencia = time.perf_counter() - t0
+    return res
+
+
+def descargar_estaciones(ids: Iterable[str],
+                         fetch: Callable,
+                         max_workers: int = DEFAULT_WORKERS,
+                         rate: Optional[float] = DEFAULT_RATE,
+                         burst: Optional[int] = DEFAULT_BURST,
+                         metricas: Optional[MetricasDescarga] = None) -> Iterator[ResultadoDescarga]:
+    """
+    Descarga las estaciones en paralelo y va entregando los resultados a medida
+    que terminan (no en el orden de `ids`).
+
+    - fetch: función id_estacion -> response (con .status_code y .content).
+    - max_workers: cantidad de descargas simultáneas.
+    - rate/burst: límite global de pedidos por segundo; None lo desactiva.
+    - metricas: si se pasa, se completa con latencias y volumen descargado.
+
+    Hay a lo sumo 2 * max_workers estaciones pedidas y no entregadas: si el
+    consumidor se demora, las descargas esperan en lugar de acumular bytes.
+    """
+    workers = max(1, max_workers)
+    bucket = TokenBucket(rate, burst) if rate else None
+    pendientes = iter(ids)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            en_vuelo = set()
+            try:
+                while True:
+                    for i in islice(pendientes, 2 * workers - len(en_vuelo)):
+                        en_vuelo.add(pool.submit(_descargar_una, str(i), fetch, bucket))
+                    if not en_vuelo:
+                        break
+                    listos, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                    for fut in listos:
+                        res = fut.result()
+                        if metricas is not None:
+                            metricas.registrar(res)
+                        yield res
+                    listos = fut = res = None
+            finally:
+                # si el consumidor corta antes, no arrancar las que faltan
+                for fut in en_vuelo:
+                    fut.cancel()
+    finally:
+        if metricas is not None:
+            metricas.fin = time.monotonic()
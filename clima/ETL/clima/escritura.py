@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Escritura incremental de series por estación a Parquet
+------------------------------------------------------
+En lugar de acumular todas las estaciones en memoria y hacer un único
+pd.concat, cada estación se escribe apenas se parsea:
+
+1) Dataset particionado estilo Hive: `<base>/id_estacion=<ID>/part-0.parquet`.
+   Se escribe una partición por estación (reemplazo atómico).
+2) Consolidación en un único archivo con pyarrow.parquet.ParquetWriter:
+   una row group por estación, leyendo de a una partición a la vez.
+
+Como los .xls de distintas estaciones no traen siempre las mismas columnas,
+el esquema final es la unión de los esquemas de las particiones (leídos de
+los metadatos, sin cargar datos) y cada estación se completa con nulos.
+
+La memoria pico queda acotada por la estación más grande, no por el total.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    from ETL.clima.tipos import COMPACTO, a_tabla
+except ImportError:  # ejecución directa desde ETL/clima
+    from tipos import COMPACTO, a_tabla
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+COLUMNA_PARTICION = "id_estacion"
+ARCHIVO_PARTICION = "part-0.parquet"
+COMPRESION = "snappy"
+
+
+# =============================================================================
+# Dataset particionado (una partición por estación)
+# =============================================================================
+
+def ruta_particion(base_dir: str, id_estacion: str) -> str:
+    """Ruta del archivo de una estación dentro del dataset Hive."""
+    return os.path.join(base_dir, f"{COLUMNA_PARTICION}={id_estacion}", ARCHIVO_PARTICION)
+
+
+def escribir_particion(df: pd.DataFrame, base_dir: str, id_estacion: str,
+                       compacto: bool = COMPACTO) -> str:
+    """
+    Escribe (o reemplaza) la partición de una estación.
+    La columna id_estacion no se guarda en el archivo: la aporta la ruta.
+    Con `compacto` se guarda con el esquema de tipos.py (float32, date32).
+    """
+    path = ruta_particion(base_dir, id_estacion)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = a_tabla(df.drop(columns=[COLUMNA_PARTICION], errors="ignore"), compacto)
+    tmp = f"{path}.tmp"
+    pq.write_table(table, tmp, compression=COMPRESION)
+    os.replace(tmp, path)
+    return path
+
+
+def leer_particion(base_dir: str, id_estacion: str,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Lee una estación del dataset y le agrega la columna id_estacion."""
+    table = pq.read_table(ruta_particion(base_dir, id_estacion), columns=columns)
+    df = table.to_pandas(date_as_object=False)
+    df[COLUMNA_PARTICION] = id_estacion
+    return df
+
+
+# =============================================================================
+# Esquema común
+# =============================================================================
+
+def _tipo_comun(tipos: List[pa.DataType]) -> pa.DataType:
+    """Tipo que admite todos los vistos: numéricos -> float64, fechas -> timestamp, mezcla -> string."""
+    tipos = [t for t in tipos if not pa.types.is_null(t)]
+    if not tipos:
+        return pa.float64()
+    if all(t == tipos[0] for t in tipos):
+        return tipos[0]
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in tipos):
+        return pa.float64()
+    if all(pa.types.is_timestamp(t) or pa.types.is_date(t) for t in tipos):
+        return pa.timestamp("ns")
+    return pa.string()
+
+
+def unificar_esquemas(esquemas: Iterable[pa.Schema]) -> pa.Schema:
+    """Unión de columnas (en orden de aparición) con tipos compatibles."""
+    orden: List[str] = []
+    tipos: dict = {}
+    for esquema in esquemas:
+        for campo in esquema:
+            if campo.name not in tipos:
+                orden.append(campo.name)
+                tipos[campo.name] = []
+            tipos[campo.name].append(campo.type)
+    return pa.schema([pa.field(n, _tipo_comun(tipos[n])) for n in orden])
+
+
+def conformar_tabla(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    """Reordena, agrega columnas faltantes (nulas) y castea al esquema dado."""
+    columnas = []
+    for campo in schema:
+        if campo.name in table.column_names:
+            col = table.column(campo.name)
+            if col.type != campo.type:
+                if pa.types.is_string(campo.type) and not pa.types.is_string(col.type):
+                    col = pa.array(col.to_pandas().astype("string"), type=pa.string())
+                else:
+                    col = col.cast(campo.type, safe=False)
+        else:
+            col = pa.nulls(table.num_rows, type=campo.type)
+        columnas.append(col)
+    return pa.Table.from_arrays(columnas, schema=schema)
+
+
+# =============================================================================
+# Archivo único, una row group por estación
+# =============================================================================
+
+class EscritorParquet:
+    """
+    Sink sobre pyarrow.parquet.ParquetWriter con esquema fijo.
+    Cada llamada a `escribir` agrega una row group; se escribe a un archivo
+    temporal y se reemplaza el destino recién al cerrar sin errores.
+    """
+
+    def __init__(self, path: str, schema: pa.Schema, compression: str = COMPRESION):
+        self.path = path
+        self.schema = schema
+        self._tmp = f"{path}.tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._writer = pq.ParquetWriter(self._tmp, schema, compression=compression)
+        self.filas = 0
+        self.row_groups = 0
+
+    def escribir(self, datos: Union[pd.DataFrame, pa.Table]) -> None:
+        table = datos if isinstance(datos, pa.Table) else pa.Table.from_pandas(datos, preserve_index=False)
+        if table.num_rows == 0:
+            return
+        self._writer.write_table(conformar_tabla(table, self.schema))
+        self.filas += table.num_rows
+        self.row_groups += 1
+
+    def close(self, ok: bool = True) -> None:
+        self._writer.close()
+        if ok:
+            os.replace(self._tmp, self.path)
+        elif os.path.exists(self._tmp):
+            os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(ok=exc_type is None)
+
+
+def consolidar_particiones(base_dir: str, ids: Iterable[str], out_path: str,
+                           compacto: bool = COMPACTO) -> Tuple[int, int]:
+    """
+    Une las particiones de `ids` en un único Parquet, de a una estación por vez.
+    Con `compacto` la columna id_estacion se guarda como dictionary.
+    Retorna (filas, columnas) del archivo generado.
+    """
+    ids = [str(i) for i in ids if os.path.exists(ruta_particion(base_dir, i))]
+    if not ids:
+        return 0, 0
+
+    esquema = unificar_esquemas(pq.read_schema(ruta_particion(base_dir, i)) for i in ids)
+    tipo_id = pa.dictionary(pa.int32(), pa.string()) if compacto else pa.string()
+    esquema = esquema.append(pa.field(COLUMNA_PARTICION, tipo_id))
+
+    with EscritorParquet(out_path, esquema) as writer:
+        for id_est in ids:
+            table = pq.read_table(ruta_particion(base_dir, id_est))
+            if compacto:
+                col_id = pa.DictionaryArray.from_arrays(pa.array([0] * table.num_rows, type=pa.int32()),
+                                                        pa.array([id_est], type=pa.string()))
+            else:
+                col_id = pa.array([id_est] * table.num_rows, type=pa.string())
+            table = table.append_column(COLUMNA_PARTICION, col_id)
+            writer.escribir(table)
+    return writer.filas, len(esquema)
@@ -1,8 +1,6 @@
 import pandas as pd
-import json
 from io import BytesIO
-import requests
-import time, os
+import os
 from dotenv import load_dotenv
 
 # Carga las variables desde el archivo .env
@@ -10,22 +8,45 @@ load_dotenv()
 
 USER_AGENT = os.getenv("USER_AGENT")
 
+try:
+    from ETL.clima.descarga import (
+        DEFAULT_WORKERS, DEFAULT_RATE, ClienteINTA, MetricasDescarga, descargar_estaciones
+    )
+    from ETL.clima.manifiesto import (
+        cargar_manifiesto, guardar_manifiesto, hash_contenido, sin_cambios,
+        registrar_estacion, marcar_verificada, fechas_hasta, estaciones_a_descargar
+    )
+    from ETL.clima.escritura import ruta_particion, escribir_particion, consolidar_particiones
+    from ETL.clima.parseo import DEFAULT_PROCESOS, PipelineXLS
+    from ETL.clima.cache_crudo import CacheCrudo
+    from ETL.clima.cache_series import CacheSeries
+except ImportError:  # ejecución directa desde ETL/clima
+    from descarga import (
+        DEFAULT_WORKERS, DEFAULT_RATE, ClienteINTA, MetricasDescarga, descargar_estaciones
+    )
+    from manifiesto import (
+        cargar_manifiesto, guardar_manifiesto, hash_contenido, sin_cambios,
+        registrar_estacion, marcar_verificada, fechas_hasta, estaciones_a_descargar
+    )
+    from escritura import ruta_particion, escribir_particion, consolidar_particiones
+    from parseo import DEFAULT_PROCESOS, PipelineXLS
+    from cache_crudo import CacheCrudo
+    from cache_series import CacheSeries
+
+DATA_DIR = "../../data"
+MANIFEST_PATH = os.path.join(DATA_DIR, "manifiesto-estaciones.json")
+ESTACIONES_DIR = os.path.join(DATA_DIR, "estaciones-parquet")   # dataset Hive id_estacion=<ID>/
+OUT_PATH = os.path.join(DATA_DIR, "datos-todas-estaciones.parquet")
+# Si se define, se importan al cache los .xls de esa carpeta (p.ej. scripts/datos-estaciones)
+OFFLINE_DIR = os.getenv("INTA_OFFLINE_DIR")
+# Modo sin red: se re-parsea la última versión de cada estación guardada en el cache crudo
+SOLO_CACHE = os.getenv("INTA_SOLO_CACHE", "0") == "1" or bool(OFFLINE_DIR)
+
+# Sesión compartida (keep-alive + reintentos) para todas las estaciones
+cliente = ClienteINTA(user_agent=USER_AGENT, pool_size=DEFAULT_WORKERS)
+
 def obtener_historico(id_estacion):
-  headers = {
-    'accept': '*/*',
-    'accept-language': 'es-419,es;q=0.7',
-    'priority': 'u=0, i',
-    'sec-ch-ua': '"Chromium";v="140", "Not=A?Brand";v="24", "Brave";v="140"',
-    'sec-ch-ua-mobile': '?0',
-    'sec-ch-ua-platform': '"Windows"',
-    'sec-fetch-dest': 'empty',
-    'sec-fetch-mode': 'cors',
-    'sec-fetch-site': 'same-origin',
-    'sec-gpc': '1',
-    'user-agent': USER_AGENT,
-  }
-
-  return requests.get(f'https://siga.inta.gob.ar/document/series/{id_estacion}.xls', headers=headers)
+  return cliente.obtener(id_estacion)
 
 def generar_excel(response):
   if response.status_code == 200:
@@ -40,10 +61,10 @@ def generar_excel(response):
 if __name__ == "__main__":
     try:
         # 1) Validaciones iniciales
-        if not USER_AGENT:
+        if not USER_AGENT and not SOLO_CACHE:
             raise RuntimeError("La variable de entorno USER_AGENT no está definida en .env")
 
-        ruta = "../../data/estaciones-meteorologicas-inta.csv"
+        ruta = os.path.join(DATA_DIR, "estaciones-meteorologicas-inta.csv")
         try:
             df_estaciones = pd.read_csv(ruta)
         except FileNotFoundError:
@@ -51,6 +72,8 @@ if __name__ == "__main__":
         except pd.errors.ParserError as e:
             raise RuntimeError(f"Error al parsear el CSV de estaciones: {e}")
 
+        # 'Id Interno' -> 'id_interno', 'Hasta' -> 'hasta'
+        df_estaciones.columns = [c.lower().strip().replace(' ', '_') for c in df_estaciones.columns]
         if "id_interno" not in df_estaciones.columns:
             raise KeyError("La columna 'id_interno' no existe en el CSV de estaciones.")
 
@@ -58,50 +81,89 @@ if __name__ == "__main__":
         if len(ids) == 0:
             raise RuntimeError("No se encontraron IDs de estaciones válidos en el CSV.")
 
-        # 2) Descarga y parsing por estación (con tolerancia a errores por estación)
-        data = []
-        for i, id_est in enumerate(ids, start=1):
-            try:
-                response = obtener_historico(id_est)
-                if response is None:
-                    print(f"[{i}/{len(ids)}] {id_est}: respuesta None, se salta.")
-                    continue
-
-                if response.status_code != 200:
-                    print(f"[{i}/{len(ids)}] {id_est}: HTTP {response.status_code}, se salta.")
-                    continue
-
-                df = generar_excel(response)
-                if df is None or df.empty:
-                    print(f"[{i}/{len(ids)}] {id_est}: DataFrame vacío/None, se salta.")
-                    continue
-
-                df["id_estacion"] = id_est
-                data.append(df)
-                print(f"[{i}/{len(ids)}] {id_est} listo ({len(df)} filas).")
-
-            except Exception as e:
-                # Cualquier error no esperado en esta estación no detiene todo el proceso
-                print(f"[{i}/{len(ids)}] {id_est}: Error inesperado → {e}")
-            finally:
-                # Respetar una pausa entre requests
-                time.sleep(5)
-
-        # 3) Consolidación y guardado
-        if not data:
-            print("No se descargaron datos de ninguna estación. No se genera el parquet.")
+        # 2) Selección incremental según el manifiesto
+        manifiesto = cargar_manifiesto(MANIFEST_PATH)
+        os.makedirs(ESTACIONES_DIR, exist_ok=True)
+        cache = CacheCrudo()
+        series = CacheSeries()
+        if OFFLINE_DIR:
+            print(f"Importados al cache: {cache.importar_carpeta(OFFLINE_DIR)} .xls de {OFFLINE_DIR}")
+        if SOLO_CACHE:
+            pendientes = cache.estaciones()
+            fuente = cache.iterar_ultimos(pendientes)
+            metricas = None
+            print(f"Modo sin red: {len(pendientes)} estaciones desde el cache crudo")
         else:
-            try:
-                full = pd.concat(data, ignore_index=True)
-                out_path = "../../data/datos-todas-estaciones.parquet"
-                os.makedirs(os.path.dirname(out_path), exist_ok=True)
-                full.to_parquet(out_path, index=False)
-                print(f"Parquet generado: {out_path} | filas={len(full)}, columnas={len(full.columns)}")
-            except Exception as e:
-                print(f"Error al guardar el parquet: {e}")
+            pendientes = estaciones_a_descargar(ids, manifiesto, fechas_hasta(df_estaciones))
+            print(f"Estaciones: {len(ids)} | al día según manifiesto: {len(ids) - len(pendientes)} "
+                  f"| a descargar: {len(pendientes)}")
+            metricas = MetricasDescarga()
+            descargas = descargar_estaciones(pendientes, obtener_historico,
+                                             max_workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                                             metricas=metricas)
+            fuente = descargas
+        n = len(pendientes)
+        listos = []
+
+        # Escritor único: corre en el hilo escritor del pipeline con cada estación parseada
+        def guardar_estacion(id_est, df, contenido):
+            if df is None or df.empty:
+                print(f"{id_est}: DataFrame vacío/None, se salta.")
+                return
+            df["id_estacion"] = id_est
+            escribir_particion(df, ESTACIONES_DIR, id_est)
+            entrada = registrar_estacion(manifiesto, id_est, contenido, df)
+            series.guardar(entrada["hash"], df)
+            guardar_manifiesto(manifiesto, MANIFEST_PATH)
+            listos.append(id_est)
+            print(f"[{len(listos)}/{n}] {id_est} listo ({len(df)} filas).")
+
+        # 3) Descarga (hilos) -> parseo XLS (procesos) -> escritura (un hilo),
+        #    con tolerancia a errores por estación
+        with PipelineXLS(guardar_estacion, max_procesos=DEFAULT_PROCESOS) as pipeline:
+            for i, res in enumerate(fuente, start=1):
+                if isinstance(res, tuple):          # modo sin red: (id, bytes) del cache
+                    id_est, contenido = res
+                else:
+                    id_est, contenido = res.id_estacion, res.contenido
+                    if not res.ok:
+                        print(f"[{i}/{n}] {id_est}: {res.error}, se salta.")
+                        continue
+                    cache.guardar(id_est, contenido)
+                    print(f"[{i}/{n}] {id_est} descargado ({res.latencia:.2f}s, {res.bytes / 1024:.0f} KB).")
+
+                try:
+                    path_est = ruta_particion(ESTACIONES_DIR, id_est)
+                    if sin_cambios(manifiesto, id_est, hash_contenido(contenido)) and os.path.exists(path_est):
+                        marcar_verificada(manifiesto, id_est)
+                        print(f"[{i}/{n}] {id_est}: sin cambios (mismo hash), se reutiliza.")
+                        continue
+                    pipeline.enviar(id_est, contenido)
+                except Exception as e:
+                    # Cualquier error no esperado en esta estación no detiene todo el proceso
+                    print(f"[{i}/{n}] {id_est}: Error inesperado → {e}")
+
+        guardar_manifiesto(manifiesto, MANIFEST_PATH)
+        series.purgar(e["hash"] for e in manifiesto.values() if e.get("hash"))
+        if metricas is not None:
+            print(f"Resumen de descarga: {metricas.resumen()}")
+        print(f"Resumen de parseo/escritura: {pipeline.metricas.resumen()}")
+        print(f"Cache crudo: {cache.resumen()}")
+        cache.close()
+
+        # 4) Consolidación: una row group por estación, sin cargar todo en memoria
+        registradas = [i for i in manifiesto if os.path.exists(ruta_particion(ESTACIONES_DIR, i))]
+        if not SOLO_CACHE:
+            registradas = [i for i in ids if i in manifiesto]
+        try:
+            filas, columnas = consolidar_particiones(ESTACIONES_DIR, registradas, OUT_PATH)
+            if filas == 0:
+                print("No se descargaron datos de ninguna estación. No se genera el parquet.")
+            else:
+                print(f"Parquet generado: {OUT_PATH} | filas={filas}, columnas={columnas}")
+        except Exception as e:
+            print(f"Error al guardar el parquet: {e}")
 
     except Exception as e:
         # Errores críticos que impiden correr el proceso completo
         print(f"Proceso abortado: {e}")
-
-
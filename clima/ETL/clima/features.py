@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla de features del modelo: lags, ventanas móviles y acumulados
+-----------------------------------------------------------------
+Arma el panel semanal por departamento (id_uta, anio, semana) que consumen
+los notebooks de modelos/ (hasta ahora data-modelo.csv, con columnas
+_lag1.._lag3 de origen desconocido) y le agrega, para cada columna de
+clima y de casos:
+
+    <col>_lag<k>              valor de la semana t-k
+    <col>_promedio_<w>sem     promedio de las w semanas que terminan en t-DESFASE
+    <col>_suma_<w>sem         suma de esas mismas w semanas
+    <col>_acum                suma desde el inicio del panel hasta t-DESFASE
+
+Las ventanas y el acumulado arrancan en t-DESFASE (1 por defecto), como el
+`rolling` sobre `casos_lag1` de los notebooks: la semana t no se usa para
+predecirse a sí misma. Igual que `rolling(min_periods=1)`, ignoran los
+nulos y dan NaN solo si la ventana no tiene ningún dato.
+
+Panel: una fila por departamento y semana epidemiológica (todas, sin
+huecos), con los casos sumados sobre grupos de edad (0 en las semanas sin
+notificación), la población del año y el clima del cubo semanal
+(semanal.py) de la estación asignada al departamento en
+estaciones/departamentos_con_estacion.csv.
+
+Cálculo: un único ordenamiento por (entidad, semana) y, por columna,
+desplazamientos y sumas prefijas (np.cumsum) sobre el arreglo entero: cada
+ventana es una resta de dos sumas prefijas, sin groupby ni bucles por
+departamento, y su costo no depende del ancho de la ventana.
+
+Uso (desde clima/, con el cubo semanal ya generado: CLIMA_SEMANAL=1 python etl.py):
+    python ETL/clima/features.py [salida.parquet]
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import sys
+from typing import Dict, Iterable, Mapping, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+try:
+    from ETL.clima.semanal import SEMANAL_DIR, inicio_semana_epidemiologica, leer_cubo, semana_epidemiologica
+    from ETL.clima.tipos import COMPACTO, a_tabla
+except ImportError:  # ejecución directa desde ETL/clima
+    from semanal import SEMANAL_DIR, inicio_semana_epidemiologica, leer_cubo, semana_epidemiologica
+    from tipos import COMPACTO, a_tabla
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+FEATURES_PATH = os.getenv("CLIMA_FEATURES_PATH", "data/features-modelo.parquet")
+DENGUE_DIR = os.getenv("DENGUE_DIR", "../dengue/dataset-dengue/procesado")
+DEPARTAMENTOS_CSV = os.getenv("DEPARTAMENTOS_CSV", "../estaciones/departamentos_con_estacion.csv")
+ENTIDAD = "id_uta"
+CLAVE = [ENTIDAD, "anio", "semana"]
+LAGS = (1, 2, 3, 4)
+VENTANAS = (3, 4)
+DESFASE = 1
+# Agregado del cubo semanal que representa a cada variable en el panel (por defecto la media)
+AGREGADO_CLIMA: Dict[str, str] = {"precipitacion_pluviometrica": "suma"}
+COLUMNAS_CASOS = ["cantidad_casos"]
+
+
+# =============================================================================
+# Panel semanal
+# =============================================================================
+
+def leer_casos(dengue_dir: str = DENGUE_DIR) -> pd.DataFrame:
+    """Casos por (id_uta, anio, semana) sumados sobre grupos de edad, con la población del año."""
+    archivos = sorted(glob.glob(os.path.join(dengue_dir, "dengue-*.csv")))
+    if not archivos:
+        raise FileNotFoundError(f"No hay dengue-*.csv en {dengue_dir}")
+    columnas = ["departamento_id_uta_2020", "ano", "semanas_epidemiologicas", "cantidad_casos", "poblacion"]
+    df = pd.concat([pd.read_csv(f, usecols=columnas) for f in archivos], ignore_index=True)
+    df = df.rename(columns={"departamento_id_uta_2020": ENTIDAD, "ano": "anio",
+                            "semanas_epidemiologicas": "semana"})
+    df = df.dropna(subset=CLAVE)
+    df[CLAVE] = df[CLAVE].astype(np.int64)
+    return (df.groupby(CLAVE, sort=True)
+              .agg(cantidad_casos=("cantidad_casos", "sum"), poblacion=("poblacion", "max"))
+              .reset_index())
+
+
+def leer_departamentos(path: str = DEPARTAMENTOS_CSV) -> pd.Series:
+    """id_uta -> id de estación INTA (estacion_id_interno) del mapeo por cercanía."""
+    deptos = pd.read_csv(path, dtype={"departamento_id": "string", "estacion_id_interno": "string"})
+    ids = pd.to_numeric(deptos["departamento_id"].str.strip(), errors="coerce")
+    deptos = deptos.assign(**{ENTIDAD: ids}).dropna(subset=[ENTIDAD, "estacion_id_interno"])
+    deptos[ENTIDAD] = deptos[ENTIDAD].astype(np.int64)
+    return deptos.drop_duplicates(ENTIDAD).set_index(ENTIDAD)["estacion_id_interno"]
+
+
+def clima_por_departamento(cubo: pd.DataFrame,
+                           departamentos: pd.Series,
+                           agregados: Mapping[str, str] = AGREGADO_CLIMA) -> pd.DataFrame:
+    """
+    Una fila por (id_uta, anio, semana) con una columna por variable de
+    clima, tomada del cubo de la estación asignada al departamento.
+    """
+    variables = sorted({c[: -len("_media")] for c in cubo.columns if c.endswith("_media")})
+    columnas = {f"{v}_{agregados.get(v, 'media')}": v for v in variables}
+    cubo = cubo[["id_estacion", "anio", "semana", *columnas]].rename(columns=columnas)
+    cubo["id_estacion"] = cubo["id_estacion"].astype(str)
+    mapa = departamentos.rename("id_estacion").reset_index()
+    return mapa.merge(cubo, on="id_estacion", how="inner")
+
+
+def _semana_global(anio, semana) -> np.ndarray:
+    """Índice de semana continuo (semanas desde el domingo 1970-01-04): t-k es k semanas antes."""
+    return (inicio_semana_epidemiologica(anio, semana).astype(np.int64) - 3) // 7
+
+
+def panel_semanal(casos: pd.DataFrame,
+                  clima: Optional[pd.DataFrame] = None,
+                  entidades: Optional[Iterable[int]] = None,
+                  desde: Optional[int] = None,
+                  hasta: Optional[int] = None) -> pd.DataFrame:
+    """
+    Grilla completa entidad x semana entre `desde` y `hasta` (índices de
+    _semana_global; por defecto el rango de `casos`), ordenada por
+    (id_uta, semana), con casos (0 si no hay registro), población y clima.
+    """
+    t_casos = _semana_global(casos["anio"], casos["semana"])
+    desde = int(t_casos.min()) if desde is None else desde
+    hasta = int(t_casos.max()) if hasta is None else hasta
+    entidades = np.unique(np.concatenate([
+        casos[ENTIDAD].to_numpy(np.int64),
+        np.asarray(list(entidades) if entidades is not None else [], dtype=np.int64),
+    ]))
+    semanas = hasta - desde + 1
+    t = np.tile(np.arange(desde, hasta + 1), len(entidades))
+    ent = np.repeat(entidades, semanas)
+    domingos = (t * 7 + 3).astype("datetime64[D]")
+    anio, semana = semana_epidemiologica(domingos)
+    out: Dict[str, np.ndarray] = {ENTIDAD: ent, "anio": anio.astype(np.int64), "semana": semana.astype(np.int64)}
+
+    def posiciones(df: pd.DataFrame):
+        """Fila de la grilla de cada fila de df (y máscara de las que caen dentro)."""
+        tt = _semana_global(df["anio"], df["semana"])
+        k = np.searchsorted(entidades, df[ENTIDAD].to_numpy(np.int64))
+        dentro = (tt >= desde) & (tt <= hasta) & (k < len(entidades))
+        dentro[dentro] &= entidades[k[dentro]] == df[ENTIDAD].to_numpy(np.int64)[dentro]
+        return k[dentro] * semanas + (tt[dentro] - desde), dentro
+
+    pos, dentro = posiciones(casos)
+    out["cantidad_casos"] = np.zeros(len(t))
+    # np.add.at: una semana 53 en un año de 52 cae en la semana 1 del siguiente
+    np.add.at(out["cantidad_casos"], pos, casos["cantidad_casos"].to_numpy(np.float64)[dentro])
+    # población: la del año en toda la entidad (los años sin casos quedan NaN)
+    pob = casos.groupby([ENTIDAD, "anio"])["poblacion"].max()
+    idx = pd.MultiIndex.from_arrays([ent, out["anio"]])
+    out["poblacion"] = pob.reindex(idx).to_numpy(np.float64)
+
+    if clima is not None:
+        pos, dentro = posiciones(clima)
+        for col in clima.columns.drop([*CLAVE, "id_estacion"], errors="ignore"):
+            valores = np.full(len(t), np.nan)
+            valores[pos] = clima[col].to_numpy(np.float64, na_value=np.nan)[dentro]
+            out[col] = valores
+        mapa = clima.drop_duplicates(ENTIDAD).set_index(ENTIDAD)["id_estacion"]
+        out["id_estacion"] = mapa.reindex(ent).to_numpy(dtype=object)
+    return pd.DataFrame(out)
+
+
+# =============================================================================
+# Materialización
+# =============================================================================
+
+def _desplazar(y: np.ndarray, k: int, pos: np.ndarray) -> np.ndarray:
+    """y[i-k] dentro de la entidad (NaN en sus primeras k filas)."""
+    if k == 0:
+        return y
+    out = np.full(len(y), np.nan)
+    out[k:] = y[:-k]
+    out[pos < k] = np.nan
+    return out
+
+
+def _sumas_prefijas(y: np.ndarray):
+    """Suma y cantidad de valores no nulos acumuladas, con un 0 adelante."""
+    valido = ~np.isnan(y)
+    suma = np.concatenate(([0.0], np.cumsum(np.where(valido, y, 0.0))))
+    n = np.concatenate(([0], np.cumsum(valido)))
+    return suma, n
+
+
+def materializar(panel: pd.DataFrame,
+                 columnas: Optional[Sequence[str]] = None,
+                 lags: Sequence[int] = LAGS,
+                 ventanas: Sequence[int] = VENTANAS,
+                 acumulado: bool = True,
+                 desfase: int = DESFASE,
+                 entidad: str = ENTIDAD,
+                 tiempo: Sequence[str] = ("anio", "semana")) -> pd.DataFrame:
+    """
+    Panel (ordenado por entidad y tiempo) con las columnas de features
+    agregadas. Las operaciones son por posición: el panel tiene que ser una
+    grilla sin semanas faltantes por entidad, como la de panel_semanal.
+    """
+    columnas = list(columnas) if columnas is not None else [
+        c for c in panel.columns
+        if c not in (entidad, *tiempo) and pd.api.types.is_numeric_dtype(panel[c])
+    ]
+    claves = [panel[c].to_numpy() for c in reversed(tiempo)]
+    codigos = pd.factorize(panel[entidad], sort=True)[0]
+    orden = np.lexsort((*claves, codigos))
+    if not np.array_equal(orden, np.arange(len(panel))):
+        panel = panel.iloc[orden].reset_index(drop=True)
+        codigos = codigos[orden]
+
+    n = len(panel)
+    nueva = np.ones(n, dtype=bool)
+    nueva[1:] = codigos[1:] != codigos[:-1]
+    inicio = np.maximum.accumulate(np.where(nueva, np.arange(n), 0))
+    pos = np.arange(n) - inicio
+    if "anio" in tiempo and "semana" in tiempo:
+        t = _semana_global(panel["anio"], panel["semana"])
+        if n > 1 and (np.diff(t)[~nueva[1:]] != 1).any():
+            raise ValueError("el panel tiene semanas faltantes o repetidas: usar panel_semanal")
+
+    i = np.arange(n)
+    nuevas: Dict[str, np.ndarray] = {}
+    for col in columnas:
+        y = panel[col].to_numpy(np.float64, na_value=np.nan)
+        for k in lags:
+            nuevas[f"{col}_lag{k}"] = _desplazar(y, k, pos)
+        if not ventanas and not acumulado:
+            continue
+        suma, cuenta = _sumas_prefijas(_desplazar(y, desfase, pos))
+        for w in ventanas:
+            desde = i - np.minimum(pos, w - 1)
+            s, c = suma[i + 1] - suma[desde], cuenta[i + 1] - cuenta[desde]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                nuevas[f"{col}_promedio_{w}sem"] = np.where(c > 0, s / c, np.nan)
+            nuevas[f"{col}_suma_{w}sem"] = np.where(c > 0, s, np.nan)
+        if acumulado:
+            acum = suma[i + 1] - suma[inicio]
+            nuevas[f"{col}_acum"] = np.where(pos >= desfase, acum, np.nan)
+    return pd.concat([panel, pd.DataFrame(nuevas, index=panel.index)], axis=1)
+
+
+# =============================================================================
+# Tabla de features
+# =============================================================================
+
+def construir_features(cubo: pd.DataFrame,
+                       casos: pd.DataFrame,
+                       departamentos: pd.Series,
+                       lags: Sequence[int] = LAGS,
+                       ventanas: Sequence[int] = VENTANAS,
+                       desfase: int = DESFASE) -> pd.DataFrame:
+    """
+    Panel de todos los departamentos en el período de los casos, con
+    features de todas las columnas de clima y de casos. El panel arranca
+    antes para que las primeras semanas también tengan lags y ventanas
+    (el acumulado sí cuenta desde ese arranque).
+    """
+    clima = clima_por_departamento(cubo, departamentos)
+    if clima.empty:
+        print("⚠️  Ninguna estación del mapeo está en el cubo semanal: features solo de casos")
+    t_casos = _semana_global(casos["anio"], casos["semana"])
+    margen = max([*lags, *(w + desfase - 1 for w in ventanas), 0])
+    desde, hasta = int(t_casos.min()), int(t_casos.max())
+    panel = panel_semanal(casos, clima, entidades=departamentos.index, desde=desde - margen, hasta=hasta)
+    variables = [c for c in clima.columns if c not in (*CLAVE, "id_estacion")]
+    out = materializar(panel, COLUMNAS_CASOS + variables, lags, ventanas, desfase=desfase)
+    t = _semana_global(out["anio"], out["semana"])
+    return out[t >= desde].reset_index(drop=True)
+
+
+def main(salida: str = FEATURES_PATH,
+         semanal_dir: str = SEMANAL_DIR,
+         dengue_dir: str = DENGUE_DIR,
+         departamentos_csv: str = DEPARTAMENTOS_CSV) -> pd.DataFrame:
+    """Lee cubo, casos y mapeo departamento -> estación y escribe la tabla de features."""
+    if not os.path.isdir(semanal_dir):
+        raise FileNotFoundError(f"No existe el cubo semanal: {semanal_dir} (correr CLIMA_SEMANAL=1 python etl.py)")
+    features = construir_features(leer_cubo(semanal_dir), leer_casos(dengue_dir),
+                                  leer_departamentos(departamentos_csv))
+    os.makedirs(os.path.dirname(salida) or ".", exist_ok=True)
+    pq.write_table(a_tabla(features, compacto=COMPACTO), salida)
+    print(f"✅ Features: {len(features)} filas x {len(features.columns)} columnas "
+          f"({features[ENTIDAD].nunique()} departamentos) → {salida}")
+    return features
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else FEATURES_PATH)
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Transformación incremental por estación (ventana de arranque en caliente)
+------------------------------------------------------------------------
+En lugar de re-transformar toda la historia en cada corrida, solo se
+transforman las filas nuevas de cada estación más una ventana de filas
+previas ("look-back") que le da contexto a las operaciones de borde:
+
+- interpolación lineal: las corridas de nulos al final de lo ya transformado
+  se habían completado con el último valor y ahora tienen un punto a la derecha;
+- mediana móvil centrada de 7 filas de transform_radiacion_global;
+- spline de precipitación: se ajusta sobre los puntos de la ventana. Como el
+  spline de pandas es suavizante y global, una corrida completa puede mover
+  levemente valores imputados lejos del borde; eso no se replica.
+
+Las filas ya transformadas que pueden cambiar con los datos nuevos (la corrida
+de nulos final más 3 filas por la mediana móvil) se vuelven a emitir y
+reemplazan a las anteriores; el resto de la partición queda intacta.
+
+Los estadísticos de cada estación (min/max de precipitación, diferencias de
+temperatura y rocío, regresiones y medianas (mes, hora)) se guardan en el
+estado al hacer una corrida completa de la estación y se reutilizan en las
+incrementales. Se hace una corrida completa de la estación cuando:
+  - no tiene estado o partición transformada previa;
+  - cambió el contenido histórico (mismo hash pero sin filas nuevas, o filas
+    nuevas con fecha anterior a la última transformada);
+  - la precipitación nueva sale del rango min/max registrado;
+  - la ventana no alcanza a cubrir la corrida de nulos del borde (las
+    variables que la estación nunca midió no cuentan).
+
+Salida: dataset particionado por estación (mismo layout que escritura.py);
+el estado es un JSON id_estacion -> {hash, fecha_max, filas, params}.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from ETL.clima.escritura import escribir_particion, leer_particion, ruta_particion
+    from ETL.clima.manifiesto import cargar_manifiesto, guardar_manifiesto
+    from ETL.clima.transform import ETAPAS, _aplicar_etapas, _transformar_variables
+except ImportError:  # ejecución directa desde ETL/clima
+    from escritura import escribir_particion, leer_particion, ruta_particion
+    from manifiesto import cargar_manifiesto, guardar_manifiesto
+    from transform import ETAPAS, _aplicar_etapas, _transformar_variables
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+VENTANA = int(os.getenv("CLIMA_VENTANA", "60"))   # filas previas de contexto por estación
+MARGEN_MEDIANA = 3                                 # semiancho de la mediana móvil centrada (7 filas)
+COL_FECHA = "fecha"
+COL_PRECIP = "precipitacion_pluviometrica"
+
+
+# =============================================================================
+# Utilidades
+# =============================================================================
+
+def preparar_estacion(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza columnas/tipos (pasos 1 a 3) y ordena por fecha; descarta filas sin fecha."""
+    base = _aplicar_etapas(df_raw, ETAPAS[:3])
+    base = base[base[COL_FECHA].notna()]
+    return base.sort_values(COL_FECHA, kind="mergesort").reset_index(drop=True)
+
+
+def filas_afectadas(anteriores: pd.DataFrame, margen: int = MARGEN_MEDIANA,
+                    serie: Optional[pd.DataFrame] = None) -> int:
+    """
+    Cuántas filas finales de lo ya transformado pueden cambiar al agregar datos:
+    la corrida de nulos más larga al final de alguna variable (en crudo), y al
+    menos `margen` filas por la mediana móvil centrada.
+    Con `serie` (toda la serie cruda de la estación, nuevas incluidas) no se
+    cuentan las variables sin ningún dato: la estación no las mide y quedan
+    nulas con o sin las filas nuevas.
+    """
+    if anteriores.empty:
+        return 0
+    variables = anteriores.drop(columns=[COL_FECHA, "id_estacion"], errors="ignore")
+    if serie is not None:
+        medidas = serie.reindex(columns=variables.columns).notna().any().to_numpy()
+        variables = variables.loc[:, medidas]
+    nulos = variables.isna().to_numpy()[::-1]
+    # largo del primer tramo sin nulos leyendo desde el final, por columna
+    hay_dato = ~nulos
+    corrida = np.where(hay_dato.any(axis=0), hay_dato.argmax(axis=0), len(anteriores))
+    return int(max(margen, corrida.max(initial=0)))
+
+
+def _fuera_de_rango(nuevas: pd.DataFrame, params: Mapping[str, object]) -> bool:
+    """True si la precipitación nueva cambia el min/max usado para normalizar."""
+    if COL_PRECIP not in nuevas.columns:
+        return False
+    lo, hi = params.get("precip_log_min"), params.get("precip_log_max")
+    if lo is None or hi is None or np.isnan(lo) or np.isnan(hi):
+        return nuevas[COL_PRECIP].notna().any()
+    col_log = np.log1p(nuevas[COL_PRECIP].clip(lower=0))
+    return bool((col_log < lo).any() or (col_log > hi).any())
+
+
+# =============================================================================
+# Una estación
+# =============================================================================
+
+def transformar_completa(base: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    """Transforma toda la historia de la estación y devuelve (df, params registrados)."""
+    params: dict = {}
+    out = _transformar_variables(base.copy(), params)
+    return out, params
+
+
+def actualizar_estacion(base: pd.DataFrame,
+                        previo: Optional[pd.DataFrame],
+                        entrada: Optional[Mapping[str, object]],
+                        ventana: int = VENTANA) -> Tuple[Optional[pd.DataFrame], dict, str]:
+    """
+    Actualiza la serie transformada de una estación.
+    `base` es la serie cruda preparada (preparar_estacion), `previo` la partición
+    transformada existente y `entrada` su estado. Retorna (df completo de la
+    partición o None si no hay cambios, params, modo) con modo en
+    {"completa", "incremental", "sin_cambios"}.
+    """
+    params = dict((entrada or {}).get("params") or {})
+    if previo is None or previo.empty or not entrada or not params or not entrada.get("fecha_max"):
+        out, params = transformar_completa(base)
+        return out, params, "completa"
+
+    fecha_max = pd.Timestamp(entrada["fecha_max"])
+    nuevas = base[COL_FECHA] > fecha_max
+    if not nuevas.any():
+        if len(base) == entrada.get("filas"):
+            return None, params, "sin_cambios"
+        out, params = transformar_completa(base)   # cambió la historia, no el final
+        return out, params, "completa"
+
+    i0 = int(np.argmax(nuevas.to_numpy()))
+    if len(base) - int(nuevas.sum()) != entrada.get("filas") or _fuera_de_rango(base.iloc[i0:], params):
+        out, params = transformar_completa(base)
+        return out, params, "completa"
+
+    afectadas = filas_afectadas(base.iloc[max(0, i0 - ventana):i0], serie=base)
+    if i0 <= ventana or afectadas >= ventana:
+        out, params = transformar_completa(base)
+        return out, params, "completa"
+
+    bloque = _transformar_variables(base.iloc[i0 - ventana:].copy(), params)
+    corte = base[COL_FECHA].iloc[i0 - afectadas]
+    emitidas = bloque[bloque[COL_FECHA] >= corte]
+    previo = previo[previo[COL_FECHA] < corte]
+    out = pd.concat([previo, emitidas.reindex(columns=previo.columns)], ignore_index=True)
+    return out, params, "incremental"
+
+
+# =============================================================================
+# Todas las estaciones
+# =============================================================================
+
+def transformar_incremental(ids: Iterable[str],
+                            raw_dir: str,
+                            out_dir: str,
+                            estado_path: str,
+                            manifiesto: Optional[Mapping[str, dict]] = None,
+                            ventana: int = VENTANA,
+                            completa: bool = False) -> Dict[str, int]:
+    """
+    Actualiza el dataset transformado `out_dir` a partir de las particiones
+    crudas de `raw_dir`. Con `manifiesto` se saltean sin leer las estaciones
+    cuyo hash no cambió. `completa=True` fuerza la corrida completa de todas.
+    El estado se guarda después de cada estación (reanudable).
+    """
+    estado = cargar_manifiesto(estado_path)
+    resumen = {"completa": 0, "incremental": 0, "sin_cambios": 0, "filas_escritas": 0, "errores": 0}
+    for id_est in (str(i) for i in ids):
+        try:
+            if not os.path.exists(ruta_particion(raw_dir, id_est)):
+                continue
+            entrada = None if completa else estado.get(id_est)
+            h = (manifiesto or {}).get(id_est, {}).get("hash")
+            existe = os.path.exists(ruta_particion(out_dir, id_est))
+            if entrada and existe and h and entrada.get("hash") == h:
+                resumen["sin_cambios"] += 1
+                continue
+
+            base = preparar_estacion(leer_particion(raw_dir, id_est))
+            previo = leer_particion(out_dir, id_est) if existe and entrada else None
+            out, params, modo = actualizar_estacion(base, previo, entrada, ventana)
+            resumen[modo] += 1
+            if out is not None:
+                escribir_particion(out, out_dir, id_est)
+                resumen["filas_escritas"] += len(out) if modo == "completa" else len(base) - entrada["filas"]
+
+            estado[id_est] = {
+                "hash": h,
+                "fecha_max": base[COL_FECHA].max().isoformat() if len(base) else None,
+                "filas": int(len(base)),
+                "params": params,
+                "transformado": datetime.now().isoformat(timespec="seconds"),
+            }
+            guardar_manifiesto(estado, estado_path)
+        except Exception as e:
+            resumen["errores"] += 1
+            print(f"{id_est}: error en transformación incremental → {e}")
+    return resumen
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación por etapa del ETL
+---------------------------------
+Mide cada etapa de transformación y las lecturas/escrituras de etl.py:
+
+- tiempo de reloj (wall) y de CPU del proceso;
+- filas de entrada y de salida, y filas/s;
+- memoria pico asignada durante la etapa (tracemalloc, por encima de lo que
+  ya estaba asignado al empezar) y RSS máximo del proceso hasta ese momento.
+
+Cada medición se agrega como una línea JSON a METRICAS_PATH (una corrida
+se identifica por `corrida`) y al final se imprime una tabla resumen.
+
+Con la instrumentación apagada se usa APAGADA: `medir` devuelve siempre el
+mismo context manager vacío (sin tracemalloc, sin relojes, sin archivo).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from ETL.clima.transform import ETAPAS, _aplicar_etapas
+except ImportError:  # ejecución directa desde ETL/clima
+    from transform import ETAPAS, _aplicar_etapas
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+METRICAS = os.getenv("CLIMA_METRICAS", "0") == "1"
+METRICAS_PATH = os.getenv("CLIMA_METRICAS_PATH", "data/metricas-etl.jsonl")
+
+
+def _rss_max_mb() -> Optional[float]:
+    """RSS máximo del proceso (ru_maxrss está en KB en Linux)."""
+    if resource is None:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _filas(df) -> Optional[int]:
+    return len(df) if df is not None else None
+
+
+# =============================================================================
+# Mediciones
+# =============================================================================
+
+class Instrumentacion:
+    """
+    Registro de mediciones de una corrida. Las mediciones se pueden anidar
+    (p. ej. "transformacion" contiene a cada etapa): el pico de la externa
+    incluye los de las internas.
+    """
+
+    activa = True
+
+    def __init__(self, path: Optional[str] = METRICAS_PATH, corrida: Optional[str] = None):
+        self.path = path
+        self.corrida = corrida or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.registros: List[dict] = []
+        self._abiertas: List[dict] = []
+        self._propio_tracemalloc = False
+
+    def _actualizar_picos(self) -> None:
+        _, pico = tracemalloc.get_traced_memory()
+        for r in self._abiertas:
+            r["_pico"] = max(r["_pico"], pico)
+
+    @contextmanager
+    def medir(self, etapa: str, filas_entrada: Optional[int] = None) -> Iterator[dict]:
+        """
+        Mide el bloque. El llamador puede completar registro["filas_salida"]
+        (por defecto igual a filas_entrada).
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._propio_tracemalloc = True
+        self._actualizar_picos()
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        registro = {"etapa": etapa, "filas_entrada": filas_entrada, "filas_salida": None,
+                    "_base": base, "_pico": base}
+        self._abiertas.append(registro)
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield registro
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            self._actualizar_picos()
+            self._abiertas.pop()
+            self._registrar(registro, wall, cpu)
+            if not self._abiertas and self._propio_tracemalloc:
+                tracemalloc.stop()
+                self._propio_tracemalloc = False
+
+    def _registrar(self, registro: dict, wall: float, cpu: float) -> None:
+        base, pico = registro.pop("_base"), registro.pop("_pico")
+        if registro["filas_salida"] is None:
+            registro["filas_salida"] = registro["filas_entrada"]
+        filas = registro["filas_salida"] or registro["filas_entrada"]
+        registro.update({
+            "corrida": self.corrida,
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "nivel": len(self._abiertas),
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "filas_por_s": round(filas / wall, 1) if filas and wall > 0 else None,
+            "pico_mb": round((pico - base) / 2**20, 1),
+            "rss_max_mb": _rss_max_mb(),
+        })
+        self.registros.append(registro)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    def correr_etapas(self, df: pd.DataFrame, etapas=ETAPAS) -> pd.DataFrame:
+        """Como transform.run_eda_transformations, midiendo cada etapa."""
+        out = df.copy(deep=False)
+        for nombre, func, admite_inplace in etapas:
+            with self.medir(nombre, _filas(out)) as r:
+                out = func(out, inplace=True) if admite_inplace else func(out)
+                r["filas_salida"] = _filas(out)
+        return out
+
+    def tabla(self) -> str:
+        """Tabla resumen de la corrida (en orden de finalización, con % del total)."""
+        if not self.registros:
+            return "(sin mediciones)"
+        total = sum(r["wall_s"] for r in self.registros if r["nivel"] == 0) or float("nan")
+        filas = []
+        for r in self.registros:
+            filas.append({
+                "etapa": "  " * r["nivel"] + r["etapa"],
+                "wall_s": r["wall_s"],
+                "cpu_s": r["cpu_s"],
+                "%": round(100 * r["wall_s"] / total, 1),
+                "filas_in": r["filas_entrada"],
+                "filas_out": r["filas_salida"],
+                "filas/s": r["filas_por_s"],
+                "pico_mb": r["pico_mb"],
+                "rss_max_mb": r["rss_max_mb"],
+            })
+        tabla = pd.DataFrame(filas)
+        tabla[["filas_in", "filas_out"]] = tabla[["filas_in", "filas_out"]].astype("Int64")
+        return tabla.to_string(index=False)
+
+
+class _Apagada:
+    """Instrumentación desactivada: no mide ni escribe nada."""
+
+    activa = False
+    registros: List[dict] = []
+    _NULO = nullcontext({})
+
+    def medir(self, etapa: str, filas_entrada: Optional[int] = None):
+        return self._NULO
+
+    def correr_etapas(self, df: pd.DataFrame, etapas=ETAPAS) -> pd.DataFrame:
+        return _aplicar_etapas(df, etapas)
+
+    def tabla(self) -> str:
+        return ""
+
+
+APAGADA = _Apagada()
+
+
+def instrumentacion(activa: bool = METRICAS, path: Optional[str] = METRICAS_PATH):
+    """Instrumentacion nueva si `activa`, si no APAGADA."""
+    return Instrumentacion(path) if activa else APAGADA
+
+
+def leer_metricas(path: str = METRICAS_PATH, corrida: Optional[str] = None) -> pd.DataFrame:
+    """Mediciones guardadas (todas o las de una corrida) como DataFrame."""
+    registros: List[Dict] = []
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            if linea.strip():
+                registros.append(json.loads(linea))
+    df = pd.DataFrame(registros)
+    if corrida is not None and not df.empty:
+        df = df[df["corrida"] == corrida]
+    return df
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Interpolación por estación con huecos acotados
+----------------------------------------------
+Reemplaza al spline de orden 2 de pandas sobre todo el dataset concatenado
+(un único spline de scipy para todas las estaciones y fechas: lento, pesado
+y que cruza de una estación a la siguiente).
+
+- Solo se rellenan huecos interiores de hasta `max_hueco` filas, con un dato
+  válido de la misma estación a cada lado. Los huecos más largos y los de
+  los extremos de cada serie quedan en NaN.
+- Cada hueco se resuelve con una ventana local: los dos datos que lo
+  limitan y, para los métodos cúbicos, el dato anterior y el siguiente.
+- Todo es vectorizado sobre todas las estaciones a la vez (acumulados de
+  índices, sin bucles por estación ni por hueco): costo lineal en filas,
+  más un ordenamiento por (estación, fecha) solo si hace falta.
+
+Métodos:
+    "lineal"  recta entre los datos que limitan el hueco.
+    "pchip"   Hermite cúbico con pendientes de Fritsch-Carlson (monótono,
+              no inventa picos ni valores negativos: el default).
+    "spline"  Hermite cúbico con pendientes de Catmull-Rom (spline local C1).
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+METODOS = ("lineal", "pchip", "spline")
+
+
+# =============================================================================
+# Huecos
+# =============================================================================
+
+def _anclas(valido: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Índice del último dato válido <= i y del primero >= i (-1 / n si no hay)."""
+    n = len(valido)
+    idx = np.arange(n)
+    izq = np.maximum.accumulate(np.where(valido, idx, -1))
+    der = np.minimum.accumulate(np.where(valido, idx, n)[::-1])[::-1]
+    return izq, der
+
+
+def _huecos(y: np.ndarray, grupos: np.ndarray):
+    """
+    Para cada fila nula: id de hueco, largo del hueco y anclas izquierda/derecha
+    válidas de la misma estación (-1 si no hay). Un hueco es una corrida de
+    nulos contigua dentro de una estación.
+    """
+    n = len(y)
+    valido = ~np.isnan(y)
+    izq, der = _anclas(valido)
+    nulo = ~valido
+
+    inicio = nulo.copy()
+    inicio[1:] &= valido[:-1] | (grupos[1:] != grupos[:-1])
+    hueco = np.cumsum(inicio) - 1                  # id de hueco por fila (válido solo en nulos)
+    largos = np.bincount(hueco[nulo], minlength=int(inicio.sum()))
+
+    filas = np.flatnonzero(nulo)
+    g = grupos[filas]
+    l_ok = (izq[filas] >= 0) & (grupos[np.clip(izq[filas], 0, None)] == g)
+    r_ok = (der[filas] < n) & (grupos[np.clip(der[filas], None, n - 1)] == g)
+    return filas, hueco[filas], largos, np.where(l_ok, izq[filas], -1), np.where(r_ok, der[filas], -1)
+
+
+def estadisticas_huecos(y: np.ndarray, grupos: Optional[np.ndarray] = None,
+                        max_hueco: int = 5) -> dict:
+    """Resumen de huecos: cantidad, filas, largos (p50/p90/max) y cuántos se rellenan."""
+    y = np.asarray(y, dtype=float)
+    grupos = np.zeros(len(y), dtype=np.int64) if grupos is None else np.asarray(grupos)
+    if len(y) == 0 or not np.isnan(y).any():
+        return {"filas": int(len(y)), "nulos": 0, "huecos": 0, "rellenables": 0,
+                "filas_rellenables": 0, "largo_p50": 0, "largo_p90": 0, "largo_max": 0}
+    filas, hueco, largos, l, r = _huecos(y, grupos)
+    interior = np.zeros(len(largos), dtype=bool)
+    interior[hueco] = (l >= 0) & (r >= 0)
+    rellenable = interior & (largos <= max_hueco)
+    return {
+        "filas": int(len(y)),
+        "nulos": int(len(filas)),
+        "huecos": int(len(largos)),
+        "rellenables": int(rellenable.sum()),
+        "filas_rellenables": int(largos[rellenable].sum()),
+        "largo_p50": float(np.percentile(largos, 50)),
+        "largo_p90": float(np.percentile(largos, 90)),
+        "largo_max": int(largos.max()),
+    }
+
+
+# =============================================================================
+# Interpolación
+# =============================================================================
+
+def _pendiente_pchip(d1: np.ndarray, h1: np.ndarray, d2: np.ndarray, h2: np.ndarray) -> np.ndarray:
+    """Media armónica ponderada de dos secantes (Fritsch-Carlson, como scipy.PchipInterpolator)."""
+    w1, w2 = 2 * h2 + h1, h2 + 2 * h1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m = (w1 + w2) / (w1 / d1 + w2 / d2)
+    return np.where((np.sign(d1) != np.sign(d2)) | (d1 == 0) | (d2 == 0), 0.0, m)
+
+
+def interpolar(y: np.ndarray,
+               grupos: Optional[np.ndarray] = None,
+               x: Optional[np.ndarray] = None,
+               metodo: str = "pchip",
+               max_hueco: int = 5,
+               minimo: Optional[float] = None) -> np.ndarray:
+    """
+    Rellena los huecos interiores de hasta `max_hueco` filas de cada grupo.
+    Las filas deben estar ordenadas por (grupo, x); `x` es la coordenada
+    (p. ej. fechas en ns) y por defecto la posición. Retorna un array nuevo.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de interpolación desconocido: {metodo} (opciones: {METODOS})")
+    y = np.asarray(y, dtype=float)
+    out = y.copy()
+    n = len(y)
+    if n == 0 or not np.isnan(y).any():
+        return out
+    grupos = np.zeros(n, dtype=np.int64) if grupos is None else np.asarray(grupos)
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    filas, hueco, largos, L, R = _huecos(y, grupos)
+    ok = (L >= 0) & (R >= 0) & (largos[hueco] <= max_hueco)
+    filas, L, R = filas[ok], L[ok], R[ok]
+    if len(filas) == 0:
+        return out
+
+    xl, xr, yl, yr = x[L], x[R], y[L], y[R]
+    h = xr - xl
+    t = (x[filas] - xl) / h
+    delta = (yr - yl) / h
+
+    if metodo == "lineal":
+        vals = yl + t * (yr - yl)
+    else:
+        # vecinos exteriores del hueco (misma estación y con dato); si no hay, secante del hueco
+        g = grupos[filas]
+        Lp = np.clip(L - 1, 0, None)
+        Rn = np.clip(R + 1, None, n - 1)
+        hay_prev = (L - 1 >= 0) & ~np.isnan(y[Lp]) & (grupos[Lp] == g)
+        hay_next = (R + 1 < n) & ~np.isnan(y[Rn]) & (grupos[Rn] == g)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if metodo == "pchip":
+                h_prev, h_next = xl - x[Lp], x[Rn] - xr
+                m_l = np.where(hay_prev, _pendiente_pchip((yl - y[Lp]) / h_prev, h_prev, delta, h), delta)
+                m_r = np.where(hay_next, _pendiente_pchip(delta, h, (y[Rn] - yr) / h_next, h_next), delta)
+            else:
+                m_l = np.where(hay_prev, (yr - y[Lp]) / (xr - x[Lp]), delta)
+                m_r = np.where(hay_next, (y[Rn] - yl) / (x[Rn] - xl), delta)
+        t2, t3 = t * t, t * t * t
+        vals = ((2 * t3 - 3 * t2 + 1) * yl + (t3 - 2 * t2 + t) * h * m_l
+                + (-2 * t3 + 3 * t2) * yr + (t3 - t2) * h * m_r)
+
+    if minimo is not None:
+        vals = np.maximum(vals, minimo)
+    out[filas] = vals
+    return out
+
+
+def _ordenar_por_estacion(df: pd.DataFrame, valores: pd.Series,
+                          col_estacion: str, col_fecha: str):
+    """
+    (y, grupos, x, orden) en orden (estación, fecha). `orden` es None si las
+    filas ya estaban ordenadas. Las filas sin fecha quedan cada una en su
+    propio grupo: no sirven de ancla ni se rellenan.
+    """
+    y = valores.to_numpy(dtype=float, na_value=np.nan)
+    n = len(y)
+    grupos = (pd.factorize(df[col_estacion], use_na_sentinel=False)[0]
+              if col_estacion in df.columns else np.zeros(n, dtype=np.int64))
+    if col_fecha in df.columns:
+        fechas = pd.to_datetime(df[col_fecha], errors="coerce")
+        x = fechas.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(float)
+        x[fechas.isna().to_numpy()] = np.nan
+    else:
+        x = np.arange(n, dtype=float)
+
+    ordenado = n < 2 or bool(np.all((grupos[1:] > grupos[:-1])
+                                    | ((grupos[1:] == grupos[:-1]) & (x[1:] >= x[:-1]))))
+    orden = None if ordenado else np.lexsort((x, grupos))
+    if orden is not None:
+        y, grupos, x = y[orden], grupos[orden], x[orden]
+    sin_fecha = np.isnan(x)
+    if sin_fecha.any():
+        x = np.where(sin_fecha, 0.0, x)
+        grupos = np.where(sin_fecha, -1 - np.arange(n), grupos)
+    return y, grupos, x, orden
+
+
+def interpolar_columna(df: pd.DataFrame, valores: pd.Series,
+                       col_estacion: str = "id_estacion",
+                       col_fecha: str = "fecha",
+                       metodo: str = "pchip",
+                       max_hueco: int = 5,
+                       minimo: Optional[float] = None,
+                       estadisticas: Optional[dict] = None) -> np.ndarray:
+    """
+    Interpola `valores` (alineados con df) por estación y en orden de fecha,
+    sin importar el orden de las filas de df. Si se pasa `estadisticas` se
+    completa con estadisticas_huecos. Retorna los valores en el orden de df.
+    """
+    y, grupos, x, orden = _ordenar_por_estacion(df, valores, col_estacion, col_fecha)
+    if estadisticas is not None:
+        estadisticas.update(estadisticas_huecos(y, grupos, max_hueco))
+    res = interpolar(y, grupos, x, metodo=metodo, max_hueco=max_hueco, minimo=minimo)
+    if orden is not None:
+        out = np.empty_like(res)
+        out[orden] = res
+        return out
+    return res
+
+
+def resumen_huecos(df: pd.DataFrame, col: str,
+                   col_estacion: str = "id_estacion",
+                   col_fecha: str = "fecha",
+                   max_hueco: int = 5) -> dict:
+    """estadisticas_huecos de una columna de df, por estación y en orden de fecha."""
+    y, grupos, _, _ = _ordenar_por_estacion(df, df[col], col_estacion, col_fecha)
+    return estadisticas_huecos(y, grupos, max_hueco)
@@ -9,14 +9,47 @@ de tablas, preparación de datos y carga masiva.
 
 import os
 import logging
+import sqlite3
+from datetime import datetime
+from uuid import uuid4
 import pandas as pd
 from sqlalchemy import create_engine, text, MetaData, Table, Column, Integer, String, Float, Date, ForeignKey
 from sqlalchemy.exc import SQLAlchemyError
 from typing import Tuple, Optional
 
+try:
+    from ETL.clima.calendario import DESDE, HASTA, cargar_calendario
+    from ETL.clima.carga_masiva import columnas_tabla, modo_carga_masiva, upsert_masivo
+except ImportError:  # ejecución directa desde ETL/clima
+    from calendario import DESDE, HASTA, cargar_calendario
+    from carga_masiva import columnas_tabla, modo_carga_masiva, upsert_masivo
+
 # Configuración de logging
 log = logging.getLogger(__name__)
 
+# Filas de clima que no pasaron la validación de claves foráneas (una fila por
+# rechazo y carga; IdEstacion sin tipo porque puede venir cualquier id)
+DDL_CLIMA_RECHAZOS = """
+CREATE TABLE IF NOT EXISTS clima_rechazos (
+    IdEstacion,
+    IdFecha                       INTEGER,
+
+    precipitacion_pluviometrica   REAL,
+    temperatura_minima            REAL,
+    temperatura_maxima            REAL,
+    temperatura_media             REAL,
+    humedad_media                 REAL,
+    rocio_medio                   REAL,
+    tesion_vapor_media            REAL,
+    radiacion_global              REAL,
+    heliofania_efectiva           REAL,
+    heliofania_relativa           REAL,
+
+    motivo                        TEXT NOT NULL,
+    carga                         TEXT NOT NULL
+);
+"""
+
 # =============================================================================
 # Funciones de creación de tablas
 # =============================================================================
@@ -42,7 +75,12 @@ def create_tables(engine) -> bool:
             trimestre        INTEGER,
             semestre         INTEGER,
             bisiesto         INTEGER,
-            quincena         INTEGER
+            quincena         INTEGER,
+            semanaMes        INTEGER,
+            diaSemana        TEXT,
+            diaNumeroSemana  INTEGER,
+            semana_epidemiologica INTEGER,
+            anio_epidemiologico   INTEGER
         );
 
         -- Estaciones meteorológicas
@@ -84,7 +122,7 @@ def create_tables(engine) -> bool:
         """
 
         with engine.begin() as conn:
-            for stmt in ddl.strip().split(";"):
+            for stmt in (ddl + DDL_CLIMA_RECHAZOS).strip().split(";"):
                 s = stmt.strip()
                 if s:
                     conn.execute(text(s))
@@ -99,53 +137,12 @@ def create_tables(engine) -> bool:
 
 def create_calendario_table(engine) -> bool:
     """
-    Crea y pobla la tabla calendario con fechas desde 1900 hasta 2100.
+    Crea y pobla la tabla calendario con fechas desde 1900 hasta 2100
+    (calendario.cargar_calendario: una pasada vectorizada y un executemany).
     Retorna True si se creó exitosamente, False en caso contrario.
     """
     try:
-        # Verificar si ya existe la tabla calendario
-        with engine.connect() as conn:
-            result = conn.execute(text("SELECT COUNT(*) FROM calendario"))
-            count = result.scalar()
-            if count > 0:
-                log.info("Tabla calendario ya poblada")
-                return True
-
-        # Crear rango de fechas en lotes más pequeños para evitar límite de variables SQL
-        start_date = pd.Timestamp('1900-01-01')
-        end_date = pd.Timestamp('2100-12-31')
-        batch_size = 365  # Un año por lote
-
-        total_inserted = 0
-        current_date = start_date
-
-        while current_date <= end_date:
-            batch_end = min(current_date + pd.Timedelta(days=batch_size-1), end_date)
-            fechas = pd.date_range(start=current_date, end=batch_end, freq='D')
-
-            # Crear DataFrame con las columnas necesarias
-            calendario_df = pd.DataFrame({
-                'fecha': fechas.strftime('%Y-%m-%d'),
-                'dia': fechas.day,
-                'mes': fechas.month,
-                'anio': fechas.year,
-                'semana': fechas.isocalendar().week,
-                'trimestre': ((fechas.month - 1) // 3) + 1,
-                'semestre': ((fechas.month - 1) // 6) + 1,
-                'bisiesto': fechas.is_leap_year.astype(int),
-                'quincena': ((fechas.day - 1) // 15) + 1
-            })
-
-            # Crear IdFecha como YYYYMMDD
-            calendario_df['IdFecha'] = fechas.strftime('%Y%m%d').astype(int)
-
-            # Cargar a la base de datos
-            calendario_df.to_sql('calendario', engine, if_exists='append', index=False, method='multi')
-
-            total_inserted += len(calendario_df)
-            current_date = batch_end + pd.Timedelta(days=1)
-
-        log.info(f"Tabla calendario poblada con {total_inserted} fechas")
+        cargar_calendario(engine, DESDE, HASTA)
         return True
 
     except SQLAlchemyError as e:
@@ -275,7 +272,7 @@ def prepare_clima_data(df_transformed: pd.DataFrame, engine) -> Tuple[pd.DataFra
         df_invalid = df[df['IdEstacion'].isna()].copy()
         df = df.dropna(subset=['IdEstacion'])
 
-        # Columnas de clima a mantener
+        # Columnas de clima a mantener (mismos nombres que la tabla clima de create_tables)
         clima_cols = [
             'precipitacion_pluviometrica',
             'temperatura_minima',
@@ -283,7 +280,7 @@ def prepare_clima_data(df_transformed: pd.DataFrame, engine) -> Tuple[pd.DataFra
             'temperatura_media',
             'humedad_media',
             'rocio_medio',
-            'tension_vapor_medio',
+            'tesion_vapor_media',
             'radiacion_global',
             'heliofania_efectiva',
             'heliofania_relativa'
@@ -295,14 +292,6 @@ def prepare_clima_data(df_transformed: pd.DataFrame, engine) -> Tuple[pd.DataFra
         # DataFrame final con columnas necesarias
         df_clima = df[['IdEstacion', 'IdFecha'] + existing_clima_cols].copy()
 
-        # Renombrar temperatura_media a temperatura_promedio para coincidir con la tabla
-        if 'temperatura_media' in df_clima.columns:
-            df_clima = df_clima.rename(columns={'temperatura_media': 'temperatura_promedio'})
-
-        # Renombrar tension_vapor_medio a tension_vapor_medio
-        if 'tesion_vapor_media' in df_clima.columns:
-            df_clima = df_clima.rename(columns={'tesion_vapor_media': 'tension_vapor_medio'})
-
         log.info(f"Datos preparados: {len(df_clima)} válidos, {len(df_invalid)} inválidos")
         return df_clima, df_invalid
 
@@ -311,9 +300,65 @@ def prepare_clima_data(df_transformed: pd.DataFrame, engine) -> Tuple[pd.DataFra
         return pd.DataFrame(), df_transformed
 
 
-def load_clima_to_db(engine, df_clima: pd.DataFrame) -> bool:
+def _cargar_validando(conn, df_clima: pd.DataFrame) -> dict:
+    """
+    Valida las claves foráneas en SQLite, por conjuntos: carga df_clima a una
+    tabla temporal, pasa a clima_rechazos (con el motivo) las filas cuya
+    estación o fecha no existen en las dimensiones (anti-join) y hace upsert
+    del resto en clima con un único INSERT ... SELECT.
+    Retorna {carga, staging, cargadas, rechazos: {motivo: filas}}.
     """
-    Carga los datos climáticos preparados a la tabla clima.
+    conn.exec_driver_sql(DDL_CLIMA_RECHAZOS)
+    sin_lugar = [c for c in df_clima.columns if c not in columnas_tabla(conn, 'clima')]
+    if sin_lugar:
+        log.warning(f"Columnas de df_clima que no existen en la tabla clima, no se cargan: {sin_lugar}")
+    conn.exec_driver_sql("DROP TABLE IF EXISTS temp.clima_staging")
+    conn.exec_driver_sql("CREATE TEMP TABLE clima_staging AS SELECT * FROM clima WHERE 0")
+    staging = upsert_masivo(conn, 'clima_staging', df_clima, clave=[])
+
+    columnas = [c for c in columnas_tabla(conn, 'clima') if c in df_clima.columns]
+    cols = ", ".join(f'"{c}"' for c in columnas)
+    cols_s = ", ".join(f's."{c}"' for c in columnas)
+    # id único por carga (dos cargas en el mismo segundo no deben mezclar rechazos)
+    carga = f"{datetime.now().isoformat(timespec='microseconds')}-{uuid4().hex[:8]}"
+
+    conn.execute(text(f"""
+        INSERT INTO clima_rechazos ({cols}, motivo, carga)
+        SELECT {cols_s},
+               CASE WHEN s.IdEstacion IS NULL OR s.IdFecha IS NULL THEN 'clave nula'
+                    WHEN e.IdEstacion IS NULL AND c.IdFecha IS NULL THEN 'estacion y fecha inexistentes'
+                    WHEN e.IdEstacion IS NULL THEN 'estacion inexistente'
+                    ELSE 'fecha inexistente' END,
+               :carga
+        FROM clima_staging s
+        LEFT JOIN estaciones e ON e.IdEstacion = s.IdEstacion
+        LEFT JOIN calendario c ON c.IdFecha = s.IdFecha
+        WHERE e.IdEstacion IS NULL OR c.IdFecha IS NULL
+    """), {"carga": carga})
+    rechazos = dict(conn.execute(text(
+        "SELECT motivo, COUNT(*) FROM clima_rechazos WHERE carga = :carga GROUP BY motivo"
+    ), {"carga": carga}).fetchall())
+
+    actualizar = ", ".join(f'"{c}" = excluded."{c}"' for c in columnas if c not in ('IdEstacion', 'IdFecha'))
+    cargadas = conn.exec_driver_sql(f"""
+        INSERT INTO clima ({cols})
+        SELECT {cols_s}
+        FROM clima_staging s
+        WHERE EXISTS (SELECT 1 FROM estaciones e WHERE e.IdEstacion = s.IdEstacion)
+          AND EXISTS (SELECT 1 FROM calendario c WHERE c.IdFecha = s.IdFecha)
+        ON CONFLICT (IdEstacion, IdFecha) DO {'UPDATE SET ' + actualizar if actualizar else 'NOTHING'}
+    """).rowcount
+    conn.exec_driver_sql("DROP TABLE temp.clima_staging")
+    return {"carga": carga, "staging": staging, "cargadas": cargadas, "rechazos": rechazos}
+
+
+def load_clima_to_db(engine, df_clima: pd.DataFrame, carga_masiva: Optional[bool] = None) -> bool:
+    """
+    Carga los datos climáticos preparados a la tabla clima. Las filas con
+    estación o fecha inexistentes van a clima_rechazos con el motivo.
+    Con `carga_masiva` (por defecto: si la tabla clima está vacía, es decir
+    la primera carga completa) se posterga la creación de índices y se usan
+    los PRAGMA de carga (ver carga_masiva.modo_carga_masiva).
     Retorna True si se cargaron exitosamente, False en caso contrario.
     """
     try:
@@ -321,37 +366,26 @@ def load_clima_to_db(engine, df_clima: pd.DataFrame) -> bool:
             log.warning("No hay datos climáticos para cargar")
             return False
 
-        # Verificar que existan las claves foráneas
-        with engine.connect() as conn:
-            # Verificar estaciones
-            estaciones_validas = df_clima['IdEstacion'].isin(
-                pd.read_sql("SELECT IdEstacion FROM estaciones", conn)['IdEstacion']
-            )
-            if not estaciones_validas.all():
-                invalid_est = df_clima[~estaciones_validas]['IdEstacion'].unique()
-                log.warning(f"Estaciones inválidas encontradas: {invalid_est}")
-                df_clima = df_clima[estaciones_validas]
-
-            # Verificar fechas
-            fechas_validas = df_clima['IdFecha'].isin(
-                pd.read_sql("SELECT IdFecha FROM calendario", conn)['IdFecha']
-            )
-            if not fechas_validas.all():
-                invalid_fechas = df_clima[~fechas_validas]['IdFecha'].unique()
-                log.warning(f"Fechas inválidas encontradas: {invalid_fechas}")
-                df_clima = df_clima[fechas_validas]
+        if carga_masiva is None:
+            with engine.connect() as conn:
+                carga_masiva = conn.execute(text("SELECT 1 FROM clima LIMIT 1")).first() is None
 
-        if df_clima.empty:
+        # Validación de FK y carga en la misma transacción
+        with (modo_carga_masiva(engine, ["clima"]) if carga_masiva else engine.begin()) as conn:
+            resumen = _cargar_validando(conn, df_clima)
+
+        for motivo, n in resumen["rechazos"].items():
+            log.warning(f"Filas rechazadas ({motivo}): {n} → clima_rechazos (carga {resumen['carga']})")
+        if resumen["cargadas"] == 0:
             log.error("No quedan datos válidos después de validación de FK")
             return False
 
-        # Cargar datos usando to_sql con manejo de conflictos
-        df_clima.to_sql('clima', engine, if_exists='append', index=False, method='multi')
-
-        log.info(f"Datos climáticos cargados: {len(df_clima)} registros")
+        log.info(f"Datos climáticos cargados{' (carga masiva)' if carga_masiva else ''}: "
+                 f"{resumen['cargadas']} registros, {sum(resumen['rechazos'].values())} rechazados "
+                 f"({resumen['staging']['filas_por_s']:,.0f} filas/s a staging)")
         return True
 
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, sqlite3.Error) as e:
         log.error(f"Error cargando datos climáticos: {e}")
         return False
 
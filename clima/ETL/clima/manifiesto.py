@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Manifiesto de descargas por estación
+------------------------------------
+Registra, para cada estación descargada, cuándo se bajó, el hash del contenido,
+el tamaño en bytes, la cantidad de filas y la fecha máxima de la serie.
+
+Permite que la extracción sea incremental y reanudable:
+- Se guarda después de cada estación, así una interrupción no pierde lo hecho.
+- Solo se vuelven a pedir estaciones nuevas o cuya fecha 'Hasta' del catálogo
+  (estaciones-meteorologicas-inta.csv) sea posterior a lo registrado.
+- Si el contenido descargado tiene el mismo hash, no se vuelve a procesar.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import pandas as pd
+
+
+# =============================================================================
+# Lectura / escritura
+# =============================================================================
+
+def cargar_manifiesto(path: str) -> Dict[str, dict]:
+    """Lee el manifiesto (JSON id_estacion -> entrada). Vacío si no existe."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"Manifiesto ilegible ({e}), se empieza de cero: {path}")
+        return {}
+
+
+def guardar_manifiesto(manifiesto: Mapping[str, dict], path: str) -> None:
+    """Escritura atómica (archivo temporal + os.replace) para sobrevivir cortes."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifiesto, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Entradas
+# =============================================================================
+
+def hash_contenido(contenido: bytes) -> str:
+    """SHA-256 del contenido crudo descargado."""
+    return hashlib.sha256(contenido).hexdigest()
+
+
+def sin_cambios(manifiesto: Mapping[str, dict], id_estacion: str, hash_nuevo: str) -> bool:
+    """True si la estación ya está registrada con el mismo hash de contenido."""
+    entrada = manifiesto.get(str(id_estacion))
+    return bool(entrada) and entrada.get("hash") == hash_nuevo
+
+
+def registrar_estacion(manifiesto: Dict[str, dict],
+                       id_estacion: str,
+                       contenido: bytes,
+                       df: Optional[pd.DataFrame] = None,
+                       col_fecha: str = "Fecha") -> dict:
+    """Crea/actualiza la entrada de una estación y la devuelve."""
+    filas = None
+    fecha_max = None
+    if df is not None:
+        filas = int(len(df))
+        if col_fecha in df.columns:
+            fmax = pd.to_datetime(df[col_fecha], errors="coerce").max()
+            if pd.notna(fmax):
+                fecha_max = fmax.strftime("%Y-%m-%d")
+
+    entrada = {
+        "id_estacion": str(id_estacion),
+        "descargado": datetime.now().isoformat(timespec="seconds"),
+        "hash": hash_contenido(contenido),
+        "bytes": len(contenido),
+        "filas": filas,
+        "fecha_max": fecha_max,
+    }
+    manifiesto[str(id_estacion)] = entrada
+    return entrada
+
+
+def marcar_verificada(manifiesto: Dict[str, dict], id_estacion: str) -> None:
+    """Actualiza solo la fecha de descarga (contenido idéntico al registrado)."""
+    entrada = manifiesto.get(str(id_estacion))
+    if entrada is not None:
+        entrada["descargado"] = datetime.now().isoformat(timespec="seconds")
+
+
+# =============================================================================
+# Selección de estaciones a descargar
+# =============================================================================
+
+def _fecha_referencia(entrada: dict) -> Optional[pd.Timestamp]:
+    """Fecha hasta la cual la estación está cubierta según el manifiesto."""
+    valor = entrada.get("fecha_max") or entrada.get("descargado")
+    if not valor:
+        return None
+    ts = pd.to_datetime(valor, errors="coerce")
+    return None if pd.isna(ts) else ts.normalize()
+
+
+def fechas_hasta(df_estaciones: pd.DataFrame,
+                 col_id: str = "id_interno",
+                 col_hasta: str = "hasta") -> Dict[str, pd.Timestamp]:
+    """Mapa id_estacion -> fecha 'Hasta' del catálogo (formato dd/mm/aaaa)."""
+    if col_id not in df_estaciones.columns or col_hasta not in df_estaciones.columns:
+        return {}
+    hasta = pd.to_datetime(df_estaciones[col_hasta], format="%d/%m/%Y", errors="coerce")
+    ids = df_estaciones[col_id].astype(str)
+    return {i: h for i, h in zip(ids, hasta) if pd.notna(h)}
+
+
+def estaciones_a_descargar(ids: Iterable[str],
+                           manifiesto: Mapping[str, dict],
+                           hasta: Optional[Mapping[str, pd.Timestamp]] = None) -> List[str]:
+    """
+    Filtra los ids que hay que pedir:
+      - no figuran en el manifiesto (nuevas o interrumpidas antes de terminar);
+      - o su 'Hasta' del catálogo es posterior a la fecha cubierta registrada.
+    Si no hay fecha 'Hasta' para una estación ya registrada, se la saltea.
+    """
+    hasta = hasta or {}
+    pendientes = []
+    for id_est in ids:
+        id_est = str(id_est)
+        entrada = manifiesto.get(id_est)
+        if not entrada or not entrada.get("hash"):
+            pendientes.append(id_est)
+            continue
+        h = hasta.get(id_est)
+        ref = _fecha_referencia(entrada)
+        if h is not None and (ref is None or h > ref):
+            pendientes.append(id_est)
+    return pendientes
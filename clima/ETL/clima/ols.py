@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Regresión lineal simple (un predictor) por grupos, en forma cerrada
+-------------------------------------------------------------------
+Reemplaza a sklearn.linear_model.LinearRegression en las imputaciones de
+transform.py. Con transformaciones por estación eran cientos de ajustes
+chicos, cada uno pagando la validación de sklearn; acá se ajustan todos los
+grupos a la vez con sumas agrupadas (np.bincount):
+
+    pendiente = Sxy / Sxx        ordenada = media_y - pendiente * media_x
+
+Las sumas Sxx y Sxy se toman sobre x e y centrados en la media de su grupo
+(dos pasadas) para no perder precisión cuando |x| es grande respecto de su
+dispersión. Si Sxx == 0 la pendiente es 0, como la solución de mínima norma
+de sklearn.
+
+Los grupos con menos de `min_muestras` observaciones quedan sin ajuste (NaN),
+con la misma semántica que MIN_REG_SAMPLES en transform.py.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class AjusteOLS(NamedTuple):
+    """Parámetros por grupo; NaN donde no hubo muestras suficientes."""
+    pendiente: np.ndarray
+    ordenada: np.ndarray
+    n: np.ndarray
+
+
+def ajustar(x: np.ndarray, y: np.ndarray,
+            grupos: Optional[np.ndarray] = None,
+            n_grupos: Optional[int] = None,
+            min_muestras: int = 1) -> AjusteOLS:
+    """
+    Ajusta y ~ x para cada grupo. `grupos` son códigos enteros 0..n_grupos-1
+    (p. ej. pd.factorize de id_estacion); sin `grupos` hay un único grupo.
+    x e y no deben tener NaN (filtrar antes).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if grupos is None:
+        grupos = np.zeros(len(x), dtype=np.int64)
+        n_grupos = 1
+    elif n_grupos is None:
+        n_grupos = int(grupos.max()) + 1 if len(grupos) else 0
+
+    n = np.bincount(grupos, minlength=n_grupos)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mx = np.bincount(grupos, weights=x, minlength=n_grupos) / n
+        my = np.bincount(grupos, weights=y, minlength=n_grupos) / n
+        dx = x - mx[grupos]
+        dy = y - my[grupos]
+        sxx = np.bincount(grupos, weights=dx * dx, minlength=n_grupos)
+        sxy = np.bincount(grupos, weights=dx * dy, minlength=n_grupos)
+        pendiente = np.where(sxx > 0, sxy / sxx, 0.0)
+    ordenada = my - pendiente * mx
+
+    sin_ajuste = n < max(1, min_muestras)
+    pendiente[sin_ajuste] = np.nan
+    ordenada[sin_ajuste] = np.nan
+    return AjusteOLS(pendiente, ordenada, n)
+
+
+def predecir(ajuste: AjusteOLS, x: np.ndarray, grupos: Optional[np.ndarray] = None) -> np.ndarray:
+    """Predicción vectorizada; NaN para filas de grupos sin ajuste."""
+    x = np.asarray(x, dtype=float)
+    if grupos is None:
+        return x * ajuste.pendiente[0] + ajuste.ordenada[0]
+    return x * ajuste.pendiente[grupos] + ajuste.ordenada[grupos]
+
+
+def como_tupla(ajuste: AjusteOLS, grupo: int = 0) -> Optional[tuple]:
+    """(pendiente, ordenada) de un grupo como floats, o None si no tiene ajuste."""
+    pendiente = ajuste.pendiente[grupo]
+    if np.isnan(pendiente):
+        return None
+    return float(pendiente), float(ajuste.ordenada[grupo])
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Parseo de XLS en paralelo, desacoplado de la descarga
+-----------------------------------------------------
+Pipeline productor/consumidor en tres etapas:
+
+    descarga (hilos)  ->  parseo XLS (pool de procesos)  ->  escritura (un hilo)
+
+- El productor entrega bytes crudos con `enviar`; si hay demasiadas estaciones
+  sin escribir (parseándose o esperando al escritor) se bloquea
+  (contrapresión) en lugar de acumular memoria.
+- pd.read_excel (xlrd) es CPU-bound, por eso corre en procesos aparte.
+- Un único hilo escritor drena los resultados, así el manifiesto y los
+  archivos de salida no se escriben de forma concurrente.
+- Se exponen profundidad de colas y tiempos por etapa (MetricasPipeline).
+
+También sirve sin red: en modo INTA_SOLO_CACHE extract.py le envía los .xls
+del cache crudo (CacheCrudo.iterar_ultimos; una carpeta de .xls sueltos se
+importa antes con CacheCrudo.importar_carpeta).
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Callable, List, Optional, Tuple
+
+import pandas as pd
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+DEFAULT_PROCESOS = int(os.getenv("INTA_PROCESOS", str(max(1, (os.cpu_count() or 2) - 1))))
+DEFAULT_PENDIENTES = 2 * DEFAULT_PROCESOS   # estaciones sin escribir antes de frenar al productor
+
+
+# =============================================================================
+# Etapa de parseo (corre en procesos hijos)
+# =============================================================================
+
+def parsear_xls(contenido: bytes) -> Tuple[pd.DataFrame, float]:
+    """Parsea el .xls de una estación. Retorna (DataFrame, segundos de CPU de parseo)."""
+    t0 = time.process_time()
+    df = pd.read_excel(BytesIO(contenido), engine='xlrd')
+    return df, time.process_time() - t0
+
+
+# =============================================================================
+# Métricas
+# =============================================================================
+
+@dataclass
+class MetricasPipeline:
+    """Tiempos por etapa y profundidad de colas muestreada en cada envío."""
+    inicio: float = field(default_factory=time.perf_counter)
+    fin: Optional[float] = None
+    enviados: int = 0
+    parseados: int = 0
+    errores: int = 0
+    t_parseo: List[float] = field(default_factory=list)
+    t_escritura: List[float] = field(default_factory=list)
+    t_bloqueo_productor: float = 0.0
+    prof_parseo: List[int] = field(default_factory=list)
+    prof_escritura: List[int] = field(default_factory=list)
+
+    def resumen(self) -> dict:
+        duracion = (self.fin or time.perf_counter()) - self.inicio
+
+        def _stats(xs):
+            return {"total_s": round(sum(xs), 3),
+                    "media_s": round(sum(xs) / len(xs), 4) if xs else None,
+                    "max_s": round(max(xs), 4) if xs else None}
+
+        def _prof(xs):
+            return {"media": round(sum(xs) / len(xs), 2) if xs else 0, "max": max(xs) if xs else 0}
+
+        return {
+            "duracion_s": round(duracion, 2),
+            "enviados": self.enviados,
+            "parseados": self.parseados,
+            "errores": self.errores,
+            "estaciones_por_s": round(self.parseados / duracion, 3) if duracion > 0 else None,
+            "parseo": _stats(self.t_parseo),
+            "escritura": _stats(self.t_escritura),
+            "productor_bloqueado_s": round(self.t_bloqueo_productor, 3),
+            "cola_parseo": _prof(self.prof_parseo),
+            "cola_escritura": _prof(self.prof_escritura),
+        }
+
+
+# =============================================================================
+# Pipeline
+# =============================================================================
+
+_FIN = object()
+
+
+class PipelineXLS:
+    """
+    Orquesta parseo en procesos y un escritor único.
+
+    escribir(id_estacion, df, contenido) se llama desde el hilo escritor con
+    cada estación parseada; sus excepciones se cuentan como errores y no
+    detienen el pipeline. `max_pendientes` acota las estaciones enviadas y
+    todavía no escritas (en parseo o en la cola del escritor).
+    """
+
+    def __init__(self,
+                 escribir: Callable[[str, pd.DataFrame, bytes], None],
+                 max_procesos: int = DEFAULT_PROCESOS,
+                 max_pendientes: Optional[int] = None,
+                 metricas: Optional[MetricasPipeline] = None):
+        self.escribir = escribir
+        self.metricas = metricas or MetricasPipeline()
+        self._pool = ProcessPoolExecutor(max_workers=max(1, max_procesos))
+        self._cupo = threading.BoundedSemaphore(max_pendientes or 2 * max(1, max_procesos))
+        self._en_vuelo = 0
+        self._lock = threading.Lock()
+        self._cola: "queue.Queue" = queue.Queue()
+        self._escritor = threading.Thread(target=self._drenar, name="escritor-xls", daemon=True)
+        self._escritor.start()
+
+    # --- productor -----------------------------------------------------------
+    def enviar(self, id_estacion: str, contenido: bytes) -> None:
+        """Encola bytes crudos para parsear; bloquea si hay demasiadas estaciones sin escribir."""
+        t0 = time.perf_counter()
+        self._cupo.acquire()
+        self.metricas.t_bloqueo_productor += time.perf_counter() - t0
+
+        with self._lock:
+            self._en_vuelo += 1
+            self.metricas.enviados += 1
+            self.metricas.prof_parseo.append(self._en_vuelo)
+            self.metricas.prof_escritura.append(self._cola.qsize())
+
+        fut = self._pool.submit(parsear_xls, contenido)
+        fut.add_done_callback(lambda f, i=id_estacion, c=contenido: self._parseado(i, c, f))
+
+    def _parseado(self, id_estacion: str, contenido: bytes, fut) -> None:
+        # el cupo se libera recién en _drenar, después de escribir
+        with self._lock:
+            self._en_vuelo -= 1
+        self._cola.put((id_estacion, contenido, fut))
+
+    # --- escritor ------------------------------------------------------------
+    def _drenar(self) -> None:
+        while True:
+            item = self._cola.get()
+            if item is _FIN:
+                break
+            id_estacion, contenido, fut = item
+            try:
+                df, segundos = fut.result()
+                self.metricas.t_parseo.append(segundos)
+                self.metricas.parseados += 1
+                t0 = time.perf_counter()
+                self.escribir(id_estacion, df, contenido)
+                self.metricas.t_escritura.append(time.perf_counter() - t0)
+            except Exception as e:
+                self.metricas.errores += 1
+                print(f"{id_estacion}: error al parsear/escribir → {e}")
+            finally:
+                # no retener la estación escrita mientras se espera la siguiente
+                item = contenido = fut = df = None
+                self._cupo.release()
+
+    # --- cierre --------------------------------------------------------------
+    def cerrar(self) -> dict:
+        """Espera parseos y escrituras pendientes. Retorna el resumen de métricas."""
+        self._pool.shutdown(wait=True)
+        self._cola.put(_FIN)
+        self._escritor.join()
+        self.metricas.fin = time.perf_counter()
+        return self.metricas.resumen()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Transformación fuera de memoria por bloques (pyarrow.dataset)
+-------------------------------------------------------------
+run_eda_transformations necesita todo el dataset en un único DataFrame. Este
+modo recorre la fuente de a un bloque por vez y escribe cada bloque
+transformado al Parquet de salida, así la memoria pico queda acotada por el
+bloque más grande y no por el total.
+
+Fuente: un Parquet con una row group por estación (datos-todas-estaciones.parquet,
+ver escritura.consolidar_particiones) o el dataset particionado por estación
+(estaciones-parquet/). En ambos casos un bloque es una estación, por lo que
+duplicados, interpolaciones, spline y mediana móvil no mezclan estaciones.
+
+Los estadísticos globales se calculan antes, en una primera pasada:
+  a) una lectura completa acumula min/max de precipitación, las diferencias
+     |min-media| y |max-media| de temperatura, |T - Td| del rocío y las sumas
+     de las regresiones radiación ~ heliofanía y efectiva ~ relativa;
+  b) una segunda lectura, solo de fecha/radiación/heliofanía, aplica las
+     regresiones ya ajustadas y con eso arma las medianas (mes, hora)
+     diurnas de radiación y la regresión relativa ~ efectiva (que en el
+     pipeline se entrena después de imputar la efectiva).
+Después cada bloque se transforma con esos parámetros fijos (ver
+transform._param), igual que si se hubieran calculado sobre todo el dataset.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+try:
+    from ETL.clima.escritura import EscritorParquet, unificar_esquemas
+    from ETL.clima.tipos import COMPACTO, a_tabla
+    from ETL.clima.transform import (
+        DAY_HOURS, ETAPAS, MIN_REG_SAMPLES, RAD_MAX_FISICO,
+        _aplicar_etapas, _mediana_mes_hora, _transformar_variables,
+    )
+except ImportError:  # ejecución directa desde ETL/clima
+    from escritura import EscritorParquet, unificar_esquemas
+    from tipos import COMPACTO, a_tabla
+    from transform import (
+        DAY_HOURS, ETAPAS, MIN_REG_SAMPLES, RAD_MAX_FISICO,
+        _aplicar_etapas, _mediana_mes_hora, _transformar_variables,
+    )
+
+
+# =============================================================================
+# Lectura por bloques
+# =============================================================================
+
+def abrir_dataset(fuente: str) -> ds.Dataset:
+    """Dataset sobre un archivo o carpeta Hive, con el esquema unificado de todos los archivos."""
+    particionado = os.path.isdir(fuente)
+    dataset = ds.dataset(fuente, format="parquet", partitioning="hive" if particionado else None)
+    if not particionado:
+        return dataset
+    esquema = unificar_esquemas(
+        [f.physical_schema for f in dataset.get_fragments()] + [dataset.partitioning.schema]
+    )
+    return ds.dataset(fuente, format="parquet", partitioning="hive", schema=esquema)
+
+
+def iterar_bloques(dataset: ds.Dataset, columns: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Un DataFrame por row group (una estación), leyendo solo `columns` si se indican."""
+    if columns is not None:
+        columns = [c for c in dataset.schema.names if c in set(columns)]
+    for fragmento in dataset.get_fragments():
+        for rg in fragmento.split_by_row_group():
+            yield rg.to_table(schema=dataset.schema, columns=columns).to_pandas(date_as_object=False)
+
+
+# =============================================================================
+# Primera pasada: estadísticos globales
+# =============================================================================
+
+class SumasOLS:
+    """
+    Momentos acumulables de y ~ x (n, medias, co-momentos centrados) que se
+    combinan entre bloques sin perder precisión (fórmula de Chan).
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.mx = self.my = 0.0
+        self.sxx = self.sxy = 0.0
+
+    def agregar(self, x: np.ndarray, y: np.ndarray) -> None:
+        n_b = len(x)
+        if n_b == 0:
+            return
+        mx_b, my_b = x.mean(), y.mean()
+        dx, dy = x - mx_b, y - my_b
+        sxx_b, sxy_b = float(dx @ dx), float(dx @ dy)
+        n = self.n + n_b
+        delta_x, delta_y = mx_b - self.mx, my_b - self.my
+        self.sxx += sxx_b + delta_x * delta_x * self.n * n_b / n
+        self.sxy += sxy_b + delta_x * delta_y * self.n * n_b / n
+        self.mx += delta_x * n_b / n
+        self.my += delta_y * n_b / n
+        self.n = n
+
+    def ajuste(self, min_reg_samples: int = MIN_REG_SAMPLES) -> Optional[tuple]:
+        """(pendiente, ordenada) o None si no hay muestras suficientes (como _ajuste_lineal)."""
+        if self.n < min_reg_samples:
+            return None
+        pendiente = self.sxy / self.sxx if self.sxx > 0 else 0.0
+        return float(pendiente), float(self.my - pendiente * self.mx)
+
+
+class _Media:
+    def __init__(self):
+        self.suma, self.n = 0.0, 0
+
+    def agregar(self, valores: pd.Series) -> None:
+        valores = valores.dropna()
+        self.suma += float(valores.sum())
+        self.n += len(valores)
+
+    def valor(self, vacio: float = np.nan) -> float:
+        return self.suma / self.n if self.n else vacio
+
+
+def _dia_mes_hora(fecha: pd.Series):
+    hora = fecha.dt.hour.to_numpy(dtype=float, na_value=np.nan)
+    mes = fecha.dt.month.to_numpy(dtype=float, na_value=np.nan)
+    dia = np.isin(hora, np.asarray(list(DAY_HOURS), dtype=float))
+    return dia, mes, hora
+
+
+class EstadisticosGlobales:
+    """Acumula, bloque a bloque, los parámetros que usan las transformaciones por variable."""
+
+    def __init__(self, min_reg_samples: int = MIN_REG_SAMPLES):
+        self.min_reg_samples = min_reg_samples
+        self.precip_min = np.inf
+        self.precip_max = -np.inf
+        self.dmin, self.dmax, self.rocio = _Media(), _Media(), _Media()
+        self.rad = SumasOLS()
+        self.helio_eff = SumasOLS()
+
+    def acumular(self, base: pd.DataFrame) -> None:
+        """`base` es un bloque ya normalizado (pasos 1 a 3 del pipeline)."""
+        if "precipitacion_pluviometrica" in base.columns:
+            col_log = np.log1p(base["precipitacion_pluviometrica"].clip(lower=0))
+            self.precip_min = min(self.precip_min, col_log.min(skipna=True))
+            self.precip_max = max(self.precip_max, col_log.max(skipna=True))
+
+        if {"temperatura_minima", "temperatura_maxima", "temperatura_media"}.issubset(base.columns):
+            tmin = base["temperatura_minima"].to_numpy(dtype=float, na_value=np.nan)
+            tmax = base["temperatura_maxima"].to_numpy(dtype=float, na_value=np.nan)
+            swap = tmin > tmax
+            tmin, tmax = np.where(swap, tmax, tmin), np.where(swap, tmin, tmax)
+            tmed = base["temperatura_media"].to_numpy(dtype=float, na_value=np.nan)
+            tmed = np.where(np.isnan(tmed), (tmin + tmax) / 2, tmed)
+            self.dmin.agregar(pd.Series(np.abs(tmin - tmed)))
+            self.dmax.agregar(pd.Series(np.abs(tmax - tmed)))
+            if "rocio_medio" in base.columns:
+                # el rocío se compara con la media ya interpolada (paso 4 de temperaturas)
+                tmed = pd.Series(tmed).interpolate(method="linear").to_numpy()
+                rocio = base["rocio_medio"].to_numpy(dtype=float, na_value=np.nan)
+                self.rocio.agregar(pd.Series(np.abs(tmed - rocio)))
+
+        if {"heliofania_efectiva", "heliofania_relativa"}.issubset(base.columns):
+            eff = base["heliofania_efectiva"].to_numpy(dtype=float, na_value=np.nan)
+            rel = base["heliofania_relativa"].to_numpy(dtype=float, na_value=np.nan)
+            ok = ~np.isnan(eff) & ~np.isnan(rel)
+            self.helio_eff.agregar(rel[ok], eff[ok])
+
+        if {"radiacion_global", "heliofania_efectiva", "fecha"}.issubset(base.columns):
+            dia, _, _ = _dia_mes_hora(base["fecha"])
+            rad = base["radiacion_global"].to_numpy(dtype=float, na_value=np.nan)
+            helio = base["heliofania_efectiva"].to_numpy(dtype=float, na_value=np.nan)
+            ok = dia & (rad > 0) & ~np.isnan(helio)
+            self.rad.agregar(helio[ok], rad[ok])
+
+    def params(self) -> dict:
+        """Parámetros de la primera lectura (faltan los de segunda_lectura)."""
+        sin_precip = not np.isfinite(self.precip_min)
+        return {
+            "precip_log_min": np.nan if sin_precip else float(self.precip_min),
+            "precip_log_max": np.nan if sin_precip else float(self.precip_max),
+            "temp_dmin": self.dmin.valor(),
+            "temp_dmax": self.dmax.valor(),
+            "rocio_diff": self.rocio.valor(vacio=0.0),
+            "rad_reg": self.rad.ajuste(self.min_reg_samples),
+            "helio_reg_efectiva": self.helio_eff.ajuste(self.min_reg_samples),
+        }
+
+
+def segunda_lectura(dataset: ds.Dataset, params: dict,
+                    min_reg_samples: int = MIN_REG_SAMPLES) -> dict:
+    """
+    Lee solo fecha, radiación y heliofanía; aplica las regresiones de la
+    primera lectura y agrega a `params` las medianas (mes, hora) de radiación
+    y la regresión relativa ~ efectiva. Guarda solo los valores diurnos
+    válidos de radiación, no los bloques.
+    """
+    rad_reg, eff_reg = params.get("rad_reg"), params.get("helio_reg_efectiva")
+    helio_rel = SumasOLS()
+    claves, valores = [], []
+    columnas = ["Fecha", "Radiacion_Global", "Heliofania_Efectiva", "Heliofania_Relativa"]
+    for bloque in iterar_bloques(dataset, columnas + [c.lower() for c in columnas]):
+        bloque.columns = [c.lower().strip() for c in bloque.columns]
+        n = len(bloque)
+
+        def _col(nombre):
+            if nombre not in bloque.columns:
+                return np.full(n, np.nan)
+            return bloque[nombre].to_numpy(dtype=float, na_value=np.nan, copy=True)
+
+        eff, rel = _col("heliofania_efectiva"), _col("heliofania_relativa")
+        if "heliofania_relativa" in bloque.columns and "heliofania_efectiva" in bloque.columns:
+            if eff_reg is not None:
+                nulo = np.isnan(eff) & ~np.isnan(rel)
+                eff_imp = eff.copy()
+                eff_imp[nulo] = rel[nulo] * eff_reg[0] + eff_reg[1]
+            else:
+                eff_imp = eff
+            ok = ~np.isnan(rel) & ~np.isnan(eff_imp)
+            helio_rel.agregar(eff_imp[ok], rel[ok])
+
+        if "fecha" not in bloque.columns or "radiacion_global" not in bloque.columns:
+            continue
+        dia, mes, hora = _dia_mes_hora(pd.to_datetime(bloque["fecha"], errors="coerce"))
+        rad = _col("radiacion_global")
+        if rad_reg is not None:
+            pred = dia & (np.isnan(rad) | (rad == 0)) & ~np.isnan(eff)
+            # mismo tope que run_eda_transformations al imputar por regresión
+            rad[pred] = np.clip(eff[pred] * rad_reg[0] + rad_reg[1], 0, RAD_MAX_FISICO)
+        ok = dia & (rad > 0)
+        claves.append((mes[ok] * 24 + hora[ok]).astype(np.int64))
+        valores.append(rad[ok])
+
+    params["helio_reg_relativa"] = helio_rel.ajuste(min_reg_samples)
+    if claves:
+        clave = np.concatenate(claves)
+        lut = _mediana_mes_hora(np.concatenate(valores), np.zeros(len(clave), dtype=np.int64),
+                                clave, np.ones(len(clave), dtype=bool))
+    else:
+        lut = np.full(13 * 24, np.nan)
+    params["rad_mediana_mes_hora"] = lut.tolist()
+    return params
+
+
+def estadisticos_globales(dataset: ds.Dataset, min_reg_samples: int = MIN_REG_SAMPLES) -> dict:
+    """Primera pasada completa: todos los parámetros de las transformaciones por variable."""
+    acum = EstadisticosGlobales(min_reg_samples)
+    for bloque in iterar_bloques(dataset):
+        acum.acumular(_aplicar_etapas(bloque, ETAPAS[:3]))
+    return segunda_lectura(dataset, acum.params(), min_reg_samples)
+
+
+# =============================================================================
+# Segunda pasada: transformar y escribir
+# =============================================================================
+
+def transformar_por_bloques(fuente: str, out_path: str,
+                            params: Optional[dict] = None,
+                            compacto: bool = COMPACTO) -> dict:
+    """
+    Transforma `fuente` bloque a bloque y escribe `out_path` (una row group por
+    bloque). Si no se pasan `params` se calculan con estadisticos_globales.
+    Con `compacto` el esquema de salida (tipos.py) lo fija el primer bloque.
+    Retorna un resumen con filas, bloques y tiempos de cada pasada.
+    """
+    dataset = abrir_dataset(fuente)
+    t0 = time.perf_counter()
+    if params is None:
+        params = estadisticos_globales(dataset)
+    t1 = time.perf_counter()
+
+    escritor = None
+    try:
+        for bloque in iterar_bloques(dataset):
+            out = _transformar_variables(_aplicar_etapas(bloque, ETAPAS[:3]), dict(params))
+            table = a_tabla(out, compacto)
+            if escritor is None:
+                escritor = EscritorParquet(out_path, table.schema)
+            escritor.escribir(table)
+    except BaseException:
+        if escritor is not None:
+            escritor.close(ok=False)
+        raise
+    if escritor is not None:
+        escritor.close()
+    t2 = time.perf_counter()
+
+    return {
+        "filas": escritor.filas if escritor else 0,
+        "bloques": escritor.row_groups if escritor else 0,
+        "estadisticos_s": round(t1 - t0, 2),
+        "transformacion_s": round(t2 - t1, 2),
+        "params": params,
+    }
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+Cubo semanal de clima por estación y semana epidemiológica
+----------------------------------------------------------
+Los casos de dengue (contagios, dengue-20XX.csv) son semanales por
+departamento y el clima es diario por estación. Esta etapa, posterior a
+run_eda_transformations, agrega la serie diaria a una fila por
+(id_estacion, anio, semana) con, para cada variable:
+
+    <variable>_media, _min, _max, _suma   sobre los días con dato
+    <variable>_dias                       días con dato en la semana
+
+más `inicio` (domingo de la semana), `dias` (días con fila) y `fecha_max`
+(último día con fila, para las actualizaciones incrementales).
+
+Semana epidemiológica (calendario del Boletín Epidemiológico Nacional, igual
+al de la OPS/CDC): de domingo a sábado; la semana 1 de un año es la que
+contiene el primer miércoles de enero (la que tiene al menos 4 días en el
+año). Así, los primeros días de enero pueden caer en la semana 52/53 del
+año anterior y los últimos de diciembre en la semana 1 del siguiente.
+
+El cálculo es vectorizado: un único ordenamiento por (estación, día) y
+reducciones por tramos (np.*.reduceat) para todas las semanas a la vez.
+
+Salida: dataset particionado por estación (layout de escritura.py) en
+SEMANAL_DIR. La actualización incremental recalcula solo las semanas desde
+MARGEN_DIAS antes del último día agregado (la ventana en la que la
+transformación incremental puede reescribir filas) y conserva el resto.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+try:
+    from ETL.clima.escritura import escribir_particion, leer_particion, ruta_particion
+    from ETL.clima.incremental import VENTANA
+    from ETL.clima.manifiesto import cargar_manifiesto, guardar_manifiesto
+except ImportError:  # ejecución directa desde ETL/clima
+    from escritura import escribir_particion, leer_particion, ruta_particion
+    from incremental import VENTANA
+    from manifiesto import cargar_manifiesto, guardar_manifiesto
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+SEMANAL_DIR = os.getenv("CLIMA_SEMANAL_DIR", "data/clima-semanal")
+MARGEN_DIAS = int(os.getenv("CLIMA_SEMANAL_MARGEN", str(VENTANA)))
+COL_ESTACION = "id_estacion"
+COL_FECHA = "fecha"
+AGREGADOS = ("media", "min", "max", "suma")
+CLAVE = ["id_estacion", "anio", "semana"]
+# con "_" adelante pyarrow no lo toma como parte del dataset
+ESTADO = "_estado.json"
+
+
+# =============================================================================
+# Semana epidemiológica
+# =============================================================================
+
+def _dias(fechas) -> np.ndarray:
+    """Días desde 1970-01-01 (int64) de fechas sin NaT."""
+    fechas = np.asarray(pd.to_datetime(fechas), dtype="datetime64[ns]")
+    return fechas.astype("datetime64[D]").astype(np.int64)
+
+
+def inicio_semana(dias: np.ndarray) -> np.ndarray:
+    """Domingo de la semana de cada día (1970-01-01 fue jueves: domingo = 0)."""
+    return dias - (dias + 4) % 7
+
+
+def semana_epidemiologica(fechas) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (anio, semana) epidemiológicos de cada fecha, vectorizado. La semana
+    pertenece al año de su miércoles y se numera desde la que contiene el
+    primer miércoles de enero.
+    """
+    miercoles = (inicio_semana(_dias(fechas)) + 3).astype("datetime64[D]")
+    anio = miercoles.astype("datetime64[Y]")
+    semana = (miercoles - anio.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+    return (anio.astype(np.int64) + 1970).astype(np.int16), semana.astype(np.int8)
+
+
+def inicio_semana_epidemiologica(anio, semana) -> np.ndarray:
+    """Inversa de semana_epidemiologica: domingo (datetime64[D]) de cada (anio, semana)."""
+    anio = np.asarray(anio, dtype=np.int64)
+    semana = np.asarray(semana, dtype=np.int64)
+    enero = (anio - 1970).astype("datetime64[Y]").astype("datetime64[D]").astype(np.int64)
+    primer_miercoles = enero + (3 - (enero + 4)) % 7
+    return (primer_miercoles - 3 + 7 * (semana - 1)).astype("datetime64[D]")
+
+
+# =============================================================================
+# Cubo
+# =============================================================================
+
+def variables_de(df: pd.DataFrame) -> List[str]:
+    """Columnas numéricas a agregar (todas menos la clave y la fecha)."""
+    return [c for c in df.columns
+            if c not in (COL_ESTACION, COL_FECHA) and pd.api.types.is_numeric_dtype(df[c])]
+
+
+def cubo_semanal(df: pd.DataFrame,
+                 variables: Optional[Sequence[str]] = None,
+                 col_estacion: str = COL_ESTACION,
+                 col_fecha: str = COL_FECHA) -> pd.DataFrame:
+    """
+    Agrega la serie diaria transformada a una fila por (estación, semana
+    epidemiológica). Las filas sin fecha se descartan; el orden de entrada
+    no importa.
+    """
+    variables = list(variables) if variables is not None else variables_de(df)
+    fechas = pd.to_datetime(df[col_fecha], errors="coerce")
+    codigos, ids = pd.factorize(df[col_estacion], sort=True)
+    ok = fechas.notna().to_numpy() & (codigos >= 0)
+    if not ok.any():
+        return pd.DataFrame(columns=_columnas_cubo(variables))
+
+    dias = _dias(fechas[ok])
+    codigos = codigos[ok]
+    orden = None
+    if len(dias) > 1 and not np.all((codigos[1:] > codigos[:-1])
+                                     | ((codigos[1:] == codigos[:-1]) & (dias[1:] >= dias[:-1]))):
+        orden = np.lexsort((dias, codigos))
+        dias, codigos = dias[orden], codigos[orden]
+    inicio = inicio_semana(dias)
+
+    nueva = np.ones(len(dias), dtype=bool)
+    nueva[1:] = (codigos[1:] != codigos[:-1]) | (inicio[1:] != inicio[:-1])
+    cortes = np.flatnonzero(nueva)
+    dia_nuevo = np.ones(len(dias), dtype=bool)
+    dia_nuevo[1:] = nueva[1:] | (dias[1:] != dias[:-1])
+
+    anio, semana = semana_epidemiologica(inicio[cortes].astype("datetime64[D]"))
+    out = {
+        col_estacion: np.asarray(ids, dtype=object)[codigos[cortes]],
+        "anio": anio,
+        "semana": semana,
+        "inicio": inicio[cortes].astype("datetime64[D]").astype("datetime64[ns]"),
+        "dias": np.add.reduceat(dia_nuevo.astype(np.int64), cortes).astype(np.int8),
+        "fecha_max": np.maximum.reduceat(dias, cortes).astype("datetime64[D]").astype("datetime64[ns]"),
+    }
+    for var in variables:
+        y = df[var].to_numpy(dtype=np.float64, na_value=np.nan)[ok]
+        if orden is not None:
+            y = y[orden]
+        valido = ~np.isnan(y)
+        n = np.add.reduceat(valido.astype(np.int64), cortes)
+        suma = np.add.reduceat(np.where(valido, y, 0.0), cortes)
+        minimo = np.minimum.reduceat(np.where(valido, y, np.inf), cortes)
+        maximo = np.maximum.reduceat(np.where(valido, y, -np.inf), cortes)
+        vacia = n == 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            out[f"{var}_media"] = np.where(vacia, np.nan, suma / n)
+        out[f"{var}_min"] = np.where(vacia, np.nan, minimo)
+        out[f"{var}_max"] = np.where(vacia, np.nan, maximo)
+        out[f"{var}_suma"] = np.where(vacia, np.nan, suma)
+        out[f"{var}_dias"] = n.astype(np.int8)
+    return pd.DataFrame(out)
+
+
+def _columnas_cubo(variables: Sequence[str]) -> List[str]:
+    return (CLAVE + ["inicio", "dias", "fecha_max"]
+            + [f"{v}_{a}" for v in variables for a in (*AGREGADOS, "dias")])
+
+
+# =============================================================================
+# Dataset particionado
+# =============================================================================
+
+def escribir_cubo(cubo: pd.DataFrame, base_dir: str = SEMANAL_DIR) -> int:
+    """
+    Escribe (reemplaza) una partición por estación. Retorna cuántas escribió.
+    Descarta el estado de actualizar_semanal: las particiones ya no salen de
+    las series diarias que registró.
+    """
+    estado_path = os.path.join(base_dir, ESTADO)
+    if os.path.exists(estado_path):
+        os.remove(estado_path)
+    n = 0
+    for id_est, grupo in cubo.groupby(COL_ESTACION, sort=True, observed=True):
+        escribir_particion(grupo.reset_index(drop=True), base_dir, str(id_est))
+        n += 1
+    return n
+
+
+def leer_cubo(base_dir: str = SEMANAL_DIR, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Todo el cubo (todas las particiones) con id_estacion como columna."""
+    table = pq.read_table(base_dir, columns=columns, partitioning="hive")
+    return table.to_pandas(date_as_object=False)
+
+
+def actualizar_estacion(diario: pd.DataFrame,
+                        previo: Optional[pd.DataFrame],
+                        entrada: Optional[dict],
+                        margen_dias: int = MARGEN_DIAS) -> Tuple[pd.DataFrame, str, int]:
+    """
+    Cubo de una estación a partir de su serie diaria. Con `previo` (cubo
+    guardado) y `entrada` (estado: fecha_max y filas diarias hasta esa fecha)
+    solo se recalculan las semanas desde `margen_dias` antes de fecha_max.
+    Retorna (cubo, modo, semanas recalculadas) con modo en {"completa", "incremental"}.
+    """
+    if previo is None or previo.empty or not entrada or not entrada.get("fecha_max"):
+        cubo = cubo_semanal(diario)
+        return cubo, "completa", len(cubo)
+
+    fechas = pd.to_datetime(diario[COL_FECHA], errors="coerce")
+    fecha_max = pd.Timestamp(entrada["fecha_max"])
+    if (fechas <= fecha_max).sum() != entrada.get("filas"):
+        cubo = cubo_semanal(diario)                   # cambió la historia
+        return cubo, "completa", len(cubo)
+
+    desde = inicio_semana(_dias([fecha_max - pd.Timedelta(days=margen_dias)]))[0]
+    desde = pd.Timestamp(np.datetime64(int(desde), "D"))
+    nuevas = cubo_semanal(diario[(fechas >= desde).to_numpy()])
+    conservadas = previo[pd.to_datetime(previo["inicio"]) < desde]
+    out = pd.concat([conservadas, nuevas.reindex(columns=previo.columns)], ignore_index=True)
+    return out, "incremental", len(nuevas)
+
+
+def actualizar_semanal(ids: Iterable[str],
+                       diario_dir: str,
+                       out_dir: str = SEMANAL_DIR,
+                       estado_path: Optional[str] = None,
+                       margen_dias: int = MARGEN_DIAS,
+                       completa: bool = False) -> Dict[str, int]:
+    """
+    Actualiza el cubo `out_dir` desde las particiones diarias de `diario_dir`
+    (p. ej. la salida de transformar_incremental). Las estaciones cuya serie
+    diaria no cambió (misma fecha_max y cantidad de filas) se saltean.
+    """
+    estado_path = estado_path or os.path.join(out_dir, ESTADO)
+    estado = cargar_manifiesto(estado_path)
+    resumen = {"completa": 0, "incremental": 0, "sin_cambios": 0, "semanas_escritas": 0, "errores": 0}
+    for id_est in (str(i) for i in ids):
+        try:
+            if not os.path.exists(ruta_particion(diario_dir, id_est)):
+                continue
+            diario = leer_particion(diario_dir, id_est)
+            fechas = pd.to_datetime(diario[COL_FECHA], errors="coerce")
+            fecha_max = fechas.max().isoformat() if fechas.notna().any() else None
+            filas = int(fechas.notna().sum())
+            entrada = None if completa else estado.get(id_est)
+            existe = os.path.exists(ruta_particion(out_dir, id_est))
+            if entrada and existe and entrada.get("fecha_max") == fecha_max and entrada.get("filas") == filas:
+                resumen["sin_cambios"] += 1
+                continue
+
+            previo = leer_particion(out_dir, id_est) if entrada and existe else None
+            cubo, modo, recalculadas = actualizar_estacion(diario, previo, entrada, margen_dias)
+            resumen[modo] += 1
+            escribir_particion(cubo, out_dir, id_est)
+            resumen["semanas_escritas"] += recalculadas
+
+            estado[id_est] = {
+                "fecha_max": fecha_max,
+                "filas": filas,
+                "semanas": int(len(cubo)),
+                "actualizado": datetime.now().isoformat(timespec="seconds"),
+            }
+            guardar_manifiesto(estado, estado_path)
+        except Exception as e:
+            resumen["errores"] += 1
+            print(f"{id_est}: error en el cubo semanal → {e}")
+    return resumen
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Esquema compacto opcional para los DataFrames de clima
+------------------------------------------------------
+Con CLIMA_COMPACTO=1, de la extracción a la carga:
+
+- id_estacion como categórica en pandas y dictionary en Arrow/Parquet
+  (en lugar de un string de Python por fila, p. ej. 'A872801');
+- mediciones en float32 cuando la precisión de origen lo permite: el error
+  de redondeo a float32 tiene que quedar por debajo de media unidad del
+  último decimal que reporta el INTA (DECIMALES); si no, la columna sigue
+  en float64;
+- fecha como date32 en los archivos cuando todas las fechas son a las 00:00.
+  En memoria queda como datetime64, porque las transformaciones usan .dt
+  (hora, mes) y pd.to_datetime.
+
+Las transformaciones siguen funcionando sobre el esquema compacto: las
+asignaciones parciales respetan el dtype de la columna (ver
+transform._asignar) y al final se vuelve a compactar la salida.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+COMPACTO = os.getenv("CLIMA_COMPACTO", "0") == "1"
+DECIMALES = int(os.getenv("CLIMA_COMPACTO_DECIMALES", "2"))   # precisión de las planillas del INTA
+COL_ESTACION = "id_estacion"
+
+
+# =============================================================================
+# pandas
+# =============================================================================
+
+def admite_float32(valores: np.ndarray, decimales: int = DECIMALES) -> bool:
+    """True si pasar a float32 no mueve ningún valor más de media unidad del último decimal."""
+    with np.errstate(invalid="ignore", over="ignore"):
+        a32 = valores.astype(np.float32)
+        if np.isinf(a32[np.isfinite(valores)]).any():
+            return False
+        err = np.abs(a32.astype(np.float64) - valores)
+    return not (err > 0.5 * 10.0 ** (-decimales)).any()
+
+
+def compactar(df: pd.DataFrame,
+              col_estacion: str = COL_ESTACION,
+              decimales: int = DECIMALES,
+              excluir: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    DataFrame con id de estación categórico y mediciones float32 (donde se
+    puede). Las columnas que no cambian se comparten con `df` (sin copia).
+    """
+    excluir = set(excluir)
+    cambios = {}
+    for col in df.columns:
+        if col in excluir:
+            continue
+        serie = df[col]
+        if col == col_estacion or str(col).lower() == col_estacion:
+            if not isinstance(serie.dtype, pd.CategoricalDtype):
+                cambios[col] = serie.astype("category")
+        elif serie.dtype == np.float64:
+            if admite_float32(serie.to_numpy(), decimales):
+                cambios[col] = serie.astype(np.float32)
+    return df.assign(**cambios) if cambios else df
+
+
+def uso_memoria(df: pd.DataFrame) -> pd.Series:
+    """MB por columna (deep=True: cuenta los strings de las columnas object)."""
+    return df.memory_usage(deep=True, index=False) / 2**20
+
+
+def reporte_memoria(antes: pd.DataFrame, despues: pd.DataFrame) -> pd.DataFrame:
+    """Tabla columna / dtype / MB antes y después, con una fila TOTAL al final."""
+    mb_antes, mb_despues = uso_memoria(antes), uso_memoria(despues)
+    filas = []
+    for col in antes.columns:
+        filas.append({
+            "columna": col,
+            "dtype_antes": str(antes[col].dtype),
+            "mb_antes": mb_antes.get(col, np.nan),
+            "dtype_despues": str(despues[col].dtype) if col in despues.columns else None,
+            "mb_despues": mb_despues.get(col, np.nan),
+        })
+    filas.append({"columna": "TOTAL", "dtype_antes": "", "mb_antes": mb_antes.sum(),
+                  "dtype_despues": "", "mb_despues": mb_despues.sum()})
+    rep = pd.DataFrame(filas)
+    rep["ahorro_%"] = (100 * (1 - rep["mb_despues"] / rep["mb_antes"])).round(1)
+    return rep.round({"mb_antes": 2, "mb_despues": 2})
+
+
+# =============================================================================
+# Arrow / Parquet
+# =============================================================================
+
+def _es_medianoche(col: pa.ChunkedArray) -> bool:
+    if col.null_count == len(col):
+        return False
+    ns = col.cast(pa.timestamp("ns")).to_numpy(zero_copy_only=False).astype("datetime64[ns]")
+    ns = ns[~np.isnat(ns)]
+    return bool((ns == ns.astype("datetime64[D]")).all())
+
+
+def tabla_compacta(table: pa.Table) -> pa.Table:
+    """id_estacion -> dictionary, timestamps solo-fecha -> date32 (el resto igual)."""
+    for i, campo in enumerate(table.schema):
+        col = table.column(i)
+        if campo.name.lower() == COL_ESTACION and pa.types.is_string(campo.type):
+            table = table.set_column(i, campo.name, col.dictionary_encode())
+        elif pa.types.is_timestamp(campo.type) and campo.type.tz is None and _es_medianoche(col):
+            table = table.set_column(i, campo.name, col.cast(pa.date32()))
+    return table
+
+
+def a_tabla(df: pd.DataFrame, compacto: bool = COMPACTO) -> pa.Table:
+    """pa.Table de un DataFrame; en modo compacto con tabla_compacta aplicada."""
+    table = pa.Table.from_pandas(compactar(df) if compacto else df, preserve_index=False)
+    return tabla_compacta(table) if compacto else table
+
+
+def leer_parquet(path: str, columns: Optional[list] = None) -> pd.DataFrame:
+    """Lee Parquet dejando date32 como datetime64 (no objetos date) y dictionary como categórica."""
+    return pq.read_table(path, columns=columns).to_pandas(date_as_object=False)
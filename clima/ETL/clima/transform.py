@@ -8,7 +8,9 @@ correcciones lógicas y diversas estrategias de imputación (interpolación,
 regresión simple y reglas físicas) para variables meteorológicas típicas.
 
 Notas:
-- No se realizan agrupamientos por estación (id_estacion) en esta versión EDA.
+- run_eda_transformations no agrupa por estación (id_estacion), como en el EDA.
+- run_eda_transformations_por_estacion aplica las mismas transformaciones por
+  variable estación por estación, en paralelo (ProcessPoolExecutor).
 - No se incluyen gráficos.
 - Pensado para ser ejecutado como script o importado como módulo.
 
@@ -19,11 +21,20 @@ Fecha: (completa si querés)
 from __future__ import annotations
 
 import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional, Dict
 
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+
+try:
+    from ETL.clima.interpolacion import interpolar_columna
+    from ETL.clima.ols import ajustar, como_tupla, predecir
+except ImportError:  # ejecución directa desde ETL/clima
+    from interpolacion import interpolar_columna
+    from ols import ajustar, como_tupla, predecir
 
 
 # =============================================================================
@@ -55,58 +66,115 @@ DAY_HOURS = range(7, 19)   # 7..18 como “día”
 RAD_MAX_FISICO = 60        # MJ/m² — tope razonable para EDA (ajustable)
 MIN_REG_SAMPLES = 30       # mínimo de muestras para entrenar regresiones
 
+# Precipitación: "lineal" | "pchip" | "spline" (por estación, huecos acotados)
+# o "spline_global" (spline de orden 2 de pandas sobre todo el bloque, como en el EDA)
+PRECIP_METODO = os.getenv("CLIMA_PRECIP_METODO", "pchip")
+PRECIP_MAX_HUECO = int(os.getenv("CLIMA_PRECIP_MAX_HUECO", "5"))   # filas; huecos más largos quedan nulos
+
+TRANSFORM_WORKERS = int(os.getenv("CLIMA_WORKERS", "0")) or os.cpu_count() or 1
+ESTACIONES_POR_TAREA = int(os.getenv("CLIMA_ESTACIONES_POR_TAREA", "8"))  # chunking del pool
+
 
 # =============================================================================
 # Utilidades
 # =============================================================================
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+def normalize_columns(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """Convierte nombres de columnas a minúsculas y sin espacios extremos."""
-    out = df.copy()
+    out = df if inplace else df.copy()
     out.columns = [c.lower().strip() for c in out.columns]
     return out
 
 
 def select_and_rename(df: pd.DataFrame) -> pd.DataFrame:
-    """Selecciona columnas de interés y aplica renombrados convenientes."""
-    out = df[[c for c in COLUMNS_ORDER if c in df.columns]].copy()
-    out = out.rename(columns=RENAME_MAP)
+    """
+    Selecciona columnas de interés y aplica renombrados convenientes.
+    La selección ya devuelve un DataFrame nuevo: es la única copia del pipeline.
+    """
+    out = df.reindex(columns=[c for c in COLUMNS_ORDER if c in df.columns])
+    out.columns = [RENAME_MAP.get(c, c) for c in out.columns]
     return out
 
 
-def fix_types_and_duplicates(df: pd.DataFrame) -> pd.DataFrame:
+def fix_types_and_duplicates(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
     """Ajusta tipos básicos y elimina duplicados exactos."""
-    out = df.copy()
+    out = df if inplace else df.copy()
     if "fecha" in out.columns:
         out["fecha"] = pd.to_datetime(out["fecha"], errors="coerce")
-    out = out.drop_duplicates(keep="first")
+    out.drop_duplicates(keep="first", inplace=True)
     return out
 
 
+def _param(params: Optional[dict], clave: str, calcular):
+    """
+    Estadístico de una transformación. Sin `params` se calcula sobre el bloque;
+    con `params` se usa el valor guardado o, si falta, se calcula y se registra
+    (así una corrida completa deja los parámetros para las siguientes).
+    """
+    if params is None:
+        return calcular()
+    if clave not in params:
+        params[clave] = calcular()
+    return params[clave]
+
+
+def _asignar(out: pd.DataFrame, mask, col: str, valores) -> None:
+    """out.loc[mask, col] = valores, respetando el dtype de la columna (float32 en modo compacto)."""
+    out.loc[mask, col] = np.asarray(valores, dtype=out[col].dtype)
+
+
+def _reemplazar(out: pd.DataFrame, col: str, valores) -> None:
+    """Reemplaza la columna completa conservando float32 si ya lo era (modo compacto)."""
+    if out[col].dtype == np.float32:
+        valores = np.asarray(valores, dtype=np.float32)
+    out[col] = valores
+
+
+def _ajuste_lineal(x: np.ndarray, y: np.ndarray, min_reg_samples: int) -> Optional[tuple]:
+    """(pendiente, ordenada) de y ~ x, o None si no hay muestras suficientes."""
+    return como_tupla(ajustar(x, y, min_muestras=min_reg_samples))
+
+
 # =============================================================================
 # Transformaciones por variable
 # =============================================================================
 
-def transform_precipitacion(df: pd.DataFrame, col: str = "precipitacion_pluviometrica") -> pd.DataFrame:
+def transform_precipitacion(df: pd.DataFrame, col: str = "precipitacion_pluviometrica",
+                            inplace: bool = False, params: Optional[dict] = None,
+                            metodo: str = PRECIP_METODO, max_hueco: int = PRECIP_MAX_HUECO,
+                            estadisticas: Optional[dict] = None) -> pd.DataFrame:
     """
-    Precipitación: log1p -> min-max -> interpolación suave (spline).
+    Precipitación: log1p -> min-max -> interpolación.
+    Por defecto la interpolación es por estación y en orden de fecha, solo en
+    huecos de hasta `max_hueco` filas (ver interpolacion.py); "spline_global"
+    conserva el spline de orden 2 sobre todo el bloque del EDA.
+    Si se pasa `estadisticas` se completa con el resumen de huecos.
     Nota: en EDA se deja normalizado para estabilizar rangos y nulos.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
     if col not in out.columns:
         return out
     safe = out[col].clip(lower=0)
     col_log = np.log1p(safe)
-    denom = (col_log.max() - col_log.min())
+    log_min = _param(params, "precip_log_min", lambda: float(col_log.min()))
+    log_max = _param(params, "precip_log_max", lambda: float(col_log.max()))
+    denom = (log_max - log_min)
     if denom == 0 or np.isnan(denom):
-        out[col] = safe
+        _reemplazar(out, col, safe)
         return out
-    norm = (col_log - col_log.min()) / denom
-    out[col] = pd.Series(norm, index=out.index).interpolate(method="spline", order=2)
+    norm = (col_log - log_min) / denom
+    if metodo != "spline_global":
+        _reemplazar(out, col, interpolar_columna(out, norm, metodo=metodo, max_hueco=max_hueco,
+                                                 minimo=0.0, estadisticas=estadisticas))
+        return out
+    # el spline de orden 2 necesita al menos 3 puntos (puede pasar al agrupar por estación)
+    method = "spline" if norm.notna().sum() > 2 else "linear"
+    _reemplazar(out, col, pd.Series(norm, index=out.index).interpolate(method=method, order=2))
     return out
 
 
-def transform_temperaturas(df: pd.DataFrame) -> pd.DataFrame:
+def transform_temperaturas(df: pd.DataFrame, inplace: bool = False,
+                           params: Optional[dict] = None) -> pd.DataFrame:
     """
     Temperaturas:
       1) Corrige inconsistencia mínima > máxima (swap).
@@ -114,7 +182,7 @@ def transform_temperaturas(df: pd.DataFrame) -> pd.DataFrame:
       3) Imputa mínima y máxima desde media con diferencia promedio global.
       4) Interpolación lineal para rezagos.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
 
     cols_needed = {"temperatura_minima", "temperatura_maxima", "temperatura_media"}
     if not cols_needed.issubset(out.columns):
@@ -122,9 +190,9 @@ def transform_temperaturas(df: pd.DataFrame) -> pd.DataFrame:
 
     # 1) swap si mínima > máxima
     mask_swap = out["temperatura_minima"] > out["temperatura_maxima"]
-    out.loc[mask_swap, ["temperatura_minima", "temperatura_maxima"]] = (
-        out.loc[mask_swap, ["temperatura_maxima", "temperatura_minima"]].to_numpy()
-    )
+    tmin_swap = out.loc[mask_swap, "temperatura_minima"].to_numpy()
+    _asignar(out, mask_swap, "temperatura_minima", out.loc[mask_swap, "temperatura_maxima"])
+    _asignar(out, mask_swap, "temperatura_maxima", tmin_swap)
 
     # 2) media = (min+max)/2 si falta
     mask_tmed = (
@@ -132,20 +200,22 @@ def transform_temperaturas(df: pd.DataFrame) -> pd.DataFrame:
         & out["temperatura_minima"].notna()
         & out["temperatura_maxima"].notna()
     )
-    out.loc[mask_tmed, "temperatura_media"] = (
+    _asignar(out, mask_tmed, "temperatura_media", (
         out.loc[mask_tmed, "temperatura_minima"] + out.loc[mask_tmed, "temperatura_maxima"]
-    ) / 2
+    ) / 2)
 
     # 3) dif promedio |min-media| y |max-media|
     with np.errstate(invalid="ignore"):
-        dmin = (out["temperatura_minima"] - out["temperatura_media"]).abs().mean(skipna=True)
-        dmax = (out["temperatura_maxima"] - out["temperatura_media"]).abs().mean(skipna=True)
+        dmin = _param(params, "temp_dmin", lambda: float(
+            (out["temperatura_minima"] - out["temperatura_media"]).abs().mean(skipna=True)))
+        dmax = _param(params, "temp_dmax", lambda: float(
+            (out["temperatura_maxima"] - out["temperatura_media"]).abs().mean(skipna=True)))
 
     mask_min = out["temperatura_minima"].isna() & out["temperatura_media"].notna()
-    out.loc[mask_min, "temperatura_minima"] = out.loc[mask_min, "temperatura_media"] - dmin
+    _asignar(out, mask_min, "temperatura_minima", out.loc[mask_min, "temperatura_media"] - dmin)
 
     mask_max = out["temperatura_maxima"].isna() & out["temperatura_media"].notna()
-    out.loc[mask_max, "temperatura_maxima"] = out.loc[mask_max, "temperatura_media"] + dmax
+    _asignar(out, mask_max, "temperatura_maxima", out.loc[mask_max, "temperatura_media"] + dmax)
 
     # 4) interpolaciones lineales
     for c in ["temperatura_minima", "temperatura_maxima", "temperatura_media"]:
@@ -154,43 +224,48 @@ def transform_temperaturas(df: pd.DataFrame) -> pd.DataFrame:
     return out
 
 
-def transform_humedad(df: pd.DataFrame, col: str = "humedad_media") -> pd.DataFrame:
+def transform_humedad(df: pd.DataFrame, col: str = "humedad_media", inplace: bool = False,
+                      params: Optional[dict] = None) -> pd.DataFrame:
     """Interpolación lineal simple para humedad media."""
-    out = df.copy()
+    out = df if inplace else df.copy()
     if col in out.columns:
         out[col] = out[col].interpolate(method="linear")
     return out
 
 
-def transform_rocio(df: pd.DataFrame, col_rocio: str = "rocio_medio", col_temp: str = "temperatura_media") -> pd.DataFrame:
+def transform_rocio(df: pd.DataFrame, col_rocio: str = "rocio_medio", col_temp: str = "temperatura_media",
+                    inplace: bool = False, params: Optional[dict] = None) -> pd.DataFrame:
     """
     Rocío: imputar desde temperatura usando diferencia promedio global |T - Td|.
     Luego interpolación lineal si quedara rezago.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
     if col_rocio not in out.columns or col_temp not in out.columns:
         return out
 
-    mask_rt = out[col_rocio].notna() & out[col_temp].notna()
-    if mask_rt.any():
-        diff_rt = (out.loc[mask_rt, col_temp] - out.loc[mask_rt, col_rocio]).abs().mean()
-    else:
-        diff_rt = 0.0
+    def _diff_rt():
+        mask_rt = out[col_rocio].notna() & out[col_temp].notna()
+        if mask_rt.any():
+            return float((out.loc[mask_rt, col_temp] - out.loc[mask_rt, col_rocio]).abs().mean())
+        return 0.0
+
+    diff_rt = _param(params, "rocio_diff", _diff_rt)
 
     mask_imp = out[col_rocio].isna() & out[col_temp].notna()
-    out.loc[mask_imp, col_rocio] = out.loc[mask_imp, col_temp] - diff_rt
+    _asignar(out, mask_imp, col_rocio, out.loc[mask_imp, col_temp] - diff_rt)
     out[col_rocio] = out[col_rocio].interpolate(method="linear")
     return out
 
 
 def transform_tension_vapor(df: pd.DataFrame, col_tv: str = "tesion_vapor_media",
-                            col_temp: str = "temperatura_media", col_rh: str = "humedad_media") -> pd.DataFrame:
+                            col_temp: str = "temperatura_media", col_rh: str = "humedad_media",
+                            inplace: bool = False, params: Optional[dict] = None) -> pd.DataFrame:
     """
     Tensión de vapor: derivada física desde temperatura y humedad relativa.
       e = (RH/100) * e_s(T)
       e_s(T) = 6.11 * exp(17.27*T/(T+237.3))
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
     if not {col_tv, col_temp, col_rh}.issubset(out.columns):
         return out
 
@@ -199,124 +274,145 @@ def transform_tension_vapor(df: pd.DataFrame, col_tv: str = "tesion_vapor_media"
 
     mask = out[col_tv].isna() & out[col_temp].notna() & out[col_rh].notna()
     if mask.any():
-        out.loc[mask, col_tv] = tension_vapor(out.loc[mask, col_temp], out.loc[mask, col_rh])
+        _asignar(out, mask, col_tv, tension_vapor(out.loc[mask, col_temp], out.loc[mask, col_rh]))
     return out
 
 
+def _mediana_mes_hora(rad: np.ndarray, mes: np.ndarray, hora: np.ndarray,
+                      valid: np.ndarray, grupo: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Tabla de medianas por (grupo, mes, hora) indexada por la clave entera
+    grupo*312 + mes*24 + hora. Las combinaciones sin datos quedan en NaN.
+    """
+    n_grupos = int(grupo.max()) + 1 if grupo is not None and len(grupo) else 1
+    lut = np.full(n_grupos * 13 * 24, np.nan)
+    if not valid.any():
+        return lut
+    clave = mes[valid] * 24 + hora[valid]
+    if grupo is not None:
+        clave = clave + grupo[valid] * (13 * 24)
+    med = pd.Series(rad[valid]).groupby(clave).median()
+    lut[med.index.to_numpy()] = med.to_numpy()
+    return lut
+
+
 def transform_radiacion_global(df: pd.DataFrame,
                                col_rad: str = "radiacion_global",
                                col_helio: str = "heliofania_efectiva",
                                col_fecha: str = "fecha",
                                day_hours: range = DAY_HOURS,
                                rad_max_fisico: Optional[float] = RAD_MAX_FISICO,
-                               min_reg_samples: int = MIN_REG_SAMPLES) -> pd.DataFrame:
+                               min_reg_samples: int = MIN_REG_SAMPLES,
+                               inplace: bool = False,
+                               mediana_por_estacion: bool = False,
+                               col_estacion: str = "id_estacion",
+                               params: Optional[dict] = None) -> pd.DataFrame:
     """
     Radiación global (versión EDA sin agrupar por estación):
       1) Regresión lineal simple (heliofania -> radiación) SOLO horario diurno.
       2) Mediana por (mes, hora) SOLO horario diurno.
+         Con mediana_por_estacion=True la mediana es por (estación, mes, hora).
       3) Mediana móvil centrada SOLO horario diurno.
       - No se aplica 'cero final'.
       - Los valores nocturnos se respetan (0 puede ser real).
+    Todo el cálculo se hace sobre arrays NumPy; la mediana (mes, hora) se
+    resuelve con una tabla de búsqueda en lugar de un apply fila por fila.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
     if not {col_rad, col_helio, col_fecha}.issubset(out.columns):
         return out
 
     out[col_fecha] = pd.to_datetime(out[col_fecha], errors="coerce")
     out.sort_values(col_fecha, inplace=True)
-    out["_hora"] = out[col_fecha].dt.hour
-    out["_mes"] = out[col_fecha].dt.month
+    fechas = out[col_fecha]
+    hora = fechas.dt.hour.to_numpy(dtype=float, na_value=np.nan)
+    mes = fechas.dt.month.to_numpy(dtype=float, na_value=np.nan)
+    rad = out[col_rad].to_numpy(dtype=float, na_value=np.nan, copy=True)
+    helio = out[col_helio].to_numpy(dtype=float, na_value=np.nan)
+    tope = rad_max_fisico if rad_max_fisico is not None else np.inf
 
-    day_mask = out["_hora"].isin(day_hours)
-    cero_sospechoso = (out[col_rad] == 0) & day_mask
-    faltante = out[col_rad].isna() | cero_sospechoso
+    day_mask = np.isin(hora, np.asarray(list(day_hours), dtype=float))
+    rad_nan = np.isnan(rad)
+    faltante = rad_nan | ((rad == 0) & day_mask)
 
     # 1) Regresión global en diurno
-    can_train = day_mask & out[col_rad].notna() & (out[col_rad] > 0) & out[col_helio].notna()
-    can_predict = day_mask & faltante & out[col_helio].notna()
-    if can_train.sum() >= min_reg_samples and can_predict.any():
-        X = out.loc[can_train, [col_helio]].to_numpy()
-        y = out.loc[can_train, col_rad].to_numpy()
-        reg = LinearRegression().fit(X, y)
-        yhat = reg.predict(out.loc[can_predict, [col_helio]].to_numpy())
-        if rad_max_fisico is not None:
-            yhat = np.clip(yhat, 0, rad_max_fisico)
+    helio_ok = ~np.isnan(helio)
+    can_train = day_mask & ~rad_nan & (rad > 0) & helio_ok
+    can_predict = day_mask & faltante & helio_ok
+    if params is not None or can_predict.any():
+        ajuste = _param(params, "rad_reg",
+                        lambda: _ajuste_lineal(helio[can_train], rad[can_train], min_reg_samples))
+        if ajuste is not None and can_predict.any():
+            pendiente, ordenada = ajuste
+            rad[can_predict] = np.clip(helio[can_predict] * pendiente + ordenada, 0, tope)
+
+    # 2) Mediana (mes, hora) en diurno: lookup vectorizado
+    faltante = (np.isnan(rad) | (rad == 0)) & day_mask
+    valid_diurno = day_mask & ~np.isnan(rad) & (rad > 0)
+    grupo = None
+    if mediana_por_estacion and col_estacion in out.columns:
+        grupo = pd.factorize(out[col_estacion], use_na_sentinel=False)[0]
+    if (params is not None and grupo is None) or (faltante.any() and valid_diurno.any()):
+        mes_i = np.nan_to_num(mes, nan=0).astype(np.int64)
+        hora_i = np.nan_to_num(hora, nan=0).astype(np.int64)
+        if grupo is None:
+            lut = np.asarray(_param(params, "rad_mediana_mes_hora", lambda: _mediana_mes_hora(
+                rad, mes_i, hora_i, valid_diurno).tolist()), dtype=float)
         else:
-            yhat = np.clip(yhat, 0, None)
-        out.loc[can_predict, col_rad] = yhat
-
-    # 2) Mediana (mes, hora) en diurno
-    faltante = (out[col_rad].isna() | ((out[col_rad] == 0) & day_mask)) & day_mask
-    valid_diurno = day_mask & out[col_rad].notna() & (out[col_rad] > 0)
-    med_map = (
-        out.loc[valid_diurno]
-           .groupby(["_mes", "_hora"])[col_rad]
-           .median()
-    )
-
-    if faltante.any() and len(med_map) > 0:
-        def fill_mes_hora(row):
-            return med_map.get((row["_mes"], row["_hora"]), np.nan)
-        to_fill = out.loc[faltante].apply(fill_mes_hora, axis=1)
-        idx_ok = to_fill.index[to_fill.notna()]
-        vals = to_fill.loc[idx_ok].values
-        if rad_max_fisico is not None:
-            vals = np.clip(vals, 0, rad_max_fisico)
-        out.loc[idx_ok, col_rad] = vals
+            lut = _mediana_mes_hora(rad, mes_i, hora_i, valid_diurno, grupo)
+        clave = mes_i[faltante] * 24 + hora_i[faltante]
+        if grupo is not None:
+            clave = clave + grupo[faltante] * (13 * 24)
+        to_fill = lut[clave]
+        idx = np.flatnonzero(faltante)
+        ok = ~np.isnan(to_fill)
+        rad[idx[ok]] = np.clip(to_fill[ok], 0, tope)
 
     # 3) Mediana móvil centrada (diurno)
-    faltante = (out[col_rad].isna() | ((out[col_rad] == 0) & day_mask)) & day_mask
+    faltante = (np.isnan(rad) | (rad == 0)) & day_mask
     if faltante.any():
-        serie = out[col_rad].copy()
-        serie.loc[(serie == 0) & day_mask] = np.nan
-        rolling_med = serie.rolling(window=7, min_periods=1, center=True).median()
-        idx_fill = faltante & rolling_med.notna()
-        vals = rolling_med.loc[idx_fill].values
-        if rad_max_fisico is not None:
-            vals = np.clip(vals, 0, rad_max_fisico)
-        out.loc[idx_fill, col_rad] = vals
+        serie = np.where((rad == 0) & day_mask, np.nan, rad)
+        rolling_med = pd.Series(serie).rolling(window=7, min_periods=1, center=True).median().to_numpy()
+        idx_fill = faltante & ~np.isnan(rolling_med)
+        rad[idx_fill] = np.clip(rolling_med[idx_fill], 0, tope)
 
     # saneo final solo diurno
-    if rad_max_fisico is not None:
-        out.loc[day_mask, col_rad] = out.loc[day_mask, col_rad].clip(lower=0, upper=rad_max_fisico)
-    else:
-        out.loc[day_mask, col_rad] = out.loc[day_mask, col_rad].clip(lower=0)
+    rad[day_mask] = np.clip(rad[day_mask], 0, tope)
 
-    out.drop(columns=["_hora", "_mes"], inplace=True, errors="ignore")
+    _reemplazar(out, col_rad, rad)
     return out
 
 
 def transform_heliofania_cruzada(df: pd.DataFrame,
                                  col_eff: str = "heliofania_efectiva",
                                  col_rel: str = "heliofania_relativa",
-                                 min_reg_samples: int = MIN_REG_SAMPLES) -> pd.DataFrame:
+                                 min_reg_samples: int = MIN_REG_SAMPLES,
+                                 inplace: bool = False,
+                                 params: Optional[dict] = None) -> pd.DataFrame:
     """
     Imputaciones cruzadas:
       - Imputa heliofania_efectiva usando regresión con heliofania_relativa.
       - Imputa heliofania_relativa usando regresión con heliofania_efectiva.
       - Luego interpolación lineal.
     """
-    out = df.copy()
+    out = df if inplace else df.copy()
     if not {col_eff, col_rel}.issubset(out.columns):
         return out
 
-    # a) efectiva ~ relativa
-    mask_valid = out[col_eff].notna() & out[col_rel].notna()
-    mask_null = out[col_eff].isna() & out[col_rel].notna()
-    if mask_valid.sum() >= min_reg_samples and mask_null.any():
-        X = out.loc[mask_valid, [col_rel]].to_numpy()
-        y = out.loc[mask_valid, col_eff].to_numpy()
-        reg = LinearRegression().fit(X, y)
-        out.loc[mask_null, col_eff] = reg.predict(out.loc[mask_null, [col_rel]].to_numpy())
-
-    # b) relativa ~ efectiva
-    mask_valid = out[col_rel].notna() & out[col_eff].notna()
-    mask_null = out[col_rel].isna() & out[col_eff].notna()
-    if mask_valid.sum() >= min_reg_samples and mask_null.any():
-        X = out.loc[mask_valid, [col_eff]].to_numpy()
-        y = out.loc[mask_valid, col_rel].to_numpy()
-        reg = LinearRegression().fit(X, y)
-        out.loc[mask_null, col_rel] = reg.predict(out.loc[mask_null, [col_eff]].to_numpy())
+    # a) efectiva ~ relativa   b) relativa ~ efectiva
+    for col_y, col_x, clave in ((col_eff, col_rel, "helio_reg_efectiva"),
+                                (col_rel, col_eff, "helio_reg_relativa")):
+        mask_valid = out[col_y].notna() & out[col_x].notna()
+        mask_null = out[col_y].isna() & out[col_x].notna()
+        if params is None and not mask_null.any():
+            continue
+        ajuste = _param(params, clave, lambda: _ajuste_lineal(
+            out.loc[mask_valid, col_x].to_numpy(dtype=float),
+            out.loc[mask_valid, col_y].to_numpy(dtype=float), min_reg_samples))
+        if ajuste is not None and mask_null.any():
+            pendiente, ordenada = ajuste
+            _asignar(out, mask_null, col_y,
+                     out.loc[mask_null, col_x].to_numpy(dtype=float) * pendiente + ordenada)
 
     # interpolación lineal de rezagos
     out[col_eff] = out[col_eff].interpolate(method="linear")
@@ -328,21 +424,152 @@ def transform_heliofania_cruzada(df: pd.DataFrame,
 # Pipeline principal
 # =============================================================================
 
+# (nombre, función, admite inplace). Solo select_and_rename genera datos nuevos:
+# el resto modifica in-place ese único DataFrame, sin intermedios df0..df9.
+ETAPAS = [
+    ("normalize_columns", normalize_columns, True),
+    ("select_and_rename", select_and_rename, False),
+    ("fix_types_and_duplicates", fix_types_and_duplicates, True),
+    ("transform_precipitacion", transform_precipitacion, True),
+    ("transform_temperaturas", transform_temperaturas, True),
+    ("transform_humedad", transform_humedad, True),
+    ("transform_rocio", transform_rocio, True),
+    ("transform_tension_vapor", transform_tension_vapor, True),
+    ("transform_radiacion_global", transform_radiacion_global, True),
+    ("transform_heliofania_cruzada", transform_heliofania_cruzada, True),
+]
+ETAPAS_VARIABLES = ETAPAS[3:]   # transformaciones por variable (pasos 3 a 9)
+
+
+def _aplicar_etapas(df: pd.DataFrame, etapas=ETAPAS) -> pd.DataFrame:
+    # copia superficial: normalize_columns renombra sin tocar el DataFrame del llamador
+    out = df.copy(deep=False)
+    for _, func, admite_inplace in etapas:
+        out = func(out, inplace=True) if admite_inplace else func(out)
+    return out
+
+
 def run_eda_transformations(df: pd.DataFrame) -> pd.DataFrame:
     """Ejecuta todo el pipeline EDA de transformaciones sin gráficos."""
-    df0 = normalize_columns(df)
-    df1 = select_and_rename(df0)
-    df2 = fix_types_and_duplicates(df1)
-
-    df3 = transform_precipitacion(df2)
-    df4 = transform_temperaturas(df3)
-    df5 = transform_humedad(df4)
-    df6 = transform_rocio(df5)
-    df7 = transform_tension_vapor(df6)
-    df8 = transform_radiacion_global(df7)
-    df9 = transform_heliofania_cruzada(df8)
-
-    return df9
+    return _aplicar_etapas(df)
+
+
+def perfil_memoria(df: pd.DataFrame, etapas=ETAPAS) -> tuple:
+    """
+    Corre el pipeline midiendo con tracemalloc la memoria pico de cada etapa.
+    Retorna (DataFrame transformado, reporte) donde el reporte es una lista de
+    dicts con etapa, segundos, pico_mb (sobre lo ya asignado al empezar la
+    etapa) y actual_mb al terminarla.
+    """
+    ya_activo = tracemalloc.is_tracing()
+    if not ya_activo:
+        tracemalloc.start()
+    reporte = []
+    try:
+        out = df.copy(deep=False)
+        for nombre, func, admite_inplace in etapas:
+            base, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+            out = func(out, inplace=True) if admite_inplace else func(out)
+            actual, pico = tracemalloc.get_traced_memory()
+            reporte.append({
+                "etapa": nombre,
+                "segundos": round(time.perf_counter() - t0, 3),
+                "pico_mb": round((pico - base) / 2**20, 1),
+                "actual_mb": round(actual / 2**20, 1),
+            })
+    finally:
+        if not ya_activo:
+            tracemalloc.stop()
+    return out, reporte
+
+
+def _transformar_variables(df: pd.DataFrame, params: Optional[dict] = None) -> pd.DataFrame:
+    """
+    Transformaciones por variable (pasos 3 a 9 del pipeline) sobre un bloque, in-place.
+    Con `params` los estadísticos se toman de ahí o se registran (ver _param).
+    """
+    for _, func, _ in ETAPAS_VARIABLES:
+        df = func(df, inplace=True, params=params)
+    return df
+
+
+def _transformar_lote(lote: List[tuple]) -> List[pd.DataFrame]:
+    """Tarea del pool: procesa varias estaciones (bloque, params) para amortizar el envío entre procesos."""
+    return [_transformar_variables(g, params) for g, params in lote]
+
+
+def _regresiones_por_estacion(base: pd.DataFrame, codigos: np.ndarray, n_est: int,
+                              min_reg_samples: int = MIN_REG_SAMPLES) -> List[dict]:
+    """
+    Ajusta de una vez, para todas las estaciones, las regresiones que usan
+    transform_radiacion_global y transform_heliofania_cruzada (mismos
+    conjuntos de entrenamiento que dentro de cada una). Retorna un dict de
+    params por estación, en el orden de los códigos.
+    """
+    params: List[dict] = [{} for _ in range(n_est)]
+
+    def _col(nombre):
+        return base[nombre].to_numpy(dtype=float, na_value=np.nan)
+
+    def _guardar(clave, ajuste):
+        for i in range(n_est):
+            params[i][clave] = como_tupla(ajuste, i)
+
+    cols = set(base.columns)
+    if {"radiacion_global", "heliofania_efectiva", "fecha"}.issubset(cols):
+        hora = pd.to_datetime(base["fecha"], errors="coerce").dt.hour.to_numpy(dtype=float, na_value=np.nan)
+        dia = np.isin(hora, np.asarray(list(DAY_HOURS), dtype=float))
+        rad, helio = _col("radiacion_global"), _col("heliofania_efectiva")
+        ok = dia & (rad > 0) & ~np.isnan(helio)
+        _guardar("rad_reg", ajustar(helio[ok], rad[ok], codigos[ok], n_est, min_reg_samples))
+
+    if {"heliofania_efectiva", "heliofania_relativa"}.issubset(cols):
+        eff, rel = _col("heliofania_efectiva"), _col("heliofania_relativa")
+        ok = ~np.isnan(eff) & ~np.isnan(rel)
+        aj_eff = ajustar(rel[ok], eff[ok], codigos[ok], n_est, min_reg_samples)
+        _guardar("helio_reg_efectiva", aj_eff)
+        # la relativa se entrena después de imputar la efectiva (como en la transformación)
+        nulo = np.isnan(eff) & ~np.isnan(rel)
+        eff = eff.copy()
+        eff[nulo] = predecir(aj_eff, rel[nulo], codigos[nulo])
+        ok = ~np.isnan(eff) & ~np.isnan(rel)
+        _guardar("helio_reg_relativa", ajustar(eff[ok], rel[ok], codigos[ok], n_est, min_reg_samples))
+    return params
+
+
+def run_eda_transformations_por_estacion(df: pd.DataFrame,
+                                         max_workers: Optional[int] = TRANSFORM_WORKERS,
+                                         estaciones_por_tarea: int = ESTACIONES_POR_TAREA) -> pd.DataFrame:
+    """
+    Igual que run_eda_transformations pero cada estación se transforma por
+    separado: interpolaciones, splines, medianas y regresiones no mezclan
+    estaciones. Las estaciones se reparten en lotes entre `max_workers`
+    procesos y el resultado se arma en orden de id_estacion (determinístico).
+    Con max_workers=1 corre en el proceso actual. Las regresiones de todas las
+    estaciones se ajustan antes, juntas, en un solo paso (ols.ajustar por grupos).
+    """
+    base = _aplicar_etapas(df, ETAPAS[:3])
+    if "id_estacion" not in base.columns or base.empty:
+        return _transformar_variables(base)
+
+    # las filas sin id_estacion se transforman juntas como un grupo más (al final)
+    codigos, ids = pd.factorize(base["id_estacion"], sort=True, use_na_sentinel=False)
+    regresiones = _regresiones_por_estacion(base, codigos, len(ids))
+    grupos = [(g, regresiones[ids.get_loc(k)])
+              for k, g in base.groupby("id_estacion", sort=True, observed=True, dropna=False)]
+    del base
+    paso = max(1, estaciones_por_tarea)
+    lotes = [grupos[i:i + paso] for i in range(0, len(grupos), paso)]
+
+    if not max_workers or max_workers <= 1 or len(lotes) == 1:
+        resultados = [_transformar_lote(lote) for lote in lotes]
+    else:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(lotes))) as pool:
+            resultados = list(pool.map(_transformar_lote, lotes))   # map conserva el orden
+
+    return pd.concat([g for lote in resultados for g in lote])
 
 
 # =============================================================================
@@ -1,6 +1,8 @@
 import pandas as pd
 from sqlalchemy import create_engine, text, Integer, String, Float, Date, Boolean
 import numpy as np
+from ETL.clima.calendario import cargar_calendario
+from ETL.clima.carga_masiva import modo_carga_masiva, upsert_parquet
 
 # 1) Conectar/crear archivo SQLite
 engine = create_engine("sqlite:///dengue_clima.db", future=True)
@@ -22,7 +24,12 @@ CREATE TABLE IF NOT EXISTS calendario (
     trimestre        INTEGER,
     semestre         INTEGER,
     bisiesto         INTEGER,
-    quincena         INTEGER
+    quincena         INTEGER,
+    semanaMes        INTEGER,
+    diaSemana        TEXT,
+    diaNumeroSemana  INTEGER,
+    semana_epidemiologica INTEGER,
+    anio_epidemiologico   INTEGER
 );
 
 -- Provincias
@@ -161,24 +168,11 @@ print("Esquema creado exitosamente.")
 
 # Cargar calendario
 print("Cargando calendario...")
-df_cal = pd.read_csv("data/calendario.csv")
-df_cal['fecha'] = pd.to_datetime(df_cal['fecha']).dt.date
-df_cal['bisiesto'] = df_cal['bisiesto'].astype(int)
-df_cal.rename(columns={'fecha': 'fecha', 'anio': 'anio', 'mes': 'mes', 'dia': 'dia',
-                       'semana': 'semana', 'trimestre': 'trimestre', 'semestre': 'semestre',
-                       'bisiesto': 'bisiesto', 'quincena': 'quincena'}, inplace=True)
-df_cal['IdFecha'] = pd.to_datetime(df_cal['fecha']).dt.strftime('%Y%m%d').astype(int)
-# Cargar calendario solo si está vacío
-with engine.begin() as conn:
-    result = conn.execute(text("SELECT COUNT(*) FROM calendario"))
-    if result.fetchone()[0] == 0:
-        df_cal[['IdFecha', 'fecha', 'dia', 'mes', 'anio', 'semana', 'trimestre', 'semestre', 'bisiesto', 'quincena']].to_sql(
-            "calendario", engine, if_exists="append", index=False, chunksize=1000
-        )
-        print(f"Calendario cargado: {len(df_cal)} filas.")
-    else:
-        print("Calendario ya cargado.")
-print(f"Calendario cargado: {len(df_cal)} filas.")
+resumen = cargar_calendario(engine)
+if resumen['filas']:
+    print(f"Calendario cargado: {resumen['filas']} filas en {resumen['segundos']:.2f}s.")
+else:
+    print("Calendario ya cargado.")
 
 # Cargar estaciones y localidades/provincias
 print("Cargando estaciones meteorológicas...")
@@ -320,23 +314,14 @@ with engine.begin() as conn:
 
 # Cargar clima transformado
 print("Cargando clima transformado...")
+# Estaciones de la base por id_estacion del parquet (también para el clima completo)
+df_est_db = pd.read_sql("SELECT * FROM estaciones", engine)
+est_map = dict(zip(df_est_db['id_estacion_original'], df_est_db['IdEstacion']))
+filas_transformado = 0
 with engine.begin() as conn:
     result = conn.execute(text("SELECT COUNT(*) FROM clima"))
     if result.fetchone()[0] == 0:
-        df_clima_trans = pd.read_parquet("data/datos_clima_transformados.parquet")
-        df_clima_trans['fecha'] = pd.to_datetime(df_clima_trans['fecha']).dt.date
-        df_clima_trans['IdFecha'] = pd.to_datetime(df_clima_trans['fecha']).dt.strftime('%Y%m%d').astype(int)
-
-        # Mapear estaciones
-        df_est_db = pd.read_sql("SELECT * FROM estaciones", engine)
-        est_map = dict(zip(df_est_db['id_estacion_original'], df_est_db['IdEstacion']))
-        df_clima_trans['IdEstacion'] = df_clima_trans['id_estacion'].map(est_map)
-
-        # Filtrar filas con IdEstacion válido
-        df_clima_trans = df_clima_trans.dropna(subset=['IdEstacion'])
-        df_clima_trans['IdEstacion'] = df_clima_trans['IdEstacion'].astype(int)
-
-        df_clima_trans.rename(columns={
+        mapeo_transformado = {
             'precipitacion_pluviometrica': 'precipitacion_pluviometrica',
             'temperatura_minima': 'temperatura_minima',
             'temperatura_maxima': 'temperatura_maxima',
@@ -347,14 +332,18 @@ with engine.begin() as conn:
             'radiacion_global': 'radiacion_global',
             'heliofania_efectiva': 'heliofania_efectiva',
             'heliofania_relativa': 'heliofania_relativa'
-        }, inplace=True)
+        }
 
-        df_clima_trans[['IdEstacion', 'IdFecha', 'precipitacion_pluviometrica', 'temperatura_minima',
-                        'temperatura_maxima', 'temperatura_promedio', 'humedad_media', 'rocio_medio',
-                        'tension_vapor_medio', 'radiacion_global', 'heliofania_efectiva', 'heliofania_relativa']].to_sql(
-            "clima", engine, if_exists="append", index=False, method="multi"
-        )
-        print(f"Clima transformado cargado: {len(df_clima_trans)} filas.")
+        # Primera carga de clima: índices postergados, PRAGMA de carga y el parquet
+        # leído por lotes (IdFecha e IdEstacion calculados en cada lote)
+        with modo_carga_masiva(engine, ["clima"]) as conn_carga:
+            resumen = upsert_parquet(conn_carga, "clima", "data/datos_clima_transformados.parquet",
+                                     clave=['IdEstacion', 'IdFecha'], renombrar=mapeo_transformado,
+                                     columna_fecha='fecha', estaciones=est_map)
+        filas_transformado = resumen['filas']
+        print(f"Clima transformado cargado: {resumen['filas']} filas "
+              f"({resumen['descartadas']} sin estación o fecha) "
+              f"en {resumen['segundos']}s ({resumen['filas_por_s']:,.0f} filas/s).")
     else:
         print("Clima ya cargado.")
 
@@ -362,16 +351,7 @@ with engine.begin() as conn:
 print("Cargando clima completo...")
 with engine.begin() as conn:
     result = conn.execute(text("SELECT COUNT(*) FROM clima"))
-    if result.fetchone()[0] <= len(df_clima_trans):  # Si solo hay el transformado, agregar el completo
-        df_clima_full = pd.read_parquet("data/datos-todas-estaciones.parquet")
-        df_clima_full['Fecha'] = pd.to_datetime(df_clima_full['Fecha']).dt.date
-        df_clima_full['IdFecha'] = pd.to_datetime(df_clima_full['Fecha']).dt.strftime('%Y%m%d').astype(int)
-        df_clima_full['IdEstacion'] = df_clima_full['id_estacion'].map(est_map)
-
-        # Filtrar válidos
-        df_clima_full = df_clima_full.dropna(subset=['IdEstacion'])
-        df_clima_full['IdEstacion'] = df_clima_full['IdEstacion'].astype(int)
-
+    if result.fetchone()[0] <= filas_transformado:  # Si solo hay el transformado, agregar el completo
         # Renombrar columnas para coincidir con el esquema
         column_mapping = {
             'Precipitacion_Pluviometrica': 'precipitacion_pluviometrica',
@@ -412,21 +392,15 @@ with engine.begin() as conn:
             'Unidad_Frio': 'unidad_frio'
         }
 
-        df_clima_full.rename(columns=column_mapping, inplace=True)
-
-        # Para clima completo, actualizar filas existentes o insertar nuevas
-        # Usar on_conflict_do_update para SQLite (SQLAlchemy 2.0)
-        from sqlalchemy.dialects.sqlite import insert
-
-        with engine.begin() as conn:
-            for _, row in df_clima_full.iterrows():
-                stmt = insert(clima).values(row.to_dict()).on_conflict_do_update(
-                    index_elements=['IdEstacion', 'IdFecha'],
-                    set_=row.to_dict()
-                )
-                conn.execute(stmt)
+        # Para clima completo, actualizar filas existentes o insertar nuevas:
+        # un único INSERT ... ON CONFLICT DO UPDATE precompilado, un executemany por lote del parquet
+        with modo_carga_masiva(engine, ["clima"]) as conn_carga:
+            resumen = upsert_parquet(conn_carga, "clima", "data/datos-todas-estaciones.parquet",
+                                     clave=['IdEstacion', 'IdFecha'], renombrar=column_mapping,
+                                     columna_fecha='Fecha', estaciones=est_map)
 
-        print(f"Clima completo cargado/actualizado: {len(df_clima_full)} filas.")
+        print(f"Clima completo cargado/actualizado: {resumen['filas']} filas "
+              f"en {resumen['segundos']}s ({resumen['filas_por_s']:,.0f} filas/s).")
     else:
         print("Clima completo ya cargado.")
 
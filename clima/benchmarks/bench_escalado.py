@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de escalado: transform.py y load.py con 1M, 10M y 50M filas
+----------------------------------------------------------------------
+Corre sobre datos de benchmarks/sintetico.py (cacheados en
+benchmarks/datos/, se generan la primera vez) un benchmark por etapa de
+transform.ETAPAS, el pipeline completo (run_eda_transformations) y la
+carga a SQLite (load.load_clima_to_db, carga_masiva.upsert_masivo y
+carga_masiva.upsert_parquet, que lee el Parquet por lotes).
+
+Cada benchmark tiene una preparación que no se mide (copia de la entrada
+de la etapa, base SQLite vacía con estaciones y calendario) y una corrida
+que sí; se reporta el mínimo y la mediana de `repeticiones` corridas.
+
+Los resultados se agregan a benchmarks/resultados/escalado.jsonl con el
+commit, la máquina y las versiones, y se comparan con la última corrida de
+otro commit en la misma máquina, corrida con el árbol limpio: un benchmark
+que tarda más de UMBRAL (10% por defecto) se marca como regresión.
+
+Uso (desde clima/):
+    python benchmarks/bench_escalado.py [1M 10M 50M ...] [--repeticiones=3]
+                                        [--solo=transform|carga] [--no-guardar]
+Los tamaños aceptan sufijos k/M (p. ej. 200k). Sin tamaños corre 1M.
+"""
+
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, ".."))
+sys.path.insert(0, AQUI)
+
+from ETL.clima.calendario import cargar_calendario
+from ETL.clima.carga_masiva import upsert_masivo, upsert_parquet
+from ETL.clima.load import create_tables, load_clima_to_db
+from ETL.clima.transform import ETAPAS, run_eda_transformations
+from sintetico import escribir_parquet
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+DATOS_DIR = os.getenv("CLIMA_BENCH_DATOS", os.path.join(AQUI, "datos"))
+RESULTADOS_PATH = os.getenv("CLIMA_BENCH_RESULTADOS", os.path.join(AQUI, "resultados", "escalado.jsonl"))
+UMBRAL = float(os.getenv("CLIMA_BENCH_UMBRAL", "0.10"))
+SEED = 0
+REPETICIONES = 3
+
+
+def filas_de(tamanio: str) -> int:
+    """'1M' -> 1_000_000, '200k' -> 200_000, '5000' -> 5000."""
+    t = tamanio.strip()
+    factor = {"k": 1_000, "m": 1_000_000}.get(t[-1].lower(), 1)
+    return int(float(t[:-1] if factor > 1 else t) * factor)
+
+
+def datos(filas: int, seed: int = SEED) -> pd.DataFrame:
+    """Dataset sintético de `filas` filas (se genera y cachea en DATOS_DIR si falta)."""
+    path = os.path.join(DATOS_DIR, f"sintetico-{filas}-s{seed}.parquet")
+    if not os.path.exists(path):
+        print(f"Generando {filas:,} filas sintéticas → {path}")
+        escribir_parquet(filas, path, seed=seed)
+    return pd.read_parquet(path)
+
+
+# =============================================================================
+# Benchmarks
+# =============================================================================
+
+class Benchmark:
+    """`preparar()` (no se mide) devuelve los argumentos de `correr(*args)` (se mide)."""
+
+    def __init__(self, nombre: str, grupo: str, preparar: Callable[[], tuple], correr: Callable):
+        self.nombre = nombre
+        self.grupo = grupo
+        self.preparar = preparar
+        self.correr = correr
+
+    def medir(self, repeticiones: int) -> dict:
+        tiempos, error = [], None
+        for _ in range(repeticiones):
+            args = self.preparar()
+            t0 = time.perf_counter()
+            try:
+                res = self.correr(*args)
+            except Exception as e:
+                # el mensaje de pandas.to_sql puede traer todos los parámetros del INSERT
+                error = f"{type(e).__name__}: {str(e).splitlines()[0][:120]}"
+                res = None
+            tiempos.append(time.perf_counter() - t0)
+            if res is False:
+                error = "la función retornó False"
+            if error:
+                break
+        return {"tiempos_s": [round(t, 4) for t in tiempos], "error": error}
+
+
+def benchmarks_transform(raw: pd.DataFrame) -> List[Benchmark]:
+    """Una por etapa (con la salida de las etapas anteriores como entrada) y el pipeline completo."""
+    lista = []
+    entrada = raw.copy(deep=False)
+    for nombre, func, admite_inplace in ETAPAS:
+        if admite_inplace:
+            lista.append(Benchmark(nombre, "transform",
+                                   lambda e=entrada: (e.copy(),),
+                                   lambda x, f=func: f(x, inplace=True)))
+        else:
+            lista.append(Benchmark(nombre, "transform",
+                                   lambda e=entrada: (e,),
+                                   lambda x, f=func: f(x)))
+        entrada = func(entrada.copy(), inplace=True) if admite_inplace else func(entrada)
+    lista.append(Benchmark("run_eda_transformations", "transform",
+                           lambda: (raw,), run_eda_transformations))
+    return lista
+
+
+def _clima_para_carga(transformado: pd.DataFrame) -> pd.DataFrame:
+    """Tabla clima de load.create_tables: IdEstacion entero, IdFecha YYYYMMDD y las mediciones."""
+    df = transformado.dropna(subset=["fecha"])
+    codigos, _ = pd.factorize(df["id_estacion"], sort=True)
+    out = df.drop(columns=["fecha", "id_estacion"])
+    out.insert(0, "IdFecha", df["fecha"].dt.strftime("%Y%m%d").astype(np.int64).to_numpy())
+    out.insert(0, "IdEstacion", codigos + 1)
+    return out.reset_index(drop=True)
+
+
+def _base_vacia(path: str, df_clima: pd.DataFrame):
+    """Base SQLite nueva con el esquema de load.py, estaciones y el calendario completo."""
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    create_tables(engine)
+    con = sqlite3.connect(path)
+    with con:
+        con.executemany("INSERT INTO estaciones (IdEstacion, estacion) VALUES (?, ?)",
+                        [(int(i), f"estacion {i}") for i in np.unique(df_clima["IdEstacion"])])
+    con.close()
+    cargar_calendario(engine)
+    return engine
+
+
+def benchmarks_carga(transformado: pd.DataFrame, directorio: str) -> List[Benchmark]:
+    df_clima = _clima_para_carga(transformado)
+    path = os.path.join(directorio, "bench-carga.db")
+    parquet = os.path.join(directorio, "bench-carga.parquet")
+    transformado.to_parquet(parquet, index=False)
+    estaciones = {e: i + 1 for i, e in enumerate(np.sort(transformado["id_estacion"].dropna().unique()))}
+    return [
+        Benchmark("load_clima_to_db", "carga",
+                  lambda: (_base_vacia(path, df_clima), df_clima),
+                  load_clima_to_db),
+        Benchmark("upsert_masivo", "carga",
+                  lambda: (_base_vacia(path, df_clima),),
+                  lambda engine: upsert_masivo(engine, "clima", df_clima, ["IdEstacion", "IdFecha"])),
+        Benchmark("upsert_parquet", "carga",
+                  lambda: (_base_vacia(path, df_clima),),
+                  lambda engine: upsert_parquet(engine, "clima", parquet, ["IdEstacion", "IdFecha"],
+                                                estaciones=estaciones)),
+    ]
+
+
+# =============================================================================
+# Resultados
+# =============================================================================
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=AQUI, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def contexto() -> dict:
+    """Commit, máquina y versiones: lo que hace comparables dos corridas."""
+    return {
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "sucio": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "maquina": platform.node(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def leer_resultados(path: str = RESULTADOS_PATH) -> List[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+
+def guardar_resultados(registros: List[dict], path: str = RESULTADOS_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for r in registros:
+            f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+
+def comparar(registros: List[dict], previos: List[dict], umbral: float = UMBRAL) -> pd.DataFrame:
+    """
+    Cada resultado contra la última corrida de otro commit en la misma
+    máquina (mismo benchmark y tamaño). cambio_% > 0 es más lento. Las
+    corridas con cambios sin commitear (sucio) no se usan de referencia:
+    sus tiempos no corresponden a ningún commit.
+    """
+    filas = []
+    for r in registros:
+        antes = [p for p in previos
+                 if p["benchmark"] == r["benchmark"] and p["filas"] == r["filas"]
+                 and p["maquina"] == r["maquina"] and p["commit"] != r["commit"]
+                 and not p.get("sucio")]
+        previo = antes[-1] if antes else None
+        cambio = (r["min_s"] / previo["min_s"] - 1) if previo and previo["min_s"] else None
+        filas.append({
+            "benchmark": r["benchmark"],
+            "filas": r["filas"],
+            "min_s": r["min_s"],
+            "mediana_s": r["mediana_s"],
+            "filas/s": r["filas_por_s"],
+            "previo_s": previo["min_s"] if previo else None,
+            "commit_previo": previo["commit"] if previo else None,
+            "cambio_%": round(100 * cambio, 1) if cambio is not None else None,
+            "": "REGRESION" if cambio is not None and cambio > umbral else (r["error"] or "")[:60],
+        })
+    return pd.DataFrame(filas)
+
+
+# =============================================================================
+# Main
+# =============================================================================
+
+def main(tamanios: List[str], repeticiones: int = REPETICIONES,
+         solo: Optional[str] = None, guardar: bool = True) -> pd.DataFrame:
+    ctx = contexto()
+    previos = leer_resultados()
+    registros: List[dict] = []
+    for tamanio in tamanios:
+        filas = filas_de(tamanio)
+        raw = datos(filas)
+        lista: List[Benchmark] = []
+        if solo in (None, "transform"):
+            lista += benchmarks_transform(raw)
+        with tempfile.TemporaryDirectory() as tmp:
+            if solo in (None, "carga"):
+                lista += benchmarks_carga(run_eda_transformations(raw), tmp)
+            for b in lista:
+                print(f"[{tamanio}] {b.grupo:<9} {b.nombre:<30}", end=" ", flush=True)
+                m = b.medir(repeticiones)
+                t_min, t_med = min(m["tiempos_s"]), statistics.median(m["tiempos_s"])
+                print(f"min={t_min:9.3f}s  mediana={t_med:9.3f}s")
+                registros.append({
+                    **ctx, "benchmark": b.nombre, "grupo": b.grupo, "tamanio": tamanio,
+                    "filas": filas, "repeticiones": repeticiones, **m,
+                    "min_s": t_min, "mediana_s": round(t_med, 4),
+                    "filas_por_s": round(filas / t_min, 1) if t_min > 0 else None,
+                })
+        del raw
+
+    tabla = comparar(registros, previos)
+    print()
+    print(tabla.to_string(index=False))
+    if guardar:
+        guardar_resultados(registros)
+        print(f"\nResultados agregados a {RESULTADOS_PATH} (commit {ctx['commit']}"
+              f"{', con cambios sin commitear' if ctx['sucio'] else ''})")
+    return tabla
+
+
+if __name__ == "__main__":
+    opciones = {a.split("=")[0]: (a.split("=", 1) + [None])[1] for a in sys.argv[1:] if a.startswith("--")}
+    tamanios = [a for a in sys.argv[1:] if not a.startswith("--")] or ["1M"]
+    main(tamanios,
+         repeticiones=int(opciones.get("--repeticiones") or REPETICIONES),
+         solo=opciones.get("--solo"),
+         guardar="--no-guardar" not in opciones)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Generador determinístico de datos climáticos sintéticos
+-------------------------------------------------------
+Imita la estructura de data/datos-todas-estaciones.parquet para medir cómo
+escalan transform.py y load.py más allá de los ~923k registros reales:
+
+- columnas y nombres de las planillas del INTA (Fecha, id_estacion y las
+  mediciones, en el mismo orden que el mapeo de baseDatos.py);
+- una serie diaria por estación (ids tipo 'A87xxxx'), de largo variable
+  (arranque entre 1960 y 2018, todas hasta fines de 2024) y ordenada por
+  fecha, como las particiones de la extracción;
+- patrones de nulos del INTA: variables que una estación no mide (columna
+  entera nula en esa estación), cortes de la estación (corridas de días
+  sin ningún dato) y faltantes sueltos por variable;
+- valores físicamente coherentes: estacionalidad por latitud, mínima <=
+  media <= máxima, rocío desde la humedad, tensión de vapor desde el rocío,
+  heliofanía relativa desde la efectiva, precipitación con días secos.
+
+Cada estación se genera con su propia semilla (seed, número de estación):
+la estación k es la misma sin importar cuántas filas se pidan, así que los
+tamaños chicos son prefijos de los grandes.
+
+Uso (desde clima/):
+    python benchmarks/sintetico.py 1000000 data/sintetico-1M.parquet
+"""
+
+import os
+import sys
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+# =============================================================================
+# Configuración
+# =============================================================================
+
+FECHA_FIN = pd.Timestamp("2024-12-31")
+ANIO_INICIO_MIN, ANIO_INICIO_MAX = 1960, 2018
+
+# Columnas que usa transform.py (modo "transform") y el resto de la planilla
+COLUMNAS_TRANSFORM: List[str] = [
+    "Precipitacion_Pluviometrica",
+    "Temperatura_Abrigo_150cm",
+    "Temperatura_Abrigo_150cm_Maxima",
+    "Temperatura_Abrigo_150cm_Minima",
+    "Humedad_Media_8_14_20",
+    "Rocio_Medio",
+    "Tesion_Vapor_Media",
+    "Radiacion_Global",
+    "Heliofania_Efectiva",
+    "Heliofania_Relativa",
+]
+COLUMNAS_EXTRA: List[str] = [
+    "Temperatura_Intemperie_5cm_Minima", "Temperatura_Intemperie_50cm_Minima",
+    "Temperatura_Suelo_5cm_Media", "Temperatura_Suelo_10cm_Media", "Temperatura_Inte_5cm",
+    "Temperatura_Intemperie_150cm_Minima", "Humedad_Suelo", "Precipitacion_Cronologica",
+    "Precipitacion_Maxima_30minutos", "Humedad_Media", "Duracion_Follaje_Mojado",
+    "Velocidad_Viento_200cm_Media", "Direccion_Viento_200cm", "Velocidad_Viento_1000cm_Media",
+    "Direccion_Viento_1000cm", "Velocidad_Viento_Maxima", "Presion_Media", "Horas_Frio",
+    "Unidades_Frio", "Granizo", "Nieve", "Radiacion_Neta", "Evaporacion_Tanque",
+    "Evapotranspiracion_Potencial", "Profundidad_Napa", "Unidad_Frio",
+]
+
+# Probabilidad de que una estación no mida la variable (columna nula en toda la serie)
+P_NO_MIDE = {
+    "Radiacion_Global": 0.35, "Heliofania_Efectiva": 0.30, "Heliofania_Relativa": 0.30,
+    "Rocio_Medio": 0.10, "Tesion_Vapor_Media": 0.10,
+}
+P_NO_MIDE_EXTRA = 0.75
+# Faltantes sueltos por variable y cortes de la estación
+P_FALTANTE = 0.04
+P_CORTE_DIA = 0.004          # probabilidad diaria de que empiece un corte
+LARGO_CORTE_MEDIO = 12       # días (geométrica)
+
+DIRECCIONES = np.array(["N", "NE", "E", "SE", "S", "SO", "O", "NO"])
+
+
+# =============================================================================
+# Generación
+# =============================================================================
+
+def id_estacion(k: int) -> str:
+    return f"A87{k:04d}"
+
+
+def _inicio(rng: np.random.Generator) -> pd.Timestamp:
+    anio = int(rng.integers(ANIO_INICIO_MIN, ANIO_INICIO_MAX + 1))
+    return pd.Timestamp(anio, 1, 1) + pd.Timedelta(days=int(rng.integers(0, 365)))
+
+
+def estacion(k: int, seed: int = 0, filas: Optional[int] = None,
+             columnas: str = "transform") -> pd.DataFrame:
+    """
+    Serie diaria de la estación k. `filas` se queda con los primeros días
+    (última estación de un tamaño pedido): se genera la serie entera y se
+    recorta, así el recorte es prefijo exacto. `columnas`: "transform" o "completo".
+    """
+    rng = np.random.default_rng([seed, k])
+    fechas = pd.date_range(_inicio(rng), FECHA_FIN, freq="D")
+    n = len(fechas)
+    doy = fechas.dayofyear.to_numpy()
+    fase = np.cos(2 * np.pi * (doy - 15) / 365.25)        # 1 en enero (verano austral)
+
+    lat = rng.uniform(-55, -22)
+    t_anual = 26 + 0.45 * (lat + 22) + rng.normal(0, 1)    # más frío al sur
+    amplitud = 6 + 0.1 * abs(lat)
+    tmed = t_anual - 8 + amplitud * fase + rng.normal(0, 2.5, n)
+    rango = np.clip(rng.normal(11, 3, n), 2, None)
+    tmin = tmed - rango * rng.uniform(0.35, 0.65, n)
+    tmax = tmin + rango
+    hum = np.clip(rng.normal(72 - 10 * fase, 12, n), 15, 100)
+    rocio = tmed - (100 - hum) / 5 + rng.normal(0, 0.5, n)
+    tension = 6.1078 * np.exp(17.27 * rocio / (rocio + 237.3))
+    n_horas = 12 + 2.5 * fase * abs(lat) / 35
+    helio_ef = np.clip(n_horas * rng.beta(2.5, 1.5, n), 0, None)
+    helio_rel = np.clip(100 * helio_ef / n_horas, 0, 100)
+    radiacion = np.clip(4 + 1.4 * helio_ef + 6 * fase + rng.normal(0, 1.5, n), 0.1, None)
+    lluvia = np.where(rng.random(n) < 0.25 + 0.1 * fase, rng.gamma(0.7, 12, n), 0.0)
+
+    datos = {
+        "Precipitacion_Pluviometrica": lluvia,
+        "Temperatura_Abrigo_150cm": tmed,
+        "Temperatura_Abrigo_150cm_Maxima": tmax,
+        "Temperatura_Abrigo_150cm_Minima": tmin,
+        "Humedad_Media_8_14_20": hum,
+        "Rocio_Medio": rocio,
+        "Tesion_Vapor_Media": tension,
+        "Radiacion_Global": radiacion,
+        "Heliofania_Efectiva": helio_ef,
+        "Heliofania_Relativa": helio_rel,
+    }
+    if columnas == "completo":
+        for col in COLUMNAS_EXTRA:
+            if col.startswith("Direccion"):
+                datos[col] = DIRECCIONES[rng.integers(0, len(DIRECCIONES), n)].astype(object)
+            else:
+                datos[col] = rng.normal(10, 5, n)
+    elif columnas != "transform":
+        raise ValueError(f"columnas debe ser 'transform' o 'completo', no {columnas!r}")
+
+    # planillas del INTA: 1 o 2 decimales
+    for col, v in datos.items():
+        if v.dtype.kind == "f":
+            datos[col] = np.round(v, 1 if col.startswith(("Temperatura", "Humedad", "Heliofania_R")) else 2)
+
+    # cortes de la estación: corridas de días sin ningún dato
+    inicio_corte = rng.random(n) < P_CORTE_DIA
+    largos = rng.geometric(1 / LARGO_CORTE_MEDIO, n)
+    fin = np.where(inicio_corte, np.arange(n) + largos, -1)
+    corte = np.maximum.accumulate(fin) > np.arange(n)
+
+    for col, v in datos.items():
+        p = P_NO_MIDE.get(col, P_NO_MIDE_EXTRA if col in COLUMNAS_EXTRA else 0.0)
+        if rng.random() < p:
+            nulo = np.ones(n, dtype=bool)
+        else:
+            nulo = corte | (rng.random(n) < P_FALTANTE)
+        if v.dtype == object:
+            v[nulo] = None
+        else:
+            v[nulo] = np.nan
+
+    df = pd.DataFrame({"Fecha": fechas, "id_estacion": id_estacion(k), **datos})
+    return df if filas is None or filas >= n else df.iloc[:filas]
+
+
+def estaciones(filas: int, seed: int = 0, columnas: str = "transform") -> Iterator[pd.DataFrame]:
+    """Estaciones 0, 1, 2, ... hasta sumar exactamente `filas` filas."""
+    restantes, k = filas, 0
+    while restantes > 0:
+        df = estacion(k, seed, filas=restantes, columnas=columnas)
+        restantes -= len(df)
+        k += 1
+        yield df
+
+
+def generar(filas: int, seed: int = 0, columnas: str = "transform") -> pd.DataFrame:
+    """DataFrame completo (todas las estaciones concatenadas)."""
+    return pd.concat(list(estaciones(filas, seed, columnas)), ignore_index=True)
+
+
+def esquema(columnas: str = "transform") -> pa.Schema:
+    """Esquema fijo del archivo (una estación sin alguna variable no cambia los tipos)."""
+    nombres = COLUMNAS_TRANSFORM + (COLUMNAS_EXTRA if columnas == "completo" else [])
+    return pa.schema(
+        [pa.field("Fecha", pa.timestamp("ns")), pa.field("id_estacion", pa.string())]
+        + [pa.field(c, pa.string() if c.startswith("Direccion") else pa.float64()) for c in nombres]
+    )
+
+
+def escribir_parquet(filas: int, path: str, seed: int = 0, columnas: str = "transform") -> str:
+    """
+    Escribe el dataset sintético una estación por vez (una row group por
+    estación, como la consolidación de la extracción): memoria acotada por
+    la estación más larga, no por el total.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    schema = esquema(columnas)
+    with pq.ParquetWriter(tmp, schema, compression="snappy") as writer:
+        for df in estaciones(filas, seed, columnas):
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+    os.replace(tmp, path)
+    return path
+
+
+if __name__ == "__main__":
+    n = int(float(sys.argv[1])) if len(sys.argv) > 1 else 1_000_000
+    destino = sys.argv[2] if len(sys.argv) > 2 else f"data/sintetico-{n}.parquet"
+    modo = sys.argv[3] if len(sys.argv) > 3 else "transform"
+    print(f"Generando {n:,} filas ({modo}) → {escribir_parquet(n, destino, columnas=modo)}")
@@ -7,11 +7,26 @@ usando las funciones de los módulos extract.py, transform.py y load.py
 """
 
 import os
+import sys
 import logging
 import pandas as pd
+import pyarrow.parquet as pq
 
 # Importar funciones de los módulos ETL
-from ETL.clima.transform import run_eda_transformations
+from ETL.clima.transform import (
+    PRECIP_MAX_HUECO, PRECIP_METODO, run_eda_transformations_por_estacion, perfil_memoria,
+)
+from ETL.clima.interpolacion import resumen_huecos
+from ETL.clima.cache_etapas import run_eda_cacheado
+from ETL.clima.manifiesto import cargar_manifiesto
+from ETL.clima.cache_series import CacheSeries
+from ETL.clima.escritura import consolidar_particiones
+from ETL.clima.incremental import transformar_incremental
+from ETL.clima.por_bloques import transformar_por_bloques
+from ETL.clima.semanal import SEMANAL_DIR, actualizar_semanal, cubo_semanal, escribir_cubo
+# Esquema compacto (CLIMA_COMPACTO=1): id categórico, float32 y fecha date32 en los archivos
+from ETL.clima.instrumentacion import METRICAS, METRICAS_PATH, instrumentacion
+from ETL.clima.tipos import COMPACTO, a_tabla, compactar, leer_parquet, reporte_memoria
 
 # -----------------------------------------------------------------------------
 # Configuración de logging
@@ -27,38 +42,116 @@ log = logging.getLogger(__name__)
 # -----------------------------------------------------------------------------
 INPUT_PARQUET = "data/datos-todas-estaciones.parquet"
 OUTPUT_PARQUET = "data/datos_clima_transformados.parquet"
+# Para corridas sobre un subconjunto de estaciones (no pisa la salida completa)
+OUTPUT_SUBSET_PARQUET = "data/datos_clima_transformados-estaciones.parquet"
+MANIFEST_PATH = "data/manifiesto-estaciones.json"
+ESTACIONES_DIR = "data/estaciones-parquet"
+# Transformar estación por estación en paralelo (workers: CLIMA_WORKERS)
+POR_ESTACION = os.getenv("CLIMA_POR_ESTACION", "0") == "1"
+# Reporte de memoria pico por etapa con tracemalloc (más lento: solo para diagnóstico)
+PERFIL_MEMORIA = os.getenv("CLIMA_PERFIL_MEMORIA", "0") == "1"
+# Cache en disco de la salida de cada etapa (data/cache-etapas, tope CLIMA_CACHE_ETAPAS_MB)
+CACHE_ETAPAS = os.getenv("CLIMA_CACHE_ETAPAS", "0") == "1"
+# Modo incremental: solo filas nuevas por estación (ventana: CLIMA_VENTANA)
+INCREMENTAL = os.getenv("CLIMA_INCREMENTAL", "0") == "1"
+# Fuera de memoria: una estación (row group) por vez, estadísticos en una primera pasada
+FUERA_DE_MEMORIA = os.getenv("CLIMA_FUERA_DE_MEMORIA", "0") == "1"
+TRANSFORMADO_DIR = "data/clima-transformado"
+ESTADO_TRANSFORMACION = "data/estado-transformacion.json"
+# Cubo semanal por estación y semana epidemiológica (SEMANAL_DIR: CLIMA_SEMANAL_DIR)
+SEMANAL = os.getenv("CLIMA_SEMANAL", "0") == "1"
 
 # -----------------------------------------------------------------------------
 # Función principal del ETL
 # -----------------------------------------------------------------------------
-def run_etl():
+def run_etl(estaciones=None, metricas=METRICAS):
     """
     Ejecuta el proceso completo de ETL: Extract, Transform, Load.
+    Si se pasan `estaciones`, solo se leen esas series desde el cache Arrow
+    (memory-mapped) en lugar del parquet completo.
+    Con `metricas` (CLIMA_METRICAS=1 o --metricas) se mide cada etapa y la
+    lectura/escritura, y se agregan las mediciones a METRICAS_PATH.
     """
+    medidor = instrumentacion(metricas, METRICAS_PATH)
     try:
         log.info("🚀 Iniciando proceso ETL completo...")
+        output_parquet = OUTPUT_SUBSET_PARQUET if estaciones else OUTPUT_PARQUET
 
-        # 1) Verificar que existe el archivo de datos
-        if not os.path.exists(INPUT_PARQUET):
-            log.error(f"❌ No se encontró el archivo de datos: {INPUT_PARQUET}")
-            return False
+        if estaciones:
+            # 1-2) Leer solo las estaciones pedidas desde el cache de series
+            log.info(f"📖 Leyendo {len(estaciones)} estaciones desde el cache Arrow...")
+            with medidor.medir("lectura_cache_series") as r:
+                df_raw = CacheSeries().cargar_estaciones(cargar_manifiesto(MANIFEST_PATH), estaciones,
+                                                         particiones_dir=ESTACIONES_DIR)
+                r["filas_salida"] = len(df_raw)
+            if df_raw.empty:
+                log.error("❌ Ninguna de las estaciones pedidas está en el cache")
+                return False
         else:
-            log.info("📦 Archivo de datos encontrado")
+            # 1) Verificar que existe el archivo de datos
+            if not os.path.exists(INPUT_PARQUET):
+                log.error(f"❌ No se encontró el archivo de datos: {INPUT_PARQUET}")
+                return False
+            else:
+                log.info("📦 Archivo de datos encontrado")
+
+            if FUERA_DE_MEMORIA:
+                log.info("🔄 Transformando por bloques (fuera de memoria)...")
+                with medidor.medir("transformar_por_bloques") as r:
+                    resumen = transformar_por_bloques(INPUT_PARQUET, output_parquet)
+                    r["filas_salida"] = resumen["filas"]
+                log.info(f"✅ {resumen['filas']} filas en {resumen['bloques']} bloques "
+                         f"(estadísticos {resumen['estadisticos_s']}s, "
+                         f"transformación {resumen['transformacion_s']}s) → {output_parquet}")
+                _resumen_metricas(medidor)
+                return True
 
-        # 2) Leer datos extraídos
-        log.info("📖 Leyendo datos crudos...")
-        df_raw = pd.read_parquet(INPUT_PARQUET)
+            # 2) Leer datos extraídos
+            log.info("📖 Leyendo datos crudos...")
+            with medidor.medir("lectura_parquet") as r:
+                df_raw = leer_parquet(INPUT_PARQUET) if COMPACTO else pd.read_parquet(INPUT_PARQUET)
+                r["filas_salida"] = len(df_raw)
         log.info(f"📊 Datos crudos: {len(df_raw)} filas, {len(df_raw.columns)} columnas")
+        if COMPACTO:
+            with medidor.medir("compactar", len(df_raw)):
+                df_compacto = compactar(df_raw)
+            log.info("🗜️  Esquema compacto, memoria por columna (MB):\n"
+                     + reporte_memoria(df_raw, df_compacto).to_string(index=False))
+            df_raw = df_compacto
+            del df_compacto
+        columnas = {c.lower().strip(): c for c in df_raw.columns}
+        if PRECIP_METODO != "spline_global" and "precipitacion_pluviometrica" in columnas:
+            h = resumen_huecos(df_raw, columnas["precipitacion_pluviometrica"],
+                               col_estacion=columnas.get("id_estacion", "id_estacion"),
+                               col_fecha=columnas.get("fecha", "fecha"), max_hueco=PRECIP_MAX_HUECO)
+            log.info(f"🕳️  Huecos de precipitación ({PRECIP_METODO}, máx. {PRECIP_MAX_HUECO} filas): "
+                     f"{h['huecos']} huecos / {h['nulos']} nulos, se rellenan {h['rellenables']} "
+                     f"({h['filas_rellenables']} filas); largo p50={h['largo_p50']} "
+                     f"p90={h['largo_p90']} máx={h['largo_max']}")
 
         # 3) TRANSFORM: Aplicar transformaciones
-        log.info("🔄 Aplicando transformaciones...")
-        df_transformed = run_eda_transformations(df_raw)
+        with medidor.medir("transformacion", len(df_raw)) as medicion:
+            df_transformed = _transformar(df_raw, medidor)
+            medicion["filas_salida"] = len(df_transformed)
         log.info(f"✨ Datos transformados: {len(df_transformed)} filas, {len(df_transformed.columns)} columnas")
 
         # 4) LOAD: Guardar datos transformados en Parquet
         log.info("💾 Guardando datos transformados en Parquet...")
-        df_transformed.to_parquet(OUTPUT_PARQUET, index=False)
-        log.info(f"✅ Datos guardados en: {OUTPUT_PARQUET}")
+        with medidor.medir("escritura_parquet", len(df_transformed)):
+            if COMPACTO:
+                pq.write_table(a_tabla(df_transformed, compacto=True), output_parquet)
+            else:
+                df_transformed.to_parquet(output_parquet, index=False)
+        log.info(f"✅ Datos guardados en: {output_parquet}")
+
+        # 5) Cubo semanal (solo con el dataset completo: por estaciones pisaría particiones sueltas)
+        if SEMANAL and not estaciones:
+            log.info("📅 Agregando a semanas epidemiológicas...")
+            with medidor.medir("cubo_semanal", len(df_transformed)) as r:
+                cubo = cubo_semanal(df_transformed)
+                escribir_cubo(cubo, SEMANAL_DIR)
+                r["filas_salida"] = len(cubo)
+            log.info(f"✅ Cubo semanal: {len(cubo)} semanas-estación → {SEMANAL_DIR}")
 
         # Estadísticas finales
         print("\n" + "="*50)
@@ -67,8 +160,9 @@ def run_etl():
         print(f"Registros transformados: {len(df_transformed)}")
         print(f"Estaciones procesadas: {df_transformed['id_estacion'].nunique()}")
         print(f"Rango de fechas: {df_transformed['fecha'].min()} - {df_transformed['fecha'].max()}")
-        print(f"Archivo Parquet generado: {OUTPUT_PARQUET}")
+        print(f"Archivo Parquet generado: {output_parquet}")
         print("="*50)
+        _resumen_metricas(medidor)
 
         log.info("✅ Proceso ETL completado exitosamente!")
         return True
@@ -77,9 +171,89 @@ def run_etl():
         log.error(f"💥 Error crítico en ETL: {e}")
         return False
 
+
+def _transformar(df_raw, medidor):
+    """Transformación según el modo configurado; en el modo por defecto se mide cada etapa."""
+    if PERFIL_MEMORIA:
+        log.info("🔄 Aplicando transformaciones con perfil de memoria...")
+        df_transformed, reporte = perfil_memoria(df_raw)
+        for r in reporte:
+            log.info(f"   {r['etapa']:<30} {r['segundos']:>8.2f}s  pico={r['pico_mb']:>8.1f} MB  "
+                     f"actual={r['actual_mb']:>8.1f} MB")
+        return df_transformed
+    if CACHE_ETAPAS:
+        log.info("🔄 Aplicando transformaciones (cache por etapa)...")
+        df_transformed, reporte = run_eda_cacheado(df_raw)
+        for r in reporte:
+            log.info(f"   {r['etapa']:<30} {r['estado']:<10} {r['segundos']:>8.2f}s  {r['clave']}")
+        return df_transformed
+    if POR_ESTACION:
+        log.info("🔄 Aplicando transformaciones por estación (multiproceso)...")
+        return run_eda_transformations_por_estacion(df_raw)
+    log.info("🔄 Aplicando transformaciones...")
+    return medidor.correr_etapas(df_raw)
+
+
+def _resumen_metricas(medidor):
+    """Tabla resumen de la instrumentación (si está activa)."""
+    if not medidor.activa:
+        return
+    print("\n" + "="*50)
+    print(f"METRICAS POR ETAPA (corrida {medidor.corrida})")
+    print("="*50)
+    print(medidor.tabla())
+    print(f"Mediciones agregadas a: {medidor.path}")
+    print("="*50)
+
+def run_etl_incremental(completa=False):
+    """
+    Transforma solo las filas nuevas de cada estación (con una ventana de
+    contexto) sobre el dataset particionado TRANSFORMADO_DIR y regenera
+    OUTPUT_PARQUET consolidando las particiones. `completa=True` rehace todas.
+    """
+    try:
+        log.info("🚀 Iniciando ETL incremental...")
+        manifiesto = cargar_manifiesto(MANIFEST_PATH)
+        if not manifiesto:
+            log.error(f"❌ No hay manifiesto de estaciones: {MANIFEST_PATH}")
+            return False
+        ids = sorted(manifiesto)
+
+        log.info(f"🔄 Transformando filas nuevas de {len(ids)} estaciones...")
+        resumen = transformar_incremental(ids, ESTACIONES_DIR, TRANSFORMADO_DIR,
+                                          ESTADO_TRANSFORMACION, manifiesto, completa=completa)
+        log.info(f"   completas={resumen['completa']}  incrementales={resumen['incremental']}  "
+                 f"sin cambios={resumen['sin_cambios']}  filas escritas={resumen['filas_escritas']}  "
+                 f"errores={resumen['errores']}")
+
+        log.info("💾 Consolidando particiones transformadas...")
+        filas, columnas = consolidar_particiones(TRANSFORMADO_DIR, ids, OUTPUT_PARQUET)
+        log.info(f"✅ {OUTPUT_PARQUET}: {filas} filas, {columnas} columnas")
+
+        if SEMANAL:
+            log.info("📅 Actualizando el cubo semanal...")
+            semanal = actualizar_semanal(ids, TRANSFORMADO_DIR, SEMANAL_DIR, completa=completa)
+            log.info(f"   completas={semanal['completa']}  incrementales={semanal['incremental']}  "
+                     f"sin cambios={semanal['sin_cambios']}  semanas escritas={semanal['semanas_escritas']}  "
+                     f"errores={semanal['errores']}")
+            resumen["errores"] += semanal["errores"]
+        return resumen["errores"] == 0
+
+    except Exception as e:
+        log.error(f"💥 Error crítico en ETL incremental: {e}")
+        return False
+
 # -----------------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------------
 if __name__ == "__main__":
-    success = run_etl()
+    # python etl.py [id_estacion ...]  → sin ids procesa el dataset completo
+    # CLIMA_INCREMENTAL=1 python etl.py  → solo filas nuevas por estación
+    # CLIMA_SEMANAL=1 python etl.py  → además el cubo semanal (data/clima-semanal)
+    # CLIMA_METRICAS=1 python etl.py o python etl.py --metricas  → métricas por etapa
+    args = [a for a in sys.argv[1:] if a != "--metricas"]
+    if INCREMENTAL and not args:
+        success = run_etl_incremental()
+    else:
+        success = run_etl(args or None, metricas=METRICAS or "--metricas" in sys.argv)
     exit(0 if success else 1)
\ No newline at end of file
@@ -1,30 +1,27 @@
 import pandas as pd
 import json
 from io import BytesIO
-import requests
 import time
 from fake_useragent import UserAgent
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ETL', 'clima'))
+from descarga import ClienteINTA
+from cache_crudo import CacheCrudo
+from manifiesto import (
+    cargar_manifiesto, guardar_manifiesto, hash_contenido, sin_cambios,
+    registrar_estacion, marcar_verificada, fechas_hasta, estaciones_a_descargar
+)
 
 ua = UserAgent()
 
+# Sesión compartida (keep-alive + reintentos); user-agent aleatorio por pedido
+cliente = ClienteINTA(user_agent=lambda: ua.random)
+
 
 def obtener_historico(id_estacion):
-  headers = {
-    'accept': '*/*',
-    'accept-language': 'es-419,es;q=0.7',
-    'priority': 'u=0, i',
-    'sec-ch-ua': '"Chromium";v="140", "Not=A?Brand";v="24", "Brave";v="140"',
-    'sec-ch-ua-mobile': '?0',
-    'sec-ch-ua-platform': '"Windows"',
-    'sec-fetch-dest': 'empty',
-    'sec-fetch-mode': 'cors',
-    'sec-fetch-site': 'same-origin',
-    'sec-gpc': '1',
-    'user-agent': ua.random,
-  }
-
-  return requests.get(f'https://siga.inta.gob.ar/document/series/{id_estacion}.xls', headers=headers)
+  return cliente.obtener(id_estacion)
 
 def generar_excel(response):
   if response.status_code == 200:
@@ -38,10 +35,11 @@ def generar_excel(response):
 
 import os
 
-def proceso(ids_estaciones):
+def proceso(ids_estaciones, hasta=None):
     carpeta = 'datos-estaciones'
     errores_carpeta = 'estaciones-errores'
     errores_archivo = os.path.join(errores_carpeta, "errores.txt")
+    manifiesto_path = os.path.join(carpeta, "manifiesto.json")
 
     # Crear carpetas si no existen
     if not os.path.exists(carpeta):
@@ -49,27 +47,44 @@ def proceso(ids_estaciones):
     if not os.path.exists(errores_carpeta):
         os.makedirs(errores_carpeta)
 
-    for index, id in enumerate(ids_estaciones):
-        path = f"{carpeta}/{id}.xls"
-
-        if not os.path.exists(path):
-            try:
-                response = obtener_historico(id)
-                contenido = generar_excel(response)
-
-                if contenido is not None:
-                    with open(path, 'wb') as excel:
-                        excel.write(contenido)
+    # Los .xls se guardan en el cache crudo compartido (por hash, comprimidos).
+    # Los archivos sueltos de versiones anteriores se importan y se registran.
+    cache = CacheCrudo()
+    cache.importar_carpeta(carpeta)
+    manifiesto = cargar_manifiesto(manifiesto_path)
+    for id in ids_estaciones:
+        if str(id) not in manifiesto and cache.ultimo(id):
+            registrar_estacion(manifiesto, id, cache.leer_ultimo(id))
+    guardar_manifiesto(manifiesto, manifiesto_path)
+
+    pendientes = estaciones_a_descargar(ids_estaciones, manifiesto, hasta)
+    print(f"Estaciones: {len(ids_estaciones)} | a descargar/actualizar: {len(pendientes)}")
+
+    for index, id in enumerate(pendientes):
+        try:
+            response = obtener_historico(id)
+            contenido = generar_excel(response)
+
+            if contenido is not None:
+                cache.guardar(id, contenido)
+                if sin_cambios(manifiesto, id, hash_contenido(contenido)):
+                    marcar_verificada(manifiesto, id)
                 else:
-                    # Guardar el id fallido
-                    with open(errores_archivo, "a") as f:
-                        f.write(f"{id}\n")
-
-            except Exception as e:
-                # Cualquier error inesperado también lo guardamos
+                    registrar_estacion(manifiesto, id, contenido)
+                guardar_manifiesto(manifiesto, manifiesto_path)
+            else:
+                # Guardar el id fallido
                 with open(errores_archivo, "a") as f:
                     f.write(f"{id}\n")
-                print(f"Error con {id}: {e}")
+
+        except Exception as e:
+            # Cualquier error inesperado también lo guardamos
+            with open(errores_archivo, "a") as f:
+                f.write(f"{id}\n")
+            print(f"Error con {id}: {e}")
+
+    print(f"Cache crudo: {cache.resumen()}")
+    cache.close()
 
 
 
@@ -79,4 +94,4 @@ if __name__ == '__main__':
     df_estaciones.columns = [col.lower().replace(' ', '_').strip() for col in df_estaciones.columns]
 
     ids_estaciones = list(df_estaciones.id_interno.unique())
-    proceso(ids_estaciones)
\ No newline at end of file
+    proceso(ids_estaciones, fechas_hasta(df_estaciones))
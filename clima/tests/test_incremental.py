@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Transformación incremental contra la completa con los mismos parámetros
+-----------------------------------------------------------------------
+Sobre datos de benchmarks/sintetico.py (con variables que algunas
+estaciones no miden, como en el INTA).
+
+Uso (desde clima/):
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(AQUI, ".."))
+sys.path.insert(0, os.path.join(AQUI, "..", "benchmarks"))
+
+import sintetico
+from ETL.clima.incremental import actualizar_estacion, preparar_estacion, transformar_completa
+from ETL.clima.transform import _transformar_variables
+
+
+@pytest.fixture(scope="module")
+def estaciones():
+    raw = sintetico.generar(50_000, seed=1)
+    return [preparar_estacion(g) for _, g in raw.groupby("id_estacion")]
+
+
+def test_un_dia_nuevo_es_incremental(estaciones):
+    sin_medir = 0
+    for base in estaciones:
+        historia = base.iloc[:-1]
+        previo, params = transformar_completa(historia)
+        entrada = {"fecha_max": historia["fecha"].max().isoformat(),
+                   "filas": len(historia), "params": params}
+
+        out, _, modo = actualizar_estacion(base, previo, entrada)
+
+        assert modo == "incremental"
+        esperado = _transformar_variables(base.copy(), dict(params)).reset_index(drop=True)
+        pd.testing.assert_frame_equal(out, esperado[out.columns], check_dtype=False)
+        sin_medir += bool(base.isna().all().any())
+    # el caso que forzaba la corrida completa: variables que la estación nunca midió
+    assert sin_medir > 0